@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares the heap and bucket queue dijkstra maps
+
+Every shipped map is run, followed by random grids of the given size.
+The heap runs with a 1.4 diagonal multiplier so both sides find the
+same paths; the bucket queue uses 10/14 fixed point steps.
+
+Usage: bench_bucket_queue.py [options]
+
+Options:
+    -s --size SIZE       Width and height of the random grids [default: 512]
+    -d --density LIST    Comma separated wall densities of the random grids [default: 0.1,0.3]
+    -n --number NUMBER   Number of runs per measurement [default: 3]
+    -r --repeat REPEAT   Number of measurements to take the best of [default: 3]
+"""
+import os
+
+import numpy as np
+from docopt import docopt
+
+import lose
+from lose.utils.algorithms.grid import Grid
+from lose.utils.algorithms.pathing import bucket_dijkstra, grid_dijkstra
+from bench_pathing import best_of, read_map_nodes
+
+
+def shipped_grids():
+    """Yields a grid for every shipped map, walls excluded."""
+    maps_path = os.path.join(os.path.dirname(lose.__file__), 'data', 'maps')
+    for filename in sorted(os.listdir(maps_path)):
+        if not filename.endswith('.map'):
+            continue
+        name = os.path.splitext(filename)[0]
+        nodes = read_map_nodes(name)
+        yield name, Grid.from_graph([node for node, character in nodes.items() if character != '#'])
+
+
+def random_grid(size, density, seed=0):
+    """Builds a size x size grid with a fraction of random walls."""
+    rng = np.random.default_rng(seed)
+    passable = rng.random((size, size)) >= density
+    passable[0, 0] = True
+    return Grid(passable)
+
+
+def compare(name, grid, number, repeat):
+    ys, xs = np.nonzero(grid.unpad(grid.passable))
+    start = (int(ys[0]) + grid.origin[0], int(xs[0]) + grid.origin[1])
+    for include_diagonals in (False, True):
+        def heap():
+            return grid_dijkstra(grid, start, include_diagonals=include_diagonals, diagonal_cost=1.4)
+
+        def bucket():
+            return bucket_dijkstra(grid, start, include_diagonals=include_diagonals)
+
+        if not np.allclose(heap() * 10, bucket()):
+            raise RuntimeError(f'Bucket queue does not match the heap on {name}')
+        heap_time = best_of(heap, number, repeat)
+        bucket_time = best_of(bucket, number, repeat)
+        directions = 8 if include_diagonals else 4
+        print(f'{name} ({directions} directions): '
+              f'heap {heap_time * 1000:.2f}ms, bucket {bucket_time * 1000:.2f}ms, '
+              f'{heap_time / bucket_time:.2f}x')
+
+
+def main(argv=None):
+    options = docopt(__doc__, argv=argv)
+    number = int(options['--number'])
+    repeat = int(options['--repeat'])
+    size = int(options['--size'])
+    for name, grid in shipped_grids():
+        compare(name, grid, number, repeat)
+    for density in options['--density'].split(','):
+        compare(f'random {size}x{size} ({density} walls)', random_grid(size, float(density)), number, repeat)
+
+
+if __name__ == '__main__':
+    main()
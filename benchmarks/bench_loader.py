@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Times parsing the game data with each YAML loader
+
+Every file under the given data folders is parsed with the pure python
+SafeLoader and, when PyYAML was built with libyaml, the CSafeLoader the
+data loaders use.  Times are the best per file parse.
+
+Usage: bench_loader.py [options]
+
+Options:
+    -f --folders LIST    Comma separated folders under lose/data [default: mobs/languages,items,tiles]
+    -n --number NUMBER   Number of parses per measurement [default: 10]
+    -r --repeat REPEAT   Number of measurements to take the best of [default: 3]
+"""
+import os
+
+import yaml
+from docopt import docopt
+
+import lose
+from lose.utils.data_loaders import find_yaml_files
+from bench_pathing import best_of
+
+
+def loaders():
+    found = {'SafeLoader': yaml.SafeLoader}
+    if hasattr(yaml, 'CSafeLoader'):
+        found['CSafeLoader'] = yaml.CSafeLoader
+    return found
+
+
+def main(argv=None):
+    options = docopt(__doc__, argv=argv)
+    number = int(options['--number'])
+    repeat = int(options['--repeat'])
+    data_path = os.path.join(os.path.dirname(lose.__file__), 'data')
+    available = loaders()
+    if 'CSafeLoader' not in available:
+        print('PyYAML was built without libyaml; only SafeLoader is timed')
+    totals = dict.fromkeys(available, 0.0)
+    print(f'{"file":<40}' + ''.join(f'{name:>14}' for name in available))
+    for folder in options['--folders'].split(','):
+        for filepath in sorted(find_yaml_files(os.path.join(data_path, folder))):
+            with open(filepath, 'r') as stream:
+                text = stream.read()
+            times = {}
+            for name, loader in available.items():
+                times[name] = best_of(lambda: yaml.load(text, Loader=loader), number, repeat)
+                totals[name] += times[name]
+            label = os.path.relpath(filepath, data_path)
+            print(f'{label:<40}' + ''.join(f'{seconds * 1000:12.3f}ms' for seconds in times.values()))
+    print(f'{"total":<40}' + ''.join(f'{seconds * 1000:12.3f}ms' for seconds in totals.values()))
+    if 'CSafeLoader' in totals:
+        print(f'CSafeLoader is {totals["SafeLoader"] / totals["CSafeLoader"]:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares the legacy dict dijkstra with the grid engine
+
+Usage: bench_pathing.py [options]
+
+Options:
+    -m --map NAME        Map under lose/data/maps to run against [default: level0]
+    -n --number NUMBER   Number of runs per measurement [default: 20]
+    -r --repeat REPEAT   Number of measurements to take the best of [default: 5]
+"""
+import os
+import timeit
+from random import seed, choice
+
+from docopt import docopt
+
+import lose
+from lose.utils.algorithms.grid import Grid
+from lose.utils.algorithms.pathing import dijkstra, entry_costs, grid_dijkstra
+
+
+def read_map_nodes(map_name):
+    """Reads every (y, x) position of a shipped .map file.
+
+    The game builds its dijkstra maps over the whole level map, walls
+    included, so every character is a node.
+    """
+    package_path = os.path.dirname(lose.__file__)
+    map_path = os.path.join(package_path, 'data', 'maps', f'{map_name}.map')
+    nodes = {}
+    with open(map_path, 'r') as map_stream:
+        for y, line in enumerate(map_stream):
+            for x, character in enumerate(line.rstrip('\r\n')):
+                nodes[(y, x)] = character
+    return nodes
+
+
+def best_of(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main(argv=None):
+    options = docopt(__doc__, argv=argv)
+    number = int(options['--number'])
+    repeat = int(options['--repeat'])
+    graph = read_map_nodes(options['--map'])
+    seed(0)
+    start = choice([node for node, character in graph.items() if character == '.'])
+    grid = Grid.from_graph(graph)
+
+    for include_diagonals in (False, True):
+        def legacy():
+            return {node: cost for cost, node in dijkstra(graph, start, include_diagonals=include_diagonals)}
+
+        def engine():
+            costs = entry_costs(grid, start)
+            return grid_dijkstra(grid, start, costs=costs, include_diagonals=include_diagonals)
+
+        if grid.to_mapping(engine()) != legacy():
+            raise RuntimeError('Grid engine does not match the legacy dijkstra')
+        legacy_time = best_of(legacy, number, repeat)
+        engine_time = best_of(engine, number, repeat)
+        directions = 8 if include_diagonals else 4
+        print(f'{options["--map"]} ({directions} directions): '
+              f'legacy {legacy_time * 1000:.2f}ms, grid {engine_time * 1000:.2f}ms, '
+              f'{legacy_time / engine_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
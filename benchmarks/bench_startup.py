@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares cold and warm content loading
+
+A cold load parses every YAML file and writes the compiled bundles, a
+warm load reads them back from the content cache.  The bundles are kept
+in a temporary folder unless --cache-dir is given.
+
+Usage: bench_startup.py [options]
+
+Options:
+    -c --cache-dir PATH   Folder for the compiled bundles
+    -r --repeat REPEAT    Number of measurements to take the best of [default: 5]
+"""
+import os
+import time
+import tempfile
+
+from docopt import docopt
+
+from lose.utils import content_cache
+from lose.utils.data_loaders import load_yaml_data
+
+
+CONTENT = ['tiles', 'items', 'mobs']
+
+
+def load_content():
+    return {name: load_yaml_data(name) for name in CONTENT}
+
+
+def best_time(func, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    options = docopt(__doc__, argv=argv)
+    repeat = int(options['--repeat'])
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        os.environ['LOSE_CACHE_DIR'] = options['--cache-dir'] or temporary_dir
+        os.environ.pop('LOSE_NO_CACHE', None)
+        content_cache.cache_stats.clear()
+        cold = best_time(load_content, repeat, setup=lambda: content_cache.clear_cache(CONTENT))
+        cold_stats = dict(content_cache.cache_stats)
+        content_cache.cache_stats.clear()
+        warm = best_time(load_content, repeat)
+        warm_stats = dict(content_cache.cache_stats)
+    print(f'cold {cold * 1000:9.3f}ms  {cold_stats}')
+    print(f'warm {warm * 1000:9.3f}ms  {warm_stats}')
+    print(f'warm start is {cold / warm:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Times the pathing, distance and FOV hot paths
+
+Runs every benchmark on the shipped maps and on synthetic maps of each
+size and wall density, then prints the results as JSON.  Passing an
+earlier run with --compare adds the ratio against it to each result.
+
+The slowest benchmarks are skipped on the largest maps unless --full is
+given; skipped runs are still listed in the results.
+
+Usage: bench_suite.py [options]
+
+Options:
+    -s --sizes LIST       Comma separated synthetic map sizes [default: 64,256,1024,2048]
+    -d --densities LIST   Comma separated synthetic wall densities [default: 0.1,0.3]
+    -b --bench LIST       Comma separated benchmarks to run [default: all]
+    -r --repeat REPEAT    Number of measurements to take the best of [default: 3]
+    -o --output PATH      Write the JSON to a file instead of stdout
+    -c --compare PATH     Earlier JSON output to compare against
+    --full                Run every benchmark on every map size
+"""
+import os
+import sys
+import json
+import timeit
+import platform
+from collections import deque
+from datetime import datetime, timezone
+from random import seed
+
+import numpy as np
+import tcod
+from docopt import docopt
+
+import lose
+from lose.__metadata__ import __versionstr__ as version
+from lose.utils.algorithms import distances
+from lose.utils.algorithms.pathing import dijkstra, create_dijkstra_map
+from lose.utils.data_loaders import build_colors, load_level_map, load_tiles
+from lose.utils.terrain import compile_terrain
+from lose.utils.ui.rendering import build_map, mark_cells_dirty, render_level_map
+from synthetic_maps import generate_level_map, start_position
+
+
+def bench_dijkstra(case):
+    graph, start = case['graph'], case['start']
+    return {
+        'dijkstra': lambda: deque(dijkstra(graph, start, include_diagonals=True), maxlen=0),
+    }
+
+
+def bench_create_dijkstra_map(case):
+    graph, start = case['graph'], case['start']
+    return {
+        'create_dijkstra_map': lambda: create_dijkstra_map(graph, start, include_diagonals=True),
+    }
+
+
+def bench_distances(case):
+    start = case['start']
+    points = np.array(list(case['level_map']), dtype=np.intp)
+    sample = [tuple(point) for point in points[:1000].tolist()]
+    benchmarks = {
+        f'distances.{name}': (lambda kernel: lambda: kernel(start, points))(getattr(distances, name))
+        for name in ['manhattan_distances', 'euclidean_distances', 'octagonal_distances', 'log_distances']
+    }
+    benchmarks['distances.log_distance x1000'] = lambda: [distances.log_distance(start, point) for point in sample]
+    return benchmarks
+
+
+def bench_build_map(case):
+    game_state = level_state(case)
+    return {'build_map': lambda: build_map(game_state)}
+
+
+def bench_render_level_map(case):
+    game_state = level_state(case)
+    build_map(game_state)
+    render_level_map(game_state)
+    # Frames with nothing flagged are skipped, so each timed frame flags
+    # either the whole map or a few cells near the character
+    y, x = case['start']
+    few_cells = [(y + dy, x + dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+
+    def full_frame():
+        mark_cells_dirty(game_state)
+        render_level_map(game_state)
+
+    def few_cells_frame():
+        mark_cells_dirty(game_state, *few_cells)
+        render_level_map(game_state)
+
+    return {
+        'render_level_map': full_frame,
+        'render_level_map few cells': few_cells_frame,
+    }
+
+
+# Benchmark name: (function, largest map side run without --full)
+BENCHMARKS = {
+    'dijkstra': (bench_dijkstra, 256),
+    'create_dijkstra_map': (bench_create_dijkstra_map, 1024),
+    'distances': (bench_distances, None),
+    'build_map': (bench_build_map, 1024),
+    'render_level_map': (bench_render_level_map, 256),
+}
+
+
+def base_state():
+    """Loads the tile data every case shares."""
+    game_state = {'package-path': os.path.dirname(lose.__file__)}
+    load_tiles(game_state)
+    build_colors(game_state)
+    return game_state
+
+
+def level_state(case):
+    """Builds a minimal game state for the rendering benchmarks."""
+    height, width = case['height'], case['width']
+    game_state = dict(case['base-state'])
+    game_state.update({
+        'current-level': case['level_map'],
+        'character-position': case['start'],
+        'map-width': width,
+        'map-height': height,
+        'torch-radius': 8,
+        'fov-light-walls': True,
+        'fov-algorithm': 0,
+        'debug': False,
+        'windows': {'console': tcod.console_new(width, height)},
+    })
+    return game_state
+
+
+def make_case(base_state, name, level_map, start=None, density=None):
+    """Collects everything the benchmarks need for one map."""
+    grid, _ = compile_terrain(level_map, base_state['tiles'])
+    ys, xs = np.nonzero(grid.unpad(grid.passable))
+    nodes = list(zip((ys + grid.origin[0]).tolist(), (xs + grid.origin[1]).tolist()))
+    height, width = grid.shape
+    if start is None:
+        # The floor cell closest to the middle
+        middle = np.array([height / 2, width / 2])
+        start = nodes[int(np.argmin(np.abs(np.array(nodes) - middle).sum(axis=1)))]
+    return {
+        'name': name,
+        'width': width,
+        'height': height,
+        'density': density,
+        'level_map': level_map,
+        'graph': {node: level_map[node] for node in nodes},
+        'start': start,
+        'base-state': base_state,
+    }
+
+
+def iter_cases(base_state, sizes, densities):
+    maps_path = os.path.join(base_state['package-path'], 'data', 'maps')
+    for filename in sorted(os.listdir(maps_path)):
+        if filename.endswith('.map'):
+            seed(0)
+            level_map = load_level_map(base_state, os.path.join(maps_path, filename))
+            yield make_case(base_state, os.path.splitext(filename)[0], level_map)
+    for size in sizes:
+        for density in densities:
+            level_map = generate_level_map(size, size, density=density)
+            name = f'synthetic-{size}x{size}-{density}'
+            yield make_case(base_state, name, level_map, start=start_position(size, size), density=density)
+
+
+def measure(func, repeat):
+    """Times func, picking the number of calls per measurement automatically.
+
+    Returns:
+        tuple: (float: best seconds per call, int: calls per measurement)
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number, number
+
+
+def run(options):
+    sizes = [int(size) for size in options['--sizes'].split(',')]
+    densities = [float(density) for density in options['--densities'].split(',')]
+    repeat = int(options['--repeat'])
+    selected = list(BENCHMARKS) if options['--bench'] == 'all' else options['--bench'].split(',')
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+
+    results = []
+    for case in iter_cases(base_state(), sizes, densities):
+        for bench_name in selected:
+            bench, max_size = BENCHMARKS[bench_name]
+            result = {
+                'map': case['name'],
+                'width': case['width'],
+                'height': case['height'],
+                'density': case['density'],
+            }
+            if max_size and not options['--full'] and max(case['width'], case['height']) > max_size:
+                results.append(dict(result, benchmark=bench_name, skipped=f'larger than {max_size} (use --full)'))
+                continue
+            for name, func in bench(case).items():
+                seconds, number = measure(func, repeat)
+                results.append(dict(result, benchmark=name, seconds=seconds, number=number, repeat=repeat))
+                print(f'{case["name"]:>28} {name:<32} {seconds * 1000:10.3f}ms', file=sys.stderr)
+    return results
+
+
+def compare(results, baseline):
+    """Adds each result's ratio to the matching baseline result."""
+    previous = {
+        (result['benchmark'], result['map']): result['seconds']
+        for result in baseline.get('results', [])
+        if 'seconds' in result
+    }
+    for result in results:
+        key = (result['benchmark'], result['map'])
+        if 'seconds' in result and key in previous:
+            result['baseline'] = previous[key]
+            result['ratio'] = result['seconds'] / previous[key]
+    return results
+
+
+def main(argv=None):
+    options = docopt(__doc__, argv=argv)
+    results = run(options)
+    if options['--compare']:
+        with open(options['--compare'], 'r') as baseline_stream:
+            results = compare(results, json.load(baseline_stream))
+    report = {
+        'meta': {
+            'version': version,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'created': datetime.now(timezone.utc).isoformat(),
+            'options': {key.lstrip('-'): value for key, value in options.items()},
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if options['--output']:
+        with open(options['--output'], 'w') as output_stream:
+            output_stream.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
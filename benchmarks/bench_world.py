@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Walks across a generated chunked world
+
+The character walks diagonally across the world, one step per turn.
+Each step brings the terrain, the field of view and the goal maps up to
+date, which recompiles them whenever another chunk is entered.  The
+number of loaded chunks and the memory held by the world are reported
+to show they stay bounded however far the walk goes.
+
+Usage: bench_world.py [options]
+
+Options:
+    -s --size SIZE        Cells along each side of the world [default: 4096]
+    -n --steps STEPS      Steps to walk [default: 500]
+    -c --chunks CHUNKS    Chunks kept loaded [default: 64]
+"""
+import time
+import tracemalloc
+
+from docopt import docopt
+
+from lose.utils.data_loaders import load_world
+from lose.utils.goals import update_goal_maps
+from lose.utils.terrain import compute_fov
+
+
+def main(argv=None):
+    options = docopt(__doc__, argv=argv)
+    size = int(options['--size'])
+    steps = int(options['--steps'])
+    game_state = {'round-updates': {}, 'debug': False, 'torch-radius': 10, 'map-height': 42, 'map-width': 72}
+    world = load_world(game_state, shape=(size, size), seed=1, max_chunks=int(options['--chunks']))
+    game_state['current-level'] = world
+    tracemalloc.start()
+    start = time.perf_counter()
+    peaks = []
+    for step in range(steps):
+        position = (step % size, step % size)
+        world[position]['name'] = 'floor'
+        game_state['character-position'] = position
+        compute_fov(game_state)
+        update_goal_maps(game_state)
+        if step % (steps // 10 or 1) == 0:
+            peaks.append((step, len(world.chunks), tracemalloc.get_traced_memory()[0]))
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    print(f'{size}x{size} world, {steps} steps: {elapsed / steps * 1000:.3f}ms per step')
+    print(f'{world.loads} chunk loads, {world.evictions} evictions')
+    for step, chunks, memory in peaks:
+        print(f'step {step:6d}  {chunks:3d} chunks  {memory / 1024:9.1f}KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Generates synthetic level maps for benchmarking
+
+Maps are a floor with a wall border and randomly scattered walls.  The
+same size, density and seed always give the same map.
+"""
+import numpy as np
+
+
+def generate_passable(width, height, density=0.2, seed=0):
+    """Builds a random passability array.
+
+    Args:
+        width(int): number of columns
+        height(int): number of rows
+        density(float): fraction of the interior turned into walls
+        seed(int): random seed
+
+    Returns:
+        array: (height, width) boolean array; True is floor
+    """
+    rng = np.random.default_rng(seed)
+    passable = rng.random((height, width)) >= density
+    passable[[0, -1], :] = False
+    passable[:, [0, -1]] = False
+    # Keep a floor cell near the middle to start from
+    passable[height // 2, width // 2] = True
+    return passable
+
+
+def generate_level_map(width, height, density=0.2, seed=0):
+    """Builds a level map of floor and wall tiles.
+
+    Returns:
+        dict: mapping of (y, x) position to a level tile
+    """
+    passable = generate_passable(width, height, density=density, seed=seed)
+    names = np.where(passable, 'floor', 'wall').tolist()
+    return {
+        (y, x): {'name': name}
+        for y, row in enumerate(names)
+        for x, name in enumerate(row)
+    }
+
+
+def generate_map_text(width, height, density=0.2, seed=0):
+    """Renders a synthetic map in the .map file format.
+
+    Returns:
+        str: one line per row using ``.`` for floor and ``#`` for walls
+    """
+    passable = generate_passable(width, height, density=density, seed=seed)
+    rows = np.where(passable, '.', '#')
+    return '\n'.join(''.join(row) for row in rows) + '\n'
+
+
+def start_position(width, height):
+    """The floor cell kept open by :func:`generate_passable`."""
+    return (height // 2, width // 2)
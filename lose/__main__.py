@@ -12,6 +12,7 @@ Options:
     -r --framerate RATE  Set frame rate
     -v --verbose         Increase spam output
        --seed SEED       Set the seed
+       --world SIZE      Play a generated world of SIZE x SIZE cells
 """
 
 
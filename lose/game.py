@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import os
-import copy
 from random import seed, choice
 
 from docopt import docopt
@@ -8,10 +7,11 @@ from docopt import docopt
 from .utils.ui import main_menu
 from .__metadata__ import __versionstr__ as version
 from .utils.logger import get_logger
-from .utils.data_loaders import load_maps, load_mobs, load_items, load_tiles
+from .utils.entities import spawn
+from .utils.data_loaders import load_maps, load_mobs, load_items, load_tiles, load_world, prefetch_next_level
 
 
-def initialize_game(initial_seed=None, debug=False):
+def initialize_game(initial_seed=None, debug=False, world_size=None):
     """Generates a basic game state"""
     seed(initial_seed)
     if isinstance(initial_seed, str) and initial_seed.isdigit():
@@ -24,10 +24,18 @@ def initialize_game(initial_seed=None, debug=False):
         'panel-height': 7,
         'panel-width': 43,
         'limit-fps': 20,
-        'fov-algorithm': 0,
+        'fov-algorithm': 0,  # only used by the tcod fov backend
+        'fov-backend': 'shadowcast',  # or 'tcod'
         'fov-light-walls': True,
         'torch-radius': 8,
+        'player-health': 10,
+        'player-max-health': 10,
         'current-round': 0,
+        # Worker processes for building goal maps; 0 builds them in process
+        'pathing-workers': 0,
+        # Cells along each side of a generated chunked world; 0 plays the
+        # levels under data/maps instead
+        'world-size': world_size or 0,
 
         'debug': debug,
         'seed': initial_seed,
@@ -41,15 +49,22 @@ def initialize_game(initial_seed=None, debug=False):
     load_mobs(game_state)
     load_maps(game_state)
     for index, item_name in enumerate(game_state.get('player-inventory', [])):
-        item = copy.deepcopy(game_state['items'][item_name])
-        item['equipped'] = True
+        item = spawn(game_state['items'][item_name], equipped=True)
         game_state['player-inventory'][index] = item
 
-    map_name = 'level0'
-    level_map = game_state['maps'][map_name]
-    game_state['current-level'] = level_map
-
-    floors = [position for position, tile in level_map.items() if tile['name'] == 'floor']
+    if game_state['world-size']:
+        size = game_state['world-size']
+        world_seed = initial_seed if isinstance(initial_seed, int) else None
+        level_map = load_world(game_state, shape=(size, size), seed=world_seed)
+        game_state['current-level'] = level_map
+        # Only the chunk the character starts in is looked at
+        floors = level_map.find('floor', level_map.chunk_of((size // 2, size // 2)))
+    else:
+        map_name = 'level0'
+        level_map = game_state['maps'][map_name]
+        game_state['current-level'] = level_map
+        prefetch_next_level(game_state, map_name)
+        floors = level_map.find('floor')
     character_position = choice(floors)
     game_state['character-position'] = character_position
     return game_state
@@ -78,7 +93,8 @@ def runner(docstring=None, cli_arguments=None):
         initial_seed = opt_seed
     elif debug:
         initial_seed = 10
-    game_state = initialize_game(initial_seed=initial_seed, debug=debug)
+    world_size = int(options.get('--world') or 0)
+    game_state = initialize_game(initial_seed=initial_seed, debug=debug, world_size=world_size)
     logger.trace('Starting game')
     # logger.trace({'game_state': game_state})
     main_menu(game_state)
@@ -1,6 +1,115 @@
 # -*- coding: utf-8 -*-
-import math
-from itertools import zip_longest as lzip
+import numpy as np
+
+
+def _point(point):
+    """Replaces missing coordinates in a single point with 0."""
+    return [value or 0 for value in point]
+
+
+def _differences(x, y):
+    """Absolute coordinate differences between two sets of points.
+
+    Points with fewer coordinates are padded with 0, the same way the
+    scalar functions always treated missing coordinates.
+
+    Args:
+        x (array): a point or an (..., D) array of points
+        y (array): a point or an (..., D) array of points
+
+    Returns:
+        array: broadcast (..., D) array of absolute differences
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if x.ndim == 0 or y.ndim == 0:
+        raise TypeError('Distances require points, not scalars')
+    dimensions = max(x.shape[-1], y.shape[-1])
+    if x.shape[-1] < dimensions:
+        x = np.concatenate([x, np.zeros(x.shape[:-1] + (dimensions - x.shape[-1],), dtype=x.dtype)], axis=-1)
+    if y.shape[-1] < dimensions:
+        y = np.concatenate([y, np.zeros(y.shape[:-1] + (dimensions - y.shape[-1],), dtype=y.dtype)], axis=-1)
+    return np.abs(x - y)
+
+
+def _logged(distances):
+    distances = np.asarray(distances, dtype=float)
+    distances = np.where(distances == 0, 1 / 10**10, distances)
+    return 6 * np.log(distances)
+
+
+def manhattan_distances(x, y):
+    """Calculates the manhattan distance for many pairs of points.
+
+    Either argument may be a single point, which is broadcast against
+    the other (e.g. one origin against an (N, 2) array).
+
+    Args:
+        x (array): a point or an (..., D) array of points
+        y (array): a point or an (..., D) array of points
+
+    Returns:
+        array: the distances between x and y
+    """
+    return _differences(x, y).sum(axis=-1)
+
+
+def euclidean_distances(x, y):
+    """Calculates the euclidean distance for many pairs of points.
+
+    Args:
+        x (array): a point or an (..., D) array of points
+        y (array): a point or an (..., D) array of points
+
+    Returns:
+        array: the distances between x and y
+    """
+    diffs = _differences(x, y)
+    return np.sqrt((diffs ** 2).sum(axis=-1))
+
+
+def octagonal_distances(x, y):
+    """Calculates the octagonal distance for many pairs of points.
+
+    Uses the same fixed point arithmetic as :func:`octagonal_distance`,
+    so results are bit for bit identical.
+
+    Args:
+        x (array): a point or an (..., 2) array of integer points
+        y (array): a point or an (..., 2) array of integer points
+
+    Returns:
+        array: the distances between x and y
+    """
+    diffs = _differences(x, y)
+    if diffs.shape[-1] != 2:
+        raise TypeError('This distance is only valid in 2D')
+    diffs = diffs.astype(np.int64, casting='safe')
+    diff_min = diffs.min(axis=-1)
+    diff_max = diffs.max(axis=-1)
+    approximation = diff_max * 1007 + diff_min * 441
+    correction = np.where(diff_max < (diff_min << 4), diff_max * 40, 0)
+    corrected_approximation = approximation - correction
+    return (corrected_approximation + 512) >> 10
+
+
+def log_distances(x, y, func=None, k=None):
+    """Calculates the log distance for many pairs of points.
+
+    Args:
+        x (array): a point or an (..., D) array of points
+        y (array): a point or an (..., D) array of points
+        func (callback):  batch distance function to take the log of [default: octagonal_distances]
+        k (numeric): a factor  [default: 1.2]
+
+    Returns:
+        array: the distances between x and y
+    """
+    if k is None:
+        k = 1.2
+    if func is None:
+        func = octagonal_distances
+    return _logged(func(x, y))
 
 
 def manhattan_distance(x, y):
@@ -16,8 +125,7 @@ def manhattan_distance(x, y):
     Returns:
         int:  the distance calculated between point x and point y
     """
-    diffs = [abs((xval or 0) - (yval or 0)) for xval, yval in lzip(x, y)]
-    return sum(diffs)
+    return manhattan_distances(_point(x), _point(y)).item()
 
 
 def euclidean_distance(x, y):
@@ -33,10 +141,7 @@ def euclidean_distance(x, y):
     Returns:
         float:  the distance calculated between point x and point y
     """
-    distance = 0
-    diffs = [abs((xval or 0) - (yval or 0)) for xval, yval in lzip(x, y)]
-    distance = math.sqrt(sum(diff**2 for diff in diffs))
-    return distance
+    return float(euclidean_distances(_point(x), _point(y)))
 
 
 def octagonal_distance(x, y):
@@ -54,17 +159,7 @@ def octagonal_distance(x, y):
     Returns:
         int:  the distance calculated between point x and point y
     """
-    distance = 0
-    diffs = [abs((xval or 0) - (yval or 0)) for xval, yval in lzip(x, y)]
-    if len(diffs) != 2:
-        raise TypeError('This distance is only valid in 2D')
-    diff_min = min(diffs)
-    diff_max = max(diffs)
-    approximation = diff_max * 1007 + diff_min * 441
-    correction = diff_max * 40 if diff_max < (diff_min << 4) else 0
-    corrected_approximation = approximation - correction
-    distance = (corrected_approximation + 512) >> 10
-    return distance
+    return int(octagonal_distances(_point(x), _point(y)))
 
 
 def log_distance(x, y, func=None, k=None):
@@ -83,12 +178,8 @@ def log_distance(x, y, func=None, k=None):
     Returns:
         int:  the distance calculated between point x and point y
     """
-    if k is None:
-        k = 1.2
     if func is None:
-        func = octagonal_distance
-    distance = func(x, y)
-    if distance == 0:
-        distance = 1 / 10**10
-    logged_distance = 6 * math.log(distance)
-    return logged_distance
+        distance = octagonal_distances(_point(x), _point(y))
+    else:
+        distance = func(x, y)
+    return float(_logged(distance))
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import math
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .grid import Grid
+from .pathing import DijkstraMap, seeded_dijkstra
+
+
+# Grid of the batch a worker process is currently serving
+_worker_grids = {}
+
+
+class PathingExecutor(object):
+    """Builds independent dijkstra maps in a pool of worker processes.
+
+    The grid's passability and entry costs are copied into shared memory
+    once per batch, so workers attach to them by name rather than
+    unpickling the level.  Only the sources of each map and the finished
+    cost arrays travel through the pool.
+
+    Args:
+        max_workers (int): number of worker processes [default: number of CPUs]
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._pool = None
+        self._blocks = {}  # name: SharedMemory of batches still running
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} [{self.max_workers or "cpus"} workers]>'
+        return string
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def shutdown(self):
+        """Stops the worker processes and frees any shared memory still held."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        self._release(list(self._blocks.values()))
+
+    def _release(self, blocks):
+        for block in blocks:
+            if self._blocks.pop(block.name, None) is not None:
+                block.close()
+                block.unlink()
+
+    def build_costs(self, grid, goals, costs=None, include_diagonals=None, diagonal_cost=None):
+        """Computes the costs of several multi-source maps at once.
+
+        Args:
+            grid (Grid): passability of the map
+            goals (dict): mapping of name to a list of source nodes
+            costs (array): map shaped entry cost per cell [default: 1 everywhere]
+            include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+            diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+
+        Returns:
+            dict: mapping of name to a map shaped float array of costs; unreached cells are inf
+        """
+        passable = grid.unpad(grid.passable)
+        costs = np.ones(grid.shape) if costs is None else np.asarray(costs, dtype=float)
+        blocks = [share_array(passable), share_array(costs)]
+        self._blocks.update((block.name, block) for block in blocks)
+        try:
+            layout = {
+                'passable': (blocks[0].name, passable.shape, passable.dtype.str),
+                'costs': (blocks[1].name, costs.shape, costs.dtype.str),
+                'origin': grid.origin,
+                'include_diagonals': include_diagonals,
+                'diagonal_cost': diagonal_cost,
+            }
+            futures = {
+                name: self.pool.submit(build_costs, layout, [tuple(source) for source in sources])
+                for name, sources in goals.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
+        finally:
+            self._release(blocks)
+
+    def build_maps(self, grid, goals, costs=None, include_diagonals=None, diagonal_cost=None):
+        """Builds several :class:`~.pathing.DijkstraMap` at once.
+
+        The maps are the same as building each one in process and can be
+        repaired in place afterwards.
+
+        Args:
+            grid (Grid): passability of the map
+            goals (dict): mapping of name to a list of source nodes
+            costs (array): map shaped entry cost per cell [default: 1 everywhere]
+            include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+            diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+
+        Returns:
+            dict: mapping of name to goal map
+        """
+        results = self.build_costs(
+            grid, goals, costs=costs, include_diagonals=include_diagonals, diagonal_cost=diagonal_cost
+        )
+        return {
+            name: DijkstraMap(
+                grid, goals[name], costs=costs, include_diagonals=include_diagonals,
+                diagonal_cost=diagonal_cost, distances=results[name],
+            )
+            for name in goals
+        }
+
+
+def build_costs(layout, sources):
+    """Worker side of :meth:`PathingExecutor.build_costs`.
+
+    Args:
+        layout (dict): shared memory names, shapes and dtypes plus search options
+        sources (list): nodes with a cost of 0
+
+    Returns:
+        array: map shaped float array of costs; unreached cells are inf
+    """
+    blocks = []
+    arrays = {}
+    try:
+        for key in ('passable', 'costs'):
+            name, shape, dtype = layout[key]
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        # Workers see every map of a batch, so the grid (and its
+        # neighbor tables) is only built once per batch
+        name = layout['passable'][0]
+        if name not in _worker_grids:
+            _worker_grids.clear()
+            _worker_grids[name] = Grid(arrays['passable'], origin=layout['origin'])
+        grid = _worker_grids[name]
+        initial = np.full(grid.shape, math.inf)
+        for y, x in sources:
+            initial[y - grid.origin[0], x - grid.origin[1]] = 0
+        return seeded_dijkstra(
+            grid, initial, costs=arrays['costs'],
+            include_diagonals=layout['include_diagonals'], diagonal_cost=layout['diagonal_cost'],
+        )
+    finally:
+        # Views have to be dropped before their blocks can be closed
+        arrays.clear()
+        for block in blocks:
+            block.close()
+
+
+def share_array(array):
+    """Copies an array into a new shared memory block.
+
+    The caller owns the block and has to close and unlink it.
+
+    Returns:
+        SharedMemory: the block holding a copy of array
+    """
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+# Octant transforms for shadowcasting: (xx, xy, yx, yy)
+OCTANTS = [
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+]
+
+
+class FieldOfView(object):
+    """Visibility over a transparency array with a cached result.
+
+    The last visibility mask is kept and only recomputed when the
+    viewer, the radius or the transparency changes, so asking again on
+    a turn where nothing moved is free.  The mask is a plain boolean
+    array that rendering and AI can index directly.
+
+    Positions are absolute: ``origin`` is the position of the first cell
+    of the transparency array, so a field of view can cover part of a
+    larger world.
+
+    Args:
+        transparent (array): 2D boolean array; True lets light through
+        backend (str): ``shadowcast`` or ``tcod`` [default: shadowcast]
+        algorithm (int): tcod FOV algorithm for the ``tcod`` backend [default: 0]
+        origin (tuple): (int: y, int: x) position of the first cell [default: (0, 0)]
+    """
+
+    def __init__(self, transparent, backend=None, algorithm=None, origin=None):
+        transparent = np.array(transparent, dtype=bool)
+        if transparent.ndim != 2:
+            raise ValueError('Field of view requires a 2D transparency array')
+        self.backend = backend or 'shadowcast'
+        if self.backend not in backends:
+            raise ValueError(f'Unknown field of view backend: {self.backend}')
+        self.algorithm = algorithm or 0
+        self.transparent = transparent
+        self.origin = tuple(origin or (0, 0))
+        self.mask = np.zeros(transparent.shape, dtype=bool)
+        self.computes = 0
+        self._key = None
+        self._version = 0
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {self.transparent.shape} [{self.backend}]>'
+        return string
+
+    def set_transparent(self, node, transparent=True):
+        """Changes whether a single cell lets light through.
+
+        Args:
+            node (tuple): (int: y, int: x) position
+            transparent (bool): whether light passes [default: True]
+        """
+        node = self._local(node)
+        if self.transparent[node] != transparent:
+            self.transparent[node] = transparent
+            self._version += 1
+
+    def _local(self, node):
+        (y, x), (oy, ox) = node, self.origin
+        return (y - oy, x - ox)
+
+    def contains(self, node):
+        """Finds whether a position is covered by the transparency array."""
+        y, x = self._local(node)
+        height, width = self.transparent.shape
+        return 0 <= y < height and 0 <= x < width
+
+    def compute(self, origin, radius=None, light_walls=True):
+        """Brings the visibility mask up to date for a viewer.
+
+        Args:
+            origin (tuple): (int: y, int: x) position of the viewer
+            radius (int): how far the viewer sees; 0 or None is unlimited
+            light_walls (bool): whether opaque cells in view are visible [default: True]
+
+        Returns:
+            array: the boolean visibility mask, shaped like the transparency
+        """
+        key = (tuple(origin), radius or 0, bool(light_walls), self._version)
+        if key != self._key:
+            self.mask = backends[self.backend](self, self._local(origin), radius or 0, bool(light_walls))
+            self._key = key
+            self.computes += 1
+        return self.mask
+
+    def view(self, top, left, height, width):
+        """Cuts a rectangle out of the last visibility mask.
+
+        Args:
+            top (int): first row, as an absolute position
+            left (int): first column, as an absolute position
+            height (int): rows in the rectangle
+            width (int): columns in the rectangle
+
+        Returns:
+            array: (height, width) boolean mask; cells outside the transparency aren't visible
+        """
+        oy, ox = self.origin
+        rows, columns = self.mask.shape
+        view = np.zeros((height, width), dtype=bool)
+        y0, x0 = max(top, oy), max(left, ox)
+        y1, x1 = min(top + height, oy + rows), min(left + width, ox + columns)
+        if y0 < y1 and x0 < x1:
+            view[y0 - top:y1 - top, x0 - left:x1 - left] = self.mask[y0 - oy:y1 - oy, x0 - ox:x1 - ox]
+        return view
+
+
+def shadowcast(transparent, origin, radius=None, light_walls=True):
+    """Recursive shadowcasting field of view.
+
+    Each of the eight octants is scanned row by row moving away from
+    the viewer, narrowing the visible slope range whenever an opaque
+    cell casts a shadow.  Only the square around the viewer that the
+    radius can reach is read.
+
+    See: http://www.roguebasin.com/index.php?title=FOV_using_recursive_shadowcasting
+
+    Args:
+        transparent (array): 2D boolean array; True lets light through
+        origin (tuple): (int: y, int: x) position of the viewer
+        radius (int): how far the viewer sees; 0 or None is unlimited
+        light_walls (bool): whether opaque cells in view are visible [default: True]
+
+    Returns:
+        array: boolean visibility mask shaped like transparent
+    """
+    transparent = np.asarray(transparent, dtype=bool)
+    height, width = transparent.shape
+    oy, ox = origin
+    mask = np.zeros((height, width), dtype=bool)
+    if not (0 <= oy < height and 0 <= ox < width):
+        return mask
+    reach = radius or max(height, width)
+    top, left = max(oy - reach, 0), max(ox - reach, 0)
+    bottom, right = min(oy + reach + 1, height), min(ox + reach + 1, width)
+    window = transparent[top:bottom, left:right].tolist()
+    visible = set()
+    cy, cx = oy - top, ox - left
+    rows, columns = bottom - top, right - left
+    radius_squared = reach * reach
+
+    def blocks(x, y):
+        return not (0 <= y < rows and 0 <= x < columns) or not window[y][x]
+
+    def cast_light(row, start, end, xx, xy, yx, yy):
+        if start < end:
+            return
+        new_start = start
+        for distance in range(row, reach + 1):
+            dx, dy = -distance - 1, -distance
+            blocked = False
+            while dx <= 0:
+                dx += 1
+                x, y = cx + dx * xx + dy * xy, cy + dx * yx + dy * yy
+                left_slope, right_slope = (dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5)
+                if start < right_slope:
+                    continue
+                if end > left_slope:
+                    break
+                if dx * dx + dy * dy <= radius_squared and 0 <= y < rows and 0 <= x < columns:
+                    visible.add((y, x))
+                if blocked:
+                    if blocks(x, y):
+                        new_start = right_slope
+                        continue
+                    blocked = False
+                    start = new_start
+                elif blocks(x, y) and distance < reach:
+                    blocked = True
+                    cast_light(distance + 1, start, left_slope, xx, xy, yx, yy)
+                    new_start = right_slope
+            if blocked:
+                break
+
+    for xx, xy, yx, yy in OCTANTS:
+        cast_light(1, 1.0, 0.0, xx, xy, yx, yy)
+    visible.add((cy, cx))
+    if visible:
+        ys, xs = np.array(list(visible)).T
+        mask[ys + top, xs + left] = True
+    if not light_walls:
+        mask &= transparent
+        mask[oy, ox] = True
+    return mask
+
+
+def shadowcast_backend(fov, origin, radius, light_walls):
+    return shadowcast(fov.transparent, origin, radius=radius, light_walls=light_walls)
+
+
+def tcod_backend(fov, origin, radius, light_walls):
+    """Computes the mask with libtcod, which is only imported when used."""
+    import tcod.map
+
+    height, width = fov.transparent.shape
+    if not (0 <= origin[0] < height and 0 <= origin[1] < width):
+        return np.zeros((height, width), dtype=bool)
+    return tcod.map.compute_fov(
+        fov.transparent, origin, radius=radius, light_walls=light_walls, algorithm=fov.algorithm
+    )
+
+
+# Field of view backends by name
+backends = {
+    'shadowcast': shadowcast_backend,
+    'tcod': tcod_backend,
+}
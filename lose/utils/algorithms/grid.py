@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+CARDINALS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+DIAGONALS = [(1, 1), (1, -1), (-1, -1), (-1, 1)]
+# Flow fields store an index into this list
+DIRECTIONS = CARDINALS + DIAGONALS
+
+
+class Grid(object):
+    """A flat, array-backed view of a level map used for pathing.
+
+    Nodes are stored as flat integer indices (``y * width + x``) into
+    contiguous NumPy arrays.  The grid carries a one cell impassable
+    border so that neighbor lookups in the search loops never need a
+    bounds check; ``width`` and ``height`` include that border while
+    ``shape`` is the size of the original map.
+
+    Args:
+        passable (array): 2D boolean array of shape (height, width)
+        origin (tuple): (int: y, int: x) position of the top left cell [default: (0, 0)]
+    """
+
+    def __init__(self, passable, origin=None):
+        passable = np.asarray(passable, dtype=bool)
+        if passable.ndim != 2:
+            raise ValueError('Grid requires a 2D passability array')
+        self.shape = passable.shape
+        self.origin = origin or (0, 0)
+        self.height = self.shape[0] + 2
+        self.width = self.shape[1] + 2
+        self.passable = np.zeros((self.height, self.width), dtype=bool)
+        self.passable[1:-1, 1:-1] = passable
+        self.size = self.height * self.width
+        self._neighbors = {}
+        self._flat_passable = None
+        self._lowest_costs = {}  # id(costs): (costs, lowest cost of a passable cell)
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        height, width = self.shape
+        origin = self.origin
+        string = f'<{cname} [{origin} -> ({height}, {width})]>'
+        return string
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Builds a grid from a collection of ``(y, x)`` nodes.
+
+        Every node found in graph is considered passable.
+
+        Args:
+            graph (dict): a set of nodes; typically a level map
+
+        Returns:
+            Grid: the grid covering the bounding box of graph
+        """
+        if not graph:
+            raise ValueError('Cannot build a grid from an empty graph')
+        nodes = np.array(list(graph), dtype=np.intp).reshape(-1, 2)
+        y_min, x_min = nodes.min(axis=0)
+        y_max, x_max = nodes.max(axis=0)
+        passable = np.zeros((y_max - y_min + 1, x_max - x_min + 1), dtype=bool)
+        passable[nodes[:, 0] - y_min, nodes[:, 1] - x_min] = True
+        return cls(passable, origin=(int(y_min), int(x_min)))
+
+    def index(self, node):
+        """Converts a ``(y, x)`` node into a flat index."""
+        y, x = node
+        return (y - self.origin[0] + 1) * self.width + (x - self.origin[1] + 1)
+
+    def node(self, index):
+        """Converts a flat index back into a ``(y, x)`` node."""
+        y, x = divmod(index, self.width)
+        return (y - 1 + self.origin[0], x - 1 + self.origin[1])
+
+    def contains(self, node, passable=True):
+        """Checks that a node lies on the grid.
+
+        Args:
+            node (tuple): (int: y, int: x) position
+            passable (bool): also require the cell to be passable [default: True]
+        """
+        y, x = node
+        y, x = y - self.origin[0] + 1, x - self.origin[1] + 1
+        if not (0 < y < self.height - 1 and 0 < x < self.width - 1):
+            return False
+        return bool(self.passable[y, x]) if passable else True
+
+    def neighbors(self, include_diagonals=None):
+        """Passable neighbors of every cell, indexed by flat index.
+
+        The table is built once per grid and direction set.
+
+        Returns:
+            list: tuple of neighboring flat indices for each flat index
+        """
+        include_diagonals = bool(include_diagonals)
+        if include_diagonals not in self._neighbors:
+            offsets = np.array([offset for offset, _ in self.offsets(include_diagonals)])
+            passable = self.passable.ravel()
+            interior = self.unpad(np.arange(self.size)).ravel()
+            candidates = interior[:, None] + offsets[None, :]
+            table = [()] * self.size
+            for index, row, mask in zip(interior.tolist(), candidates, passable[candidates]):
+                table[index] = tuple(row[mask].tolist())
+            self._neighbors[include_diagonals] = table
+        return self._neighbors[include_diagonals]
+
+    def set_passable(self, node, passable=True):
+        """Changes the passability of a single cell.
+
+        Cached neighbor tables are patched around the cell rather than
+        rebuilt.
+
+        Args:
+            node (tuple): (int: y, int: x) position
+            passable (bool): whether the cell can be entered [default: True]
+        """
+        if not self.contains(node, passable=False):
+            raise ValueError(f'{node} is not on the grid')
+        index = self.index(node)
+        flat = self.passable.ravel()
+        if flat[index] == passable:
+            return
+        flat[index] = passable
+        if self._flat_passable is not None:
+            self._flat_passable[index] = bool(passable)
+        self._lowest_costs.clear()
+        for include_diagonals, table in self._neighbors.items():
+            offsets = [offset for offset, _ in self.offsets(include_diagonals)]
+            for cell in [index] + [index + offset for offset in offsets]:
+                y, x = divmod(cell, self.width)
+                if not (0 < y < self.height - 1 and 0 < x < self.width - 1):
+                    continue
+                table[cell] = tuple(cell + offset for offset in offsets if flat[cell + offset])
+
+    @property
+    def flat_passable(self):
+        """Passability by flat index as a list, built once per grid."""
+        if self._flat_passable is None:
+            self._flat_passable = self.passable.ravel().tolist()
+        return self._flat_passable
+
+    def lowest_cost(self, costs):
+        """Finds the lowest entry cost of any passable cell.
+
+        The result is kept per cost array until passability changes.
+        Costs changed in place have to be dropped with :meth:`forget_costs`.
+
+        Args:
+            costs (array): map shaped entry cost per cell
+
+        Returns:
+            float: the lowest cost; 0 when no cell is passable
+        """
+        cached = self._lowest_costs.get(id(costs))
+        if cached is None or cached[0] is not costs:
+            passable = self.unpad(self.passable)
+            lowest = float(np.asarray(costs)[passable].min()) if passable.any() else 0
+            cached = self._lowest_costs[id(costs)] = (costs, lowest)
+        return cached[1]
+
+    def forget_costs(self):
+        """Drops the lowest costs kept by :meth:`lowest_cost`."""
+        self._lowest_costs.clear()
+
+    def nodes(self):
+        """Provides the ``(y, x)`` position of every cell as two arrays.
+
+        Returns:
+            tuple: (array: ys, array: xs) each with the map's shape
+        """
+        ys, xs = np.indices(self.shape)
+        return ys + self.origin[0], xs + self.origin[1]
+
+    def offsets(self, include_diagonals=None):
+        """Flat index offsets for each neighbor direction.
+
+        Returns:
+            list: (int: offset, bool: diagonal) for every direction
+        """
+        directions = [(offset, False) for offset in CARDINALS]
+        if include_diagonals:
+            directions.extend((offset, True) for offset in DIAGONALS)
+        return [(dy * self.width + dx, diagonal) for (dy, dx), diagonal in directions]
+
+    def pad(self, values, fill=0):
+        """Pads a map shaped array out to the bordered grid shape."""
+        values = np.asarray(values)
+        padded = np.full((self.height, self.width), fill, dtype=values.dtype)
+        padded[1:-1, 1:-1] = values
+        return padded
+
+    def unpad(self, values):
+        """Strips the border from a grid shaped array."""
+        return np.asarray(values).reshape(self.height, self.width)[1:-1, 1:-1]
+
+    def to_mapping(self, costs):
+        """Converts a map shaped cost array into a ``{node: cost}`` dict.
+
+        Unreached (infinite) cells are left out of the mapping.
+        """
+        costs = np.asarray(costs)
+        ys, xs = np.nonzero(np.isfinite(costs))
+        values = costs[ys, xs].tolist()
+        ys = (ys + self.origin[0]).tolist()
+        xs = (xs + self.origin[1]).tolist()
+        return dict(zip(zip(ys, xs), values))
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+import math
+import heapq
+
+import numpy as np
+
+from .grid import Grid
+from .pathing import grid_dijkstra
+from .search import astar
+
+
+class ClusterGraph(object):
+    """Hierarchical path finding (HPA*) over a :class:`~.grid.Grid`.
+
+    The grid is cut into square clusters.  Wherever two neighboring
+    clusters share open border cells an entrance is placed on each side,
+    and the cost between every pair of entrances of a cluster is
+    precomputed.  Long range queries search that small abstract graph
+    first and only then refine each hop with a search confined to one
+    cluster.  Paths are close to, but not always exactly, optimal, and
+    clusters are only entered through cardinal steps across a border.
+
+    Borders are scanned up front, but a cluster's entrance costs are
+    only computed once a query reaches it.  The grid and costs are read
+    in place; after cells change call :meth:`update` and only the
+    clusters touching them are rebuilt, on the next query.
+
+    See: Botea, Müller & Schaeffer, "Near Optimal Hierarchical Path-Finding" (2004)
+
+    Args:
+        grid (Grid): passability of the map
+        cluster_size (int): width and height of each cluster [default: 16]
+        costs (array): map shaped entry cost per cell [default: 1 everywhere]
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+    """
+
+    def __init__(self, grid, cluster_size=None, costs=None, include_diagonals=None, diagonal_cost=None):
+        self.grid = grid
+        self.cluster_size = cluster_size or 16
+        self.costs = np.ones(grid.shape) if costs is None else costs
+        self.include_diagonals = bool(include_diagonals)
+        self.diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+        height, width = grid.shape
+        self.shape = (-(-height // self.cluster_size), -(-width // self.cluster_size))
+        self.dirty = {(cy, cx) for cy in range(self.shape[0]) for cx in range(self.shape[1])}
+        self._borders = {}  # (cluster, cluster): [(node, node), ...]
+        self._entrances = {}  # cluster: set of nodes
+        self._inter = {}  # node: {node: cost} across borders
+        self._intra = {}  # cluster: {node: {node: cost}}
+        self._local = {}  # node: cluster shaped costs from that entrance
+        self._subgrids = {}  # cluster: (Grid, costs)
+        self._cheapest = 1
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {self.shape} clusters of {self.cluster_size} [{self.grid}]>'
+        return string
+
+    def cluster(self, node):
+        """Finds the ``(cy, cx)`` cluster holding a node."""
+        y, x = node
+        return ((y - self.grid.origin[0]) // self.cluster_size, (x - self.grid.origin[1]) // self.cluster_size)
+
+    def bounds(self, cluster):
+        """Row and column ranges of a cluster, relative to the map.
+
+        Returns:
+            tuple: (int: top, int: bottom, int: left, int: right); bottom and right are exclusive
+        """
+        cy, cx = cluster
+        height, width = self.grid.shape
+        top, left = cy * self.cluster_size, cx * self.cluster_size
+        return top, min(top + self.cluster_size, height), left, min(left + self.cluster_size, width)
+
+    def entrances(self, cluster):
+        """Entrance nodes of a cluster."""
+        self.refresh()
+        return set(self._entrances.get(cluster, ()))
+
+    def update(self, nodes):
+        """Flags the clusters holding changed nodes for a rebuild.
+
+        Passability and cost changes should already be applied to the
+        grid and costs.
+
+        Args:
+            nodes (list): nodes whose passability or entry cost changed
+        """
+        for node in nodes:
+            self.dirty.add(self.cluster(node))
+
+    def refresh(self):
+        """Rebuilds the clusters flagged by :meth:`update`."""
+        if not self.dirty:
+            return
+        changed = set(self.dirty)
+        for cluster in self.dirty:
+            self._subgrids.pop(cluster, None)
+        for cluster in self.dirty:
+            cy, cx = cluster
+            for other in [(cy - 1, cx), (cy + 1, cx), (cy, cx - 1), (cy, cx + 1)]:
+                if not (0 <= other[0] < self.shape[0] and 0 <= other[1] < self.shape[1]):
+                    continue
+                key = tuple(sorted([cluster, other]))
+                transitions = self._find_transitions(*key)
+                if transitions != self._borders.get(key):
+                    self._borders[key] = transitions
+                    changed.update(key)
+
+        passable = self.grid.unpad(self.grid.passable)
+        self._cheapest = float(self.costs[passable].min()) if passable.any() else 0
+        self._inter = {}
+        for key, transitions in self._borders.items():
+            for a, b in transitions:
+                self._inter.setdefault(a, {})[b] = self._cost(b)
+                self._inter.setdefault(b, {})[a] = self._cost(a)
+        for cluster in changed:
+            entrances = set()
+            cy, cx = cluster
+            for other in [(cy - 1, cx), (cy + 1, cx), (cy, cx - 1), (cy, cx + 1)]:
+                key = tuple(sorted([cluster, other]))
+                for a, b in self._borders.get(key, []):
+                    entrances.add(a if key[0] == cluster else b)
+            for node in self._entrances.get(cluster, set()):
+                self._local.pop(node, None)
+            self._entrances[cluster] = entrances
+            self._intra.pop(cluster, None)
+        self.dirty.clear()
+
+    def path(self, start, goal):
+        """Finds a path between two passable nodes.
+
+        Args:
+            start (node): the starting position
+            goal (node): the ending position
+
+        Returns:
+            list: nodes from start to goal inclusive; None if goal can't be reached
+        """
+        if not self.grid.contains(start) or not self.grid.contains(goal):
+            return None
+        self.refresh()
+        if start == goal:
+            return [start]
+        start_cluster, goal_cluster = self.cluster(start), self.cluster(goal)
+        start_costs = self._search_cluster(start_cluster, start)
+        start_edges = self._edges_to(start_cluster, start_costs, self._entrances[start_cluster])
+        if start_cluster == goal_cluster:
+            cost = self._cost_at(start_cluster, start_costs, goal)
+            if cost is not None:
+                start_edges[goal] = cost
+        goal_edges = {}
+        self._cluster_edges(goal_cluster)
+        for entrance in self._entrances[goal_cluster]:
+            cost = self._cost_at(goal_cluster, self._local[entrance], goal)
+            if cost is not None:
+                goal_edges[entrance] = cost
+
+        hops = self._search_abstract(start, goal, start_edges, goal_edges)
+        if hops is None:
+            return None
+        path = [start]
+        for node, next_node in zip(hops, hops[1:]):
+            cluster = self.cluster(node)
+            if cluster != self.cluster(next_node):
+                path.append(next_node)  # entrances across a border are adjacent
+                continue
+            subgrid, costs = self._subgrid(cluster)
+            local = astar(
+                subgrid, node, next_node, costs=costs,
+                include_diagonals=self.include_diagonals, diagonal_cost=self.diagonal_cost,
+            )
+            path.extend(local[1:])
+        return path
+
+    def _cluster_edges(self, cluster):
+        """Entrance to entrance costs of a cluster, built on first use."""
+        if cluster not in self._intra:
+            entrances = self._entrances[cluster]
+            edges = {}
+            for entrance in entrances:
+                costs = self._search_cluster(cluster, entrance)
+                self._local[entrance] = costs
+                edges[entrance] = self._edges_to(cluster, costs, entrances - {entrance})
+            self._intra[cluster] = edges
+        return self._intra[cluster]
+
+    def _cost(self, node):
+        y, x = node
+        return float(self.costs[y - self.grid.origin[0], x - self.grid.origin[1]])
+
+    def _cost_at(self, cluster, costs, node):
+        top, _, left, _ = self.bounds(cluster)
+        cost = costs[node[0] - self.grid.origin[0] - top, node[1] - self.grid.origin[1] - left]
+        return None if math.isinf(cost) else float(cost)
+
+    def _edges_to(self, cluster, costs, nodes):
+        edges = {}
+        for node in nodes:
+            cost = self._cost_at(cluster, costs, node)
+            if cost is not None:
+                edges[node] = cost
+        return edges
+
+    def _find_transitions(self, first, second):
+        """Places entrances along the border between two clusters.
+
+        Each run of cells open on both sides gets a transition in its
+        middle, or one at each end when the run is long.
+        """
+        passable = self.grid.unpad(self.grid.passable)
+        top, bottom, left, right = self.bounds(first)
+        if first[0] == second[0]:
+            # Side by side: the border runs down first's right edge
+            cells = [((y, right - 1), (y, right)) for y in range(top, bottom)]
+        else:
+            # Stacked: the border runs along first's bottom edge
+            cells = [((bottom - 1, x), (bottom, x)) for x in range(left, right)]
+        transitions = []
+        run = []
+        for a, b in cells + [(None, None)]:
+            if a is not None and passable[a] and passable[b]:
+                run.append((a, b))
+                continue
+            if len(run) >= 6:
+                transitions.extend([run[0], run[-1]])
+            elif run:
+                transitions.append(run[len(run) // 2])
+            run = []
+        oy, ox = self.grid.origin
+        return [((ay + oy, ax + ox), (by + oy, bx + ox)) for (ay, ax), (by, bx) in transitions]
+
+    def _heuristic(self, node, goal):
+        dy, dx = abs(node[0] - goal[0]), abs(node[1] - goal[1])
+        if self.include_diagonals:
+            estimate = abs(dy - dx) + min(self.diagonal_cost, 2) * min(dy, dx)
+        else:
+            estimate = dy + dx
+        return estimate * self._cheapest
+
+    def _search_abstract(self, start, goal, start_edges, goal_edges):
+        """A* over the entrances, with start and goal wired in."""
+        distances = {start: 0}
+        parents = {start: None}
+        queue = [(self._heuristic(start, goal), 0, start)]
+        while queue:
+            _, node_cost, node = heapq.heappop(queue)
+            if node == goal:
+                hops = []
+                while node is not None:
+                    hops.append(node)
+                    node = parents[node]
+                return hops[::-1]
+            if node_cost > distances[node]:
+                continue  # stale queue entry
+            if node == start:
+                edges = list(start_edges.items())
+                edges.extend(self._inter.get(node, {}).items())
+            else:
+                edges = list(self._cluster_edges(self.cluster(node)).get(node, {}).items())
+                edges.extend(self._inter.get(node, {}).items())
+                if node in goal_edges:
+                    edges.append((goal, goal_edges[node]))
+            for neighbor, edge_cost in edges:
+                neighbor_cost = node_cost + edge_cost
+                if neighbor_cost < distances.get(neighbor, math.inf):
+                    distances[neighbor] = neighbor_cost
+                    parents[neighbor] = node
+                    heapq.heappush(queue, (neighbor_cost + self._heuristic(neighbor, goal), neighbor_cost, neighbor))
+        return None
+
+    def _search_cluster(self, cluster, node):
+        subgrid, costs = self._subgrid(cluster)
+        return grid_dijkstra(
+            subgrid, node, costs=costs,
+            include_diagonals=self.include_diagonals, diagonal_cost=self.diagonal_cost,
+        )
+
+    def _subgrid(self, cluster):
+        if cluster not in self._subgrids:
+            top, bottom, left, right = self.bounds(cluster)
+            passable = self.grid.unpad(self.grid.passable)[top:bottom, left:right]
+            origin = (self.grid.origin[0] + top, self.grid.origin[1] + left)
+            self._subgrids[cluster] = (Grid(passable, origin=origin), self.costs[top:bottom, left:right])
+        return self._subgrids[cluster]
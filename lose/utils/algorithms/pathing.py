@@ -1,26 +1,447 @@
 # -*- coding: utf-8 -*-
+import math
 import operator
 import heapq
-from .distances import log_distance
+from collections.abc import Mapping
 
+import numpy as np
 
-def create_dijkstra_map(graph, start, target=None, cost_func=None, include_diagonals=None):
+from .grid import Grid, CARDINALS, DIRECTIONS
+from .distances import log_distance, log_distances
+
+
+class DijkstraMap(Mapping):
+    """A dijkstra map over a :class:`Grid` that can be repaired in place.
+
+    Costs are kept for every cell and repaired incrementally when the
+    sources move or cells change, touching only the cells whose cost
+    actually changes.  The repaired costs always match a full
+    recompute.  Entry costs must be positive.
+
+    The map reads like the ``{node: cost}`` dict from
+    :func:`create_dijkstra_map`; unreached cells are missing.
+
+    Args:
+        grid (Grid): passability of the map
+        sources (list): nodes with a cost of 0
+        costs (array): map shaped entry cost per cell [default: 1 everywhere]
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+        distances (array): map shaped costs computed elsewhere for these sources; skips the initial compute
+    """
+
+    def __init__(self, grid, sources, costs=None, include_diagonals=None, diagonal_cost=None, distances=None):
+        self.grid = grid
+        self.include_diagonals = bool(include_diagonals)
+        self.diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+        if costs is None:
+            self._entry = [1] * grid.size
+        else:
+            self._entry = grid.pad(np.asarray(costs, dtype=float)).ravel().tolist()
+        self._diagonals = {
+            offset for offset, diagonal in grid.offsets(include_diagonals=True) if diagonal
+        }
+        self.repair_limit = grid.size // 16
+        self._exact = None  # whether every step cost sums without rounding
+        self.sources = set()
+        for source in sources:
+            if not grid.contains(source, passable=False):
+                raise ValueError(f'Source {source} is not on the grid')
+            self.sources.add(grid.index(source))
+        if distances is None:
+            self.recompute()
+        else:
+            self._distances = grid.pad(np.asarray(distances, dtype=float), fill=math.inf).ravel().tolist()
+
+    def __getitem__(self, node):
+        if not self.grid.contains(node, passable=False):
+            raise KeyError(node)
+        cost = self._distances[self.grid.index(node)]
+        if cost == math.inf:
+            raise KeyError(node)
+        return cost
+
+    def __iter__(self):
+        for index, cost in enumerate(self._distances):
+            if cost != math.inf:
+                yield self.grid.node(index)
+
+    def __len__(self):
+        return sum(1 for cost in self._distances if cost != math.inf)
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        sources = sorted(self.grid.node(source) for source in self.sources)
+        string = f'<{cname} {sources} [{self.grid}]>'
+        return string
+
+    @property
+    def costs(self):
+        """Map shaped float array of costs; unreached cells are inf."""
+        return self.grid.unpad(np.array(self._distances))
+
+    def recompute(self):
+        """Rebuilds every cost from scratch."""
+        self._distances = [math.inf] * self.grid.size
+        queue = []
+        for source in self.sources:
+            self._distances[source] = 0
+            queue.append((0, source))
+        self._propagate(queue)
+
+    def move_sources(self, sources):
+        """Replaces the sources and repairs the costs.
+
+        A single source stepping onto a neighbor changes nearly every
+        cost, which would send :meth:`repair` past its limit.  That move
+        is handled by :meth:`step_source` instead.
+
+        Args:
+            sources (list): nodes with a cost of 0
+        """
+        sources = {self.grid.index(source) for source in sources}
+        if len(sources) == len(self.sources) == 1 and self.step_source(*sources):
+            return
+        changed = sources ^ self.sources
+        self.sources = sources
+        self.repair(changed)
+
+    def step_source(self, source):
+        """Repairs the costs after the only source steps onto a neighbor.
+
+        Walking back to the old source and on from there is always
+        possible, so every old cost plus the cost of that step is an
+        upper bound that already agrees with its neighbors.  Only the
+        cells that got cheaper need to be searched: they're found by
+        propagating the decreases out from the new source.
+
+        Args:
+            source (int): flat index of the new source
+
+        Returns:
+            bool: False when the move isn't a single step and nothing was changed
+        """
+        old, = self.sources
+        if source == old or old not in self.grid.neighbors(include_diagonals=self.include_diagonals)[source]:
+            return False
+        if not self.exact:
+            return False  # shifted sums could round differently from a recompute
+        shift = self._weight(source, old)
+        self._distances = [cost + shift for cost in self._distances]
+        self._distances[source] = 0
+        self.sources = {source}
+        self._propagate([(0, source)])
+        return True
+
+    @property
+    def exact(self):
+        """Whether every step cost is a whole number of 64ths, so costs add up exactly."""
+        if self._exact is None:
+            steps = {self.diagonal_cost * cost for cost in set(self._entry) if cost != math.inf}
+            steps |= {cost for cost in set(self._entry) if cost != math.inf}
+            self._exact = all(float(step * 64).is_integer() for step in steps)
+        return self._exact
+
+    def update(self, nodes, costs=None):
+        """Repairs the map after cells changed.
+
+        Passability changes should already be applied to the grid (see
+        :meth:`Grid.set_passable`).
+
+        Args:
+            nodes (list): nodes whose passability or entry cost changed
+            costs (list): new entry cost for each node; None keeps the current cost
+        """
+        indices = [self.grid.index(node) for node in nodes]
+        if costs is not None:
+            for index, cost in zip(indices, costs):
+                self._entry[index] = cost
+            self._exact = None
+        self.repair(indices)
+
+    def repair(self, changed):
+        """Repairs the costs around changed flat indices.
+
+        First every cell that lost all of its cheapest parents is found,
+        in cost order, and reset.  Then reset and changed cells are
+        reseeded from their neighbors and the decreases are propagated.
+        Cells outside of those two waves are never touched.  When the
+        first wave grows past :attr:`repair_limit` cells a full
+        recompute is cheaper, so the map is rebuilt instead.
+
+        Args:
+            changed (list): flat indices of cells that changed
+        """
+        distances = self._distances
+        neighbors = self.grid.neighbors(include_diagonals=self.include_diagonals)
+        offsets = [offset for offset, _ in self.grid.offsets(include_diagonals=self.include_diagonals)]
+        passable = self.grid.passable.ravel()
+        sources = self.sources
+        infinity = math.inf
+        for source in sources:
+            distances[source] = 0
+
+        # Find every cell whose cost is no longer backed by a parent
+        affected = set()
+        queue = [(distances[node], node) for node in changed if distances[node] != infinity]
+        heapq.heapify(queue)
+        while queue:
+            node_cost, node = heapq.heappop(queue)
+            if node in affected:
+                continue
+            if node in sources:
+                continue
+            # Sources may sit on impassable cells, so parents are found
+            # through the offsets rather than the neighbor table.
+            if passable[node] and any(
+                parent not in affected and distances[parent] + self._weight(parent, node) == node_cost
+                for parent in (node + offset for offset in offsets)
+            ):
+                continue
+            affected.add(node)
+            if len(affected) > self.repair_limit:
+                self.recompute()
+                return
+            for child in neighbors[node]:
+                if child in affected or distances[child] == infinity:
+                    continue
+                if distances[child] == node_cost + self._weight(node, child):
+                    heapq.heappush(queue, (distances[child], child))
+
+        # Reseed from the neighbors and push the decreases out
+        for node in affected:
+            distances[node] = infinity
+        queue = []
+        for node in affected.union(changed):
+            if node in sources:
+                queue.append((0, node))
+                continue
+            if not passable[node]:
+                continue
+            best = distances[node]
+            for parent in (node + offset for offset in offsets):
+                cost = distances[parent] + self._weight(parent, node)
+                if cost < best:
+                    best = cost
+            if best != infinity:
+                distances[node] = best
+                queue.append((best, node))
+        heapq.heapify(queue)
+        self._propagate(queue)
+
+    def _weight(self, node, neighbor):
+        step = self.diagonal_cost if (neighbor - node) in self._diagonals else 1
+        return step * self._entry[neighbor]
+
+    def _propagate(self, queue):
+        distances = self._distances
+        entry = self._entry
+        neighbors = self.grid.neighbors(include_diagonals=self.include_diagonals)
+        weight = self._weight
+        uniform = self.diagonal_cost == 1
+        pop, push = heapq.heappop, heapq.heappush
+        while queue:
+            node_cost, node = pop(queue)
+            if node_cost > distances[node]:
+                continue  # stale queue entry
+            for neighbor in neighbors[node]:
+                if uniform:
+                    neighbor_cost = node_cost + entry[neighbor]
+                else:
+                    neighbor_cost = node_cost + weight(node, neighbor)
+                if neighbor_cost < distances[neighbor]:
+                    distances[neighbor] = neighbor_cost
+                    push(queue, (neighbor_cost, neighbor))
+
+
+class _LazyCosts(dict):
+    """Entry costs by flat index, computed with cost_func the first time they're needed."""
+
+    def __init__(self, grid, start, cost_func):
+        super().__init__()
+        self.grid = grid
+        self.start = start
+        self.cost_func = cost_func
+
+    def __missing__(self, index):
+        cost = self[index] = self.cost_func(self.start, self.grid.node(index))
+        return cost
+
+
+def bounded_dijkstra(grid, start, max_cost=None, max_nodes=None, costs=None, include_diagonals=None, diagonal_cost=None, cost_func=None):
+    """Dijkstra's algorithm over a :class:`Grid` that stops early.
+
+    The search stops before settling a cell that costs more than
+    max_cost or once max_nodes cells have been settled, so the work
+    done only depends on the size of the region reached.
+
+    Args:
+        grid (Grid): passability of the map
+        start (node): the starting position
+        max_cost (numeric): highest cost to settle; None means no ceiling
+        max_nodes (int): most cells to settle; None means no budget
+        costs (array): map shaped entry cost per cell [default: 1 everywhere]
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+        cost_func (callback): cost of entering a node, called with (start, node) like
+            the legacy :func:`dijkstra`; replaces costs and is only called for reached cells
+
+    Returns:
+        dict: mapping of node: cost for every settled node, cheapest first
+    """
+    if not grid.contains(start, passable=False):
+        raise ValueError(f'Start {start} is not on the grid')
+    max_cost = math.inf if max_cost is None else max_cost
+    max_nodes = grid.size if max_nodes is None else max_nodes
+    diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+    if cost_func is not None:
+        entry = _LazyCosts(grid, start, cost_func)
+    elif costs is None:
+        entry = None
+    else:
+        entry = grid.pad(np.asarray(costs, dtype=float)).ravel().tolist()
+    diagonals = {offset for offset, diagonal in grid.offsets(include_diagonals=True) if diagonal}
+    neighbors = grid.neighbors(include_diagonals=include_diagonals)
+    source = grid.index(start)
+
+    settled = {}
+    distances = {source: 0}
+    queue = [(0, source)]
+    pop, push = heapq.heappop, heapq.heappush
+    while queue and len(settled) < max_nodes:
+        node_cost, node = pop(queue)
+        if node in settled:
+            continue  # stale queue entry
+        if node_cost > max_cost:
+            break
+        settled[node] = node_cost
+        for neighbor in neighbors[node]:
+            if neighbor in settled:
+                continue
+            step = diagonal_cost if (neighbor - node) in diagonals else 1
+            neighbor_cost = node_cost + step * (1 if entry is None else entry[neighbor])
+            if neighbor_cost < distances.get(neighbor, math.inf):
+                distances[neighbor] = neighbor_cost
+                push(queue, (neighbor_cost, neighbor))
+    return {grid.node(node): cost for node, cost in settled.items()}
+
+
+def bucket_dijkstra(grid, start, costs=None, target=None, include_diagonals=None, cardinal_cost=None, diagonal_cost=None):
+    """Dial's algorithm over a :class:`Grid` for integer costs.
+
+    Costs are fixed point integers, so the priority queue can be a ring
+    of buckets indexed by cost instead of a heap.  Each push and pop is
+    O(1) and the ring only needs one bucket more than the most expensive
+    step.
+
+    See: https://en.wikipedia.org/wiki/Dijkstra%27s_algorithm#Specialized_variants
+
+    Args:
+        grid (Grid): passability of the map
+        start (node): the starting position
+        costs (array): map shaped positive integer entry cost per cell [default: 1 everywhere]
+        target (node): stop once this node is settled; None means all nodes
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        cardinal_cost (int): cost of a cardinal step [default: 10]
+        diagonal_cost (int): cost of a diagonal step [default: 14]
+
+    Returns:
+        array: map shaped float array of whole number costs; unreached cells are inf
+    """
+    if not grid.contains(start, passable=False):
+        raise ValueError(f'Start {start} is not on the grid')
+    cardinal_cost = 10 if cardinal_cost is None else cardinal_cost
+    diagonal_cost = 14 if diagonal_cost is None else diagonal_cost
+    steps = [
+        (offset, diagonal_cost if diagonal else cardinal_cost)
+        for offset, diagonal in grid.offsets(include_diagonals=include_diagonals)
+    ]
+    if costs is None:
+        entry = [1] * grid.size
+    else:
+        costs = np.asarray(costs)
+        if not np.issubdtype(costs.dtype, np.integer):
+            raise TypeError('Bucket queues require integer entry costs')
+        # Only cells that can be entered need a cost
+        costs = np.where(grid.unpad(grid.passable), costs, 1).astype(np.int64)
+        entry = grid.pad(costs, fill=1).ravel().tolist()
+    if min(step for _, step in steps) < 1 or min(entry) < 1:
+        raise ValueError('Bucket queues require positive step and entry costs')
+    source = grid.index(start)
+    sink = -1 if target is None else grid.index(target)
+
+    # Pending costs all fall within one step of the current cost, so
+    # that many buckets can be reused in a ring
+    ring = max(step for _, step in steps) * max(entry) + 1
+    buckets = [[] for _ in range(ring)]
+    passable = grid.passable.ravel().tolist()
+    distances = [math.inf] * grid.size
+    distances[source] = 0
+    buckets[0].append(source)
+    pending = 1
+    current = 0
+    while pending:
+        bucket = buckets[current % ring]
+        while bucket:
+            node = bucket.pop()
+            pending -= 1
+            if distances[node] != current:
+                continue  # stale bucket entry
+            if node == sink:
+                pending = 0
+                break
+            for offset, step in steps:
+                neighbor = node + offset
+                if not passable[neighbor]:
+                    continue
+                neighbor_cost = current + step * entry[neighbor]
+                if neighbor_cost < distances[neighbor]:
+                    distances[neighbor] = neighbor_cost
+                    buckets[neighbor_cost % ring].append(neighbor)
+                    pending += 1
+        current += 1
+    return grid.unpad(np.array(distances, dtype=float))
+
+
+def create_dijkstra_map(graph, start, target=None, cost_func=None, include_diagonals=None, queue=None):
     """Creates a dijkstra map
 
+    The map is computed with the array-backed grid engine (see
+    :func:`grid_dijkstra`) and returned as a dict view for callers that
+    still index by node.
+
+    With the ``bucket`` queue costs are fixed point integers instead:
+    10 per cardinal step and 14 per diagonal step, times the cell's
+    entry cost (see :func:`bucket_dijkstra`).  cost_func then has to
+    return positive integers and defaults to 1 for every cell.
+
     Args:
-        graph (list): a set of nodes
+        graph (list): a set of nodes or a prebuilt :class:`Grid`
         start (node): the starting position
         target (node): the ending position; None means all nodes
         cost_func (callback):  the cost function or distance formula
         include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        queue (str): ``heap`` or ``bucket`` [default: heap]
 
     Returns:
         dict: mapping of node: cost
     """
-    mapping = {
-        node: cost
-        for cost, node in dijkstra(graph, start, target=target, cost_func=cost_func, include_diagonals=include_diagonals)
-    }
+    grid = graph if isinstance(graph, Grid) else Grid.from_graph(graph)
+    queue = queue or 'heap'
+    if queue == 'heap':
+        costs = entry_costs(grid, start, cost_func=cost_func)
+        distances = grid_dijkstra(grid, start, costs=costs, target=target, include_diagonals=include_diagonals)
+    elif queue == 'bucket':
+        costs = None
+        if cost_func is not None:
+            costs = entry_costs(grid, start, cost_func=cost_func)
+            if (costs != np.round(costs)).any():
+                raise TypeError('cost_func must return whole numbers for the bucket queue')
+            costs = costs.astype(np.int64)
+        distances = bucket_dijkstra(grid, start, costs=costs, target=target, include_diagonals=include_diagonals)
+    else:
+        raise ValueError(f'Unknown queue: {queue}')
+    mapping = grid.to_mapping(distances)
     return mapping
 
 
@@ -62,7 +483,212 @@ def dijkstra(graph, start, target=None, cost_func=None, include_diagonals=None):
             costs[neighbor] = neighbor_cost
             heapq.heappush(queue, (neighbor_cost, neighbor))
             if neighbor == target:
+                return
+
+
+def entry_costs(grid, start, cost_func=None):
+    """Builds the cost of entering each cell of a grid.
+
+    The legacy :func:`dijkstra` charges ``cost_func(start, neighbor)``
+    every time it reaches a neighbor.  That only depends on the cell
+    being entered, so it is computed once per cell here instead of once
+    per relaxation.
+
+    Args:
+        grid (Grid): the grid to cost
+        start (node): the starting position
+        cost_func (callback):  the cost function or distance formula [default: log_distance]
+
+    Returns:
+        array: map shaped float array of entry costs
+    """
+    ys, xs = grid.nodes()
+    if cost_func in (None, log_distance):
+        costs = log_distances(start, np.stack([ys, xs], axis=-1))
+    else:
+        costs = np.zeros(grid.shape)
+        passable = grid.unpad(grid.passable)
+        for y, x in zip(ys[passable].tolist(), xs[passable].tolist()):
+            costs[y - grid.origin[0], x - grid.origin[1]] = cost_func(start, (y, x))
+    return costs
+
+
+def grid_dijkstra(grid, start, costs=None, target=None, include_diagonals=None, diagonal_cost=None):
+    """Dijkstra's algorithm over a :class:`Grid`.
+
+    Reaching a cell costs its entry cost, scaled by diagonal_cost for
+    diagonal steps.  Entry costs must not be negative.  While every
+    step is weighted the same, the first time a cell is reached is
+    already its cheapest, so cells are settled on discovery and never
+    pushed twice.
+
+    Args:
+        grid (Grid): passability of the map
+        start (node): the starting position
+        costs (array): map shaped entry cost per cell [default: 1 everywhere]
+        target (node): stop once this node is settled; None means all nodes
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+
+    Returns:
+        array: map shaped float array of costs; unreached cells are inf
+    """
+    if not grid.contains(start, passable=False):
+        raise ValueError(f'Start {start} is not on the grid')
+    diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+    if costs is None:
+        entry = [1] * grid.size
+    else:
+        entry = grid.pad(np.asarray(costs, dtype=float)).ravel().tolist()
+    source = grid.index(start)
+    sink = -1 if target is None else grid.index(target)
+    entry[source] = 0
+
+    queue = [(0, source)]
+    pop, push = heapq.heappop, heapq.heappush
+    if diagonal_cost == 1:
+        # Unreached cells stay None, which NumPy turns into nan below
+        distances = [None] * grid.size
+        distances[source] = 0
+        neighbors = grid.neighbors(include_diagonals=include_diagonals)
+        while queue:
+            node_cost, node = pop(queue)
+            if node == sink:
                 break
+            for neighbor in neighbors[node]:
+                if distances[neighbor] is None:
+                    neighbor_cost = node_cost + entry[neighbor]
+                    distances[neighbor] = neighbor_cost
+                    push(queue, (neighbor_cost, neighbor))
+    else:
+        distances = [math.inf] * grid.size
+        distances[source] = 0
+        passable = grid.passable.ravel().tolist()
+        steps = [
+            (offset, diagonal_cost if diagonal else 1)
+            for offset, diagonal in grid.offsets(include_diagonals=include_diagonals)
+        ]
+        while queue:
+            node_cost, node = pop(queue)
+            if node_cost > distances[node]:
+                continue  # stale queue entry
+            if node == sink:
+                break
+            for offset, step in steps:
+                neighbor = node + offset
+                if not passable[neighbor]:
+                    continue
+                neighbor_cost = node_cost + step * entry[neighbor]
+                if neighbor_cost < distances[neighbor]:
+                    distances[neighbor] = neighbor_cost
+                    push(queue, (neighbor_cost, neighbor))
+    distances = np.array(distances, dtype=float)
+    distances[np.isnan(distances)] = math.inf
+    return grid.unpad(distances)
+
+
+def flee_map(grid, costs, coefficient=None, entry=None, include_diagonals=None, diagonal_cost=None):
+    """Derives a flee map from a goal map.
+
+    Following a goal map downhill leads towards the goal.  Scaling it by
+    a negative coefficient and rescanning it turns the far away cells
+    into the new minima while letting dead ends fill back up, so
+    following the flee map downhill runs away without cornering itself.
+
+    See: http://www.roguebasin.com/index.php?title=The_Incredible_Power_of_Dijkstra_Maps
+
+    Args:
+        grid (Grid): passability of the map
+        costs (array): map shaped goal map costs; unreached cells are inf
+        coefficient (numeric): how strongly to prefer distance [default: -1.2]
+        entry (array): map shaped entry cost per cell [default: 1 everywhere]
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+
+    Returns:
+        array: map shaped float array of flee costs; unreached cells are inf
+    """
+    coefficient = -1.2 if coefficient is None else coefficient
+    costs = np.asarray(costs, dtype=float)
+    initial = np.full(costs.shape, math.inf)
+    reached = np.isfinite(costs)
+    initial[reached] = costs[reached] * coefficient
+    return seeded_dijkstra(grid, initial, costs=entry, include_diagonals=include_diagonals, diagonal_cost=diagonal_cost)
+
+
+def flow_field(costs, include_diagonals=None):
+    """Finds the best next step for every cell of a goal map.
+
+    All neighbors are compared at once with shifted views of the costs,
+    so following a goal map becomes a single array lookup per mob.
+    Cells with no cheaper neighbor (the goals themselves, plateaus and
+    unreached cells) get -1.
+
+    Args:
+        costs (array): 2D goal map costs; inf for impassable or unreached cells
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+
+    Returns:
+        array: int8 array of indices into :data:`~.grid.DIRECTIONS`, shaped like costs
+    """
+    costs = np.asarray(costs, dtype=float)
+    if costs.ndim != 2:
+        raise ValueError('Flow fields require a 2D cost array')
+    height, width = costs.shape
+    padded = np.full((height + 2, width + 2), math.inf)
+    padded[1:-1, 1:-1] = costs
+    directions = DIRECTIONS if include_diagonals else CARDINALS
+    shifted = np.stack([
+        padded[1 + dy:height + 1 + dy, 1 + dx:width + 1 + dx]
+        for dy, dx in directions
+    ])
+    best = shifted.argmin(axis=0)
+    best_cost = np.take_along_axis(shifted, best[None], axis=0)[0]
+    return np.where(best_cost < costs, best, -1).astype(np.int8)
+
+
+def seeded_dijkstra(grid, initial, costs=None, include_diagonals=None, diagonal_cost=None):
+    """Dijkstra's algorithm over a :class:`Grid` from seeded costs.
+
+    Every cell with a finite initial cost starts out as a source at that
+    cost, so a whole goal map (or many goals at once) is handled in a
+    single pass.  Initial costs may be negative.
+
+    Args:
+        grid (Grid): passability of the map
+        initial (array): map shaped starting cost per cell; inf is not a source
+        costs (array): map shaped entry cost per cell [default: 1 everywhere]
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+
+    Returns:
+        array: map shaped float array of costs; unreached cells are inf
+    """
+    diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+    if costs is None:
+        entry = [1] * grid.size
+    else:
+        entry = grid.pad(np.asarray(costs, dtype=float)).ravel().tolist()
+    diagonals = {offset for offset, diagonal in grid.offsets(include_diagonals=True) if diagonal}
+    neighbors = grid.neighbors(include_diagonals=include_diagonals)
+    distances = grid.pad(np.asarray(initial, dtype=float), fill=math.inf).ravel()
+    seeds = np.flatnonzero(np.isfinite(distances))
+    queue = list(zip(distances[seeds].tolist(), seeds.tolist()))
+    heapq.heapify(queue)
+    distances = distances.tolist()
+
+    pop, push = heapq.heappop, heapq.heappush
+    while queue:
+        node_cost, node = pop(queue)
+        if node_cost > distances[node]:
+            continue  # stale queue entry
+        for neighbor in neighbors[node]:
+            step = diagonal_cost if (neighbor - node) in diagonals else 1
+            neighbor_cost = node_cost + step * entry[neighbor]
+            if neighbor_cost < distances[neighbor]:
+                distances[neighbor] = neighbor_cost
+                push(queue, (neighbor_cost, neighbor))
+    return grid.unpad(np.array(distances))
 
 
 def get_neighbors(node=None, include_diagonals=None):
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Point to point path queries over a :class:`~.grid.Grid`.
+
+Unlike the dijkstra maps in :mod:`.pathing`, these searches stop as soon
+as the goal is reached and return the path itself.
+"""
+import math
+import heapq
+
+import numpy as np
+
+
+# Most cells a jump point search run covers before it stops at a jump point
+JUMP_LIMIT = 16
+
+
+def astar(grid, start, goal, costs=None, include_diagonals=None, diagonal_cost=None):
+    """A* search between two nodes.
+
+    The heuristic is the octagonal distance to the goal, capped at the
+    cost of crossing open ground so it never overestimates, and scaled
+    by the cheapest entry cost on the grid.
+
+    See: https://en.wikipedia.org/wiki/A*_search_algorithm
+
+    Args:
+        grid (Grid): passability of the map
+        start (node): the starting position
+        goal (node): the ending position
+        costs (array): map shaped entry cost per cell [default: 1 everywhere]
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+
+    Returns:
+        list: nodes from start to goal inclusive; None if goal can't be reached
+    """
+    if not grid.contains(start, passable=False):
+        raise ValueError(f'Start {start} is not on the grid')
+    if not grid.contains(goal):
+        return None
+    diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+    # Nothing here may walk the whole grid, so a short query costs the
+    # same on any size of map: costs are read cell by cell, neighbors
+    # are found through the offsets rather than the grid's neighbor
+    # table, and the lowest cost is kept by the grid (see Grid.lowest_cost)
+    if costs is None:
+        entry = None
+        cheapest = 1
+    else:
+        cheapest = grid.lowest_cost(costs)
+        entry = np.asarray(costs, dtype=float).item
+    heuristic = get_heuristic(grid, goal, include_diagonals, diagonal_cost, scale=cheapest)
+    passable = grid.flat_passable
+    width = grid.width
+    steps = [
+        (offset, diagonal_cost if diagonal else 1)
+        for offset, diagonal in grid.offsets(include_diagonals=include_diagonals)
+    ]
+    source = int(grid.index(start))
+    sink = int(grid.index(goal))
+
+    distances = {source: 0}
+    parents = {source: None}
+    queue = [(heuristic[source], 0, source)]
+    pop, push = heapq.heappop, heapq.heappush
+    while queue:
+        _, node_cost, node = pop(queue)
+        if node == sink:
+            return [grid.node(index) for index in reconstruct_path(parents, node)]
+        if node_cost > distances[node]:
+            continue  # stale queue entry
+        for offset, step in steps:
+            neighbor = node + offset
+            if not passable[neighbor]:
+                continue
+            if entry is None:
+                neighbor_cost = node_cost + step
+            else:
+                y, x = divmod(neighbor, width)
+                neighbor_cost = node_cost + step * entry(y - 1, x - 1)
+            if neighbor_cost < distances.get(neighbor, math.inf):
+                distances[neighbor] = neighbor_cost
+                parents[neighbor] = node
+                push(queue, (neighbor_cost + heuristic[neighbor], neighbor_cost, neighbor))
+    return None
+
+
+def jump_point_search(grid, start, goal, diagonal_cost=None):
+    """Jump point search between two nodes on a uniform cost grid.
+
+    Every move costs 1 (or diagonal_cost for diagonal moves) and all 8
+    directions are used.  Straight and diagonal runs are skipped over
+    until something interesting (the goal or a forced neighbor next to
+    a wall) shows up, so only a handful of jump points are ever queued.
+
+    Runs stop after :data:`JUMP_LIMIT` cells, or the distance between
+    start and goal if that's longer, so a short query on open ground
+    doesn't scan out to the far walls.  Stopping a run early only adds a
+    jump point and never changes the path found.
+
+    See: Harabor & Grastien, "Online Graph Pruning for Pathfinding on Grid Maps" (2011)
+
+    Args:
+        grid (Grid): passability of the map
+        start (node): the starting position
+        goal (node): the ending position
+        diagonal_cost (numeric): cost of a diagonal step, between 1 and 2 [default: 1]
+
+    Returns:
+        list: nodes from start to goal inclusive; None if goal can't be reached
+    """
+    if not grid.contains(start, passable=False):
+        raise ValueError(f'Start {start} is not on the grid')
+    if not grid.contains(goal):
+        return None
+    diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+    if not 1 <= diagonal_cost <= 2:
+        raise ValueError('Jump point search requires a diagonal cost between 1 and 2')
+    heuristic = get_heuristic(grid, goal, True, diagonal_cost)
+    passable = grid.flat_passable
+    width = grid.width
+    source = int(grid.index(start))
+    sink = int(grid.index(goal))
+    limit = max(JUMP_LIMIT, abs(start[0] - goal[0]), abs(start[1] - goal[1]))
+
+    def jump(node, dy, dx):
+        """Walks from node in a direction until a jump point is found."""
+        step = dy * width + dx
+        for _ in range(limit):
+            node += step
+            if not passable[node]:
+                return None
+            if node == sink:
+                return node
+            if dy and dx:
+                # Diagonal: forced neighbors, or a straight run that jumps
+                if (not passable[node - dx] and passable[node - dx + dy * width]) or \
+                        (not passable[node - dy * width] and passable[node - dy * width + dx]):
+                    return node
+                if jump(node, 0, dx) is not None or jump(node, dy, 0) is not None:
+                    return node
+            elif dx:
+                if (not passable[node + width] and passable[node + width + dx]) or \
+                        (not passable[node - width] and passable[node - width + dx]):
+                    return node
+            else:
+                if (not passable[node + 1] and passable[node + 1 + dy * width]) or \
+                        (not passable[node - 1] and passable[node - 1 + dy * width]):
+                    return node
+        return node  # a long run; carries on from here if it's ever expanded
+
+    def directions(node, parent):
+        """Natural and forced directions to explore from a jump point."""
+        if parent is None:
+            return [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+        py, px = divmod(parent, width)
+        y, x = divmod(node, width)
+        dy = (y > py) - (y < py)
+        dx = (x > px) - (x < px)
+        found = []
+        if dy and dx:
+            found = [(dy, dx), (0, dx), (dy, 0)]
+            if not passable[node - dx]:
+                found.append((dy, -dx))
+            if not passable[node - dy * width]:
+                found.append((-dy, dx))
+        elif dx:
+            found = [(0, dx)]
+            if not passable[node + width]:
+                found.append((1, dx))
+            if not passable[node - width]:
+                found.append((-1, dx))
+        else:
+            found = [(dy, 0)]
+            if not passable[node + 1]:
+                found.append((dy, 1))
+            if not passable[node - 1]:
+                found.append((dy, -1))
+        return found
+
+    distances = {source: 0}
+    parents = {source: None}
+    queue = [(heuristic[source], 0, source)]
+    pop, push = heapq.heappop, heapq.heappush
+    while queue:
+        _, node_cost, node = pop(queue)
+        if node == sink:
+            break
+        if node_cost > distances[node]:
+            continue  # stale queue entry
+        y, x = divmod(node, width)
+        for dy, dx in directions(node, parents[node]):
+            jump_point = jump(node, dy, dx)
+            if jump_point is None:
+                continue
+            jy, jx = divmod(jump_point, width)
+            ay, ax = abs(jy - y), abs(jx - x)
+            jump_cost = node_cost + (max(ay, ax) - min(ay, ax)) + diagonal_cost * min(ay, ax)
+            if jump_cost < distances.get(jump_point, math.inf):
+                distances[jump_point] = jump_cost
+                parents[jump_point] = node
+                push(queue, (jump_cost + heuristic[jump_point], jump_cost, jump_point))
+    else:
+        return None
+
+    # Jump points are joined by straight or purely diagonal runs
+    jump_points = reconstruct_path(parents, sink)
+    path = jump_points[:1]
+    for node in jump_points[1:]:
+        y, x = divmod(path[-1], width)
+        ny, nx = divmod(node, width)
+        step = ((ny > y) - (ny < y)) * width + (nx > x) - (nx < x)
+        path.extend(range(path[-1] + step, node + step, step))
+    return [grid.node(index) for index in path]
+
+
+class Heuristic(dict):
+    """Admissible distance to goal estimates by flat index, computed on first use.
+
+    A cell's estimate is the octagonal distance to the goal (with the
+    fixed point arithmetic of :func:`~.distances.octagonal_distance`),
+    capped at the cost of crossing open ground so it never
+    overestimates, and scaled by the cheapest entry cost on the grid.
+    Only cells a search actually pushes get an estimate, so a short
+    query costs the same on any size of grid.
+
+    Args:
+        grid (Grid): the grid to estimate over
+        goal (node): the ending position
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+        scale (numeric): cheapest entry cost on the grid [default: 1]
+    """
+
+    def __init__(self, grid, goal, include_diagonals=None, diagonal_cost=None, scale=None):
+        super().__init__()
+        diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+        self.goal = tuple(int(value) for value in goal)
+        self.include_diagonals = bool(include_diagonals)
+        self.diagonal_cost = min(diagonal_cost, 2)
+        self.scale = 1 if scale is None else scale
+        self._width = grid.width
+        self._origin = (grid.origin[0] - 1, grid.origin[1] - 1)  # node of flat index 0, in the padding
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {self.goal} {len(self)} cells estimated>'
+        return string
+
+    def __missing__(self, index):
+        row, column = divmod(index, self._width)
+        dy = abs(row + self._origin[0] - self.goal[0])
+        dx = abs(column + self._origin[1] - self.goal[1])
+        diff_min, diff_max = (dy, dx) if dy < dx else (dx, dy)
+        approximation = diff_max * 1007 + diff_min * 441
+        correction = diff_max * 40 if diff_max < (diff_min << 4) else 0
+        octagonal = (approximation - correction + 512) >> 10
+        if self.include_diagonals:
+            open_ground = (diff_max - diff_min) + self.diagonal_cost * diff_min
+        else:
+            open_ground = dy + dx
+        estimate = self[index] = float(min(octagonal, open_ground) * self.scale)
+        return estimate
+
+
+def get_heuristic(grid, goal, include_diagonals=None, diagonal_cost=None, scale=None):
+    """Provides an admissible distance to goal estimate for every cell.
+
+    Args:
+        grid (Grid): the grid to estimate over
+        goal (node): the ending position
+        include_diagonals (bool):  Only use cardinal directions if False, else include all 8 possibilities
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+        scale (numeric): cheapest entry cost on the grid [default: 1]
+
+    Returns:
+        Heuristic: estimate by flat index, each computed the first time it's looked up
+    """
+    return Heuristic(grid, goal, include_diagonals, diagonal_cost, scale=scale)
+
+
+def path_cost(grid, path, costs=None, diagonal_cost=None):
+    """Adds up the cost of walking a path.
+
+    Args:
+        grid (Grid): the grid the path runs over
+        path (list): nodes from start to goal
+        costs (array): map shaped entry cost per cell [default: 1 everywhere]
+        diagonal_cost (numeric): multiplier applied to diagonal steps [default: 1]
+
+    Returns:
+        numeric: total cost of the path
+    """
+    diagonal_cost = 1 if diagonal_cost is None else diagonal_cost
+    total = 0
+    for previous, node in zip(path, path[1:]):
+        step = diagonal_cost if previous[0] != node[0] and previous[1] != node[1] else 1
+        if costs is None:
+            total += step
+        else:
+            total += step * costs[node[0] - grid.origin[0]][node[1] - grid.origin[1]]
+    return total
+
+
+def reconstruct_path(parents, node):
+    """Follows parent links back to the start.
+
+    Returns:
+        list: flat indices from the start to node inclusive
+    """
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+    return path
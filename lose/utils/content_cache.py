@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Compiled content cache
+
+Loading game content means parsing every YAML file under ``lose/data``
+and rebuilding the lookup tables on each start.  The compiled result is
+pickled into one bundle per content type, keyed by the path, mtime and
+size of every source file, so a warm start is a single read.  Any
+change to the sources, or to the bundle format, throws the whole bundle
+away.
+
+The bundles live in ``$LOSE_CACHE_DIR`` or else ``$XDG_CACHE_HOME/lose``
+(``~/.cache/lose``).  Setting ``LOSE_NO_CACHE`` turns the cache off.
+"""
+import os
+import pickle
+from collections import Counter
+
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
+# Bump whenever the compiled form of the content changes
+CACHE_VERSION = 2
+
+# Cache events since start up: hit, miss, store and error
+cache_stats = Counter()
+
+
+def get_cache_dir():
+    """Finds the folder holding the content bundles.
+
+    Returns:
+        str: the cache folder; None when caching is turned off
+    """
+    if os.environ.get('LOSE_NO_CACHE'):
+        return None
+    cache_dir = os.environ.get('LOSE_CACHE_DIR')
+    if not cache_dir:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        cache_dir = os.path.join(cache_home, 'lose')
+    return cache_dir
+
+
+def get_cache_path(name):
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    return os.path.join(cache_dir, f'{name}.cache')
+
+
+def source_manifest(paths):
+    """Fingerprints source files.
+
+    Args:
+        paths(list): source file paths
+
+    Returns:
+        tuple: (str: absolute path, int: mtime in ns, int: size) per file, sorted
+    """
+    manifest = []
+    for path in paths:
+        stat = os.stat(path)
+        manifest.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(manifest))
+
+
+def read_bundle(name, manifest):
+    """Reads a compiled bundle if it still matches its sources.
+
+    Returns:
+        object: the cached content; None if missing or stale
+    """
+    cache_path = get_cache_path(name)
+    if cache_path is None or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as cache_stream:
+            version, cached_manifest, content = pickle.loads(cache_stream.read())
+    except Exception as error:
+        cache_stats['error'] += 1
+        logger.warning({'Unreadable content cache': cache_path, 'error': repr(error)})
+        return None
+    if version != CACHE_VERSION or cached_manifest != manifest:
+        return None
+    return content
+
+
+def write_bundle(name, manifest, content):
+    """Writes a compiled bundle, replacing any earlier one atomically."""
+    cache_path = get_cache_path(name)
+    if cache_path is None:
+        return
+    temporary_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temporary_path, 'wb') as cache_stream:
+            cache_stream.write(pickle.dumps((CACHE_VERSION, manifest, content), protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(temporary_path, cache_path)
+        cache_stats['store'] += 1
+    except OSError as error:
+        cache_stats['error'] += 1
+        logger.warning({'Could not write content cache': cache_path, 'error': repr(error)})
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def load_cached(name, paths, compile_content):
+    """Loads content from its bundle, compiling and storing it on a miss.
+
+    Args:
+        name(str): content type, e.g. ``tiles``
+        paths(list): source files the content is compiled from
+        compile_content(callable): builds the content from the sources
+
+    Returns:
+        object: the compiled content
+    """
+    manifest = source_manifest(paths)
+    content = read_bundle(name, manifest)
+    if content is not None:
+        cache_stats['hit'] += 1
+        logger.debug({'Content cache hit': name})
+        return content
+    cache_stats['miss'] += 1
+    logger.debug({'Content cache miss': name})
+    content = compile_content()
+    write_bundle(name, manifest, content)
+    return content
+
+
+def clear_cache(names=None):
+    """Removes compiled bundles.
+
+    Args:
+        names(list): content types to remove; None removes every bundle
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None or not os.path.isdir(cache_dir):
+        return
+    for filename in os.listdir(cache_dir):
+        name, extension = os.path.splitext(filename)
+        if extension == '.cache' and (names is None or name in names):
+            os.remove(os.path.join(cache_dir, filename))
@@ -1,11 +1,29 @@
 # -*- coding: utf-8 -*-
 import os
-import copy
-from random import choice
+from concurrent.futures import ProcessPoolExecutor
 
 import tcod
 import yaml
 
+from .content_cache import load_cached
+from .level_maps import LevelRegistry, load_level_symbols, resolve_level_map
+from .logger import get_logger
+from .terrain import get_tile_table
+from .world import ChunkedWorld, cave_source, level_file_source
+
+try:
+    # libyaml's parser is many times faster than the pure python one
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # pragma: no cover - PyYAML built without libyaml
+    from yaml import SafeLoader as YamlLoader
+
+
+logger = get_logger(__name__)
+
+# Content folders with fewer files parse faster on the main thread than
+# it takes to start a process pool
+PARALLEL_MIN_FILES = 64
+
 
 def build_colors(game_state):
     colors = {
@@ -19,6 +37,8 @@ def build_colors(game_state):
         if data not in game_state:
             game_state[data] = load_yaml_data(data, path=None)
         for name, entity in game_state[data].items():
+            if name.startswith('_'):
+                continue  # lookup tables, not entities
             if not entity.get('display', {}).get('icon', {}).get('color'):
                 entity.setdefault('display', {}).setdefault('icon', {})['color'] = colors['default']
             else:
@@ -41,12 +61,10 @@ def load_items(game_state, path=None):
     return items
 
 
-def load_level_map(game_state, map_path):
-    level_map = {}
+def load_level_map(game_state, map_path, seed=None):
     tiles = game_state.get('tiles') or load_tiles(game_state)
     game_state['tiles'] = tiles
     game_state = game_state.get('colors') or build_colors(game_state)
-    symbols = tiles['_symbols']
     if map_path.startswith('~'):
         modified_map_path = os.path.expanduser(map_path)
     else:
@@ -54,45 +72,74 @@ def load_level_map(game_state, map_path):
     if not os.path.exists(modified_map_path):
         raise RuntimeError('Could not find map: {}'.format(map_path))
 
-    eol_characters = ['\n']
-    ignored_characters = ['\r']
-    # Position
-    y, x = 0, -1
-    with open(map_path, 'r') as map_stream:
-        for line in map_stream:
-            for character in line:
-                if character in ignored_characters:
-                    continue
-                if character in eol_characters:
-                    y = y + 1
-                    x = -1
-                    continue
-                else:
-                    x = x + 1
-                position = (y, x)
-                tile_indices = copy.deepcopy(symbols.get(character))
-                if not tile_indices:
-                    raise ValueError(f'No tile found for: "{character}" at {position}')
-                if len(tile_indices) == 1:
-                    tile_index = tile_indices[0]
-                else:
-                    tile_index = choice(tile_indices)
-                tile = tiles[tiles['_indices'][tile_index]]
-                level_map[position] = {'name': tile['name']}
-    return level_map
+    symbols, grid = load_level_symbols(modified_map_path)
+    return resolve_level_map(tiles, symbols, grid, seed=seed)
+
+
+def load_world(game_state, map_path=None, shape=None, seed=None, **options):
+    """Opens a chunked world, streamed from a .map file or generated.
+
+    Args:
+        game_state(dict): the game state
+        map_path(str): .map file to stream chunks out of; None generates cave
+        shape(tuple): (int: height, int: width) of a generated world
+        seed(int): seed for the tiles picked or generated
+        **options: passed on to :class:`.world.ChunkedWorld`
+
+    Returns:
+        ChunkedWorld: the world's tiles
+    """
+    tiles = game_state.get('tiles') or load_tiles(game_state)
+    game_state['tiles'] = tiles
+    if not game_state.get('colors'):
+        build_colors(game_state)
+    if map_path is None:
+        if shape is None:
+            raise ValueError('A generated world needs a shape')
+        source = cave_source(tiles, seed=seed)
+    else:
+        modified_map_path = os.path.abspath(os.path.expanduser(map_path))
+        if not os.path.exists(modified_map_path):
+            raise RuntimeError('Could not find map: {}'.format(map_path))
+        source, shape = level_file_source(tiles, modified_map_path, seed=seed)
+    return ChunkedWorld(source, shape, tiles['_indices'], **options)
 
 
 def load_maps(game_state, path=None):
+    """Registers every level under ``lose/data/maps``.
+
+    Levels are only loaded when first looked up in ``game_state['maps']``
+    (see :class:`.level_maps.LevelRegistry`).
+    """
+    # Tiles and colors are shared by every level; set them up here rather
+    # than on whichever thread loads the first level
+    game_state['tiles'] = game_state.get('tiles') or load_tiles(game_state)
+    if not game_state.get('colors'):
+        build_colors(game_state)
+    maps = game_state.get('maps')
+    if not isinstance(maps, LevelRegistry):
+        maps = LevelRegistry(lambda map_path, seed: load_level_map(game_state, map_path, seed=seed))
+        maps.update(game_state.get('maps') or {})
+        game_state['maps'] = maps
     package_path = game_state.get('package-path')
     maps_path = os.path.join(package_path, 'data', 'maps')
-    for root, folders, files in os.walk(maps_path):
-        for filename in files:
+    for root, folders, files in sorted(os.walk(maps_path)):
+        for filename in sorted(files):
             if not filename.endswith(('.map', )):
                 continue
             filepath = os.path.join(root, filename)
             basename = os.path.splitext(filename)[0]
-            map_data = load_level_map(game_state, filepath)
-            game_state.setdefault('maps', {})[basename] = map_data
+            maps.register(basename, filepath)
+    return maps
+
+
+def prefetch_next_level(game_state, map_name):
+    """Loads the level likely to follow the current one in the background."""
+    maps = game_state.get('maps')
+    if isinstance(maps, LevelRegistry):
+        next_level = maps.next_level(map_name)
+        if next_level is not None:
+            maps.prefetch(next_level)
 
 
 def load_mobs(game_state, path=None):
@@ -103,67 +150,145 @@ def load_mobs(game_state, path=None):
 
 def load_tiles(game_state, path=None):
     tiles = load_yaml_data(name='tiles', path=path)
+    if path is None:
+        get_tile_table(tiles)  # flatten the tiles once, up front
     game_state['tiles'] = tiles
     return tiles
 
 
-def load_yaml_data(name, path=None):
-    data = {}
+def get_package_path():
+    package_name = __name__.split('.')[0]
+    package_path = os.path.dirname(__file__)
+    while package_path.split('/')[-1] != package_name:
+        package_path = os.path.dirname(package_path)
+        if not package_path:
+            raise RuntimeError('Could not find package-path')
+    return package_path
+
+
+def find_yaml_files(top_folder):
+    """Finds the YAML files under a folder, in a stable order."""
+    filepaths = []
+    for root, folders, files in os.walk(top_folder):
+        for filename in files:
+            if not filename.endswith(('.yaml', '.yml')):
+                continue
+            filepaths.append(os.path.join(root, filename))
+    return sorted(filepaths)
+
+
+def load_yaml_data(name, path=None, workers=None):
+    """Loads a type of game content.
+
+    With no path every YAML file under ``lose/data/<name>`` is loaded
+    through the content cache (see :mod:`.content_cache`) and the index
+    and symbol lookups are added.  With a path only that file is read.
+
+    Args:
+        name(str): content type, e.g. ``tiles``
+        path(str): a single YAML file to load
+        workers(int): parse processes; None picks by the number of files
+
+    Returns:
+        dict: content by name
+    """
     if path is None:
-        package_name = __name__.split('.')[0]
-        package_path = os.path.dirname(__file__)
-        while package_path.split('/')[-1] != package_name:
-            package_path = os.path.dirname(package_path)
-            if not package_path:
-                raise RuntimeError('Could not find package-path')
-        data_path = os.path.join(package_path, 'data')
-        top_folder = os.path.join(data_path, name)
-        for root, folders, files in os.walk(top_folder):
-            for filename in files:
-                if not filename.endswith(('.yaml', '.yml')):
-                    continue
-                filepath = os.path.join(root, filename)
-                sub_data = load_yaml_data(name=name, path=filepath)
-                data.update(sub_data)
-    elif os.path.exists(path):
+        top_folder = os.path.join(get_package_path(), 'data', name)
+        filepaths = find_yaml_files(top_folder)
+        return load_cached(name, filepaths, lambda: compile_yaml_data(name, filepaths, workers=workers))
+    return parse_yaml_file(path)
+
+
+def parse_yaml_file(path):
+    """Reads the content of a single YAML file.
+
+    Entries sharing a name within the file are merged.
+
+    Returns:
+        dict: content by name
+    """
+    data = {}
+    if os.path.exists(path):
         if path.endswith(('.yaml', 'yml')):
             with open(path, 'r') as item_stream:
-                yaml_data = yaml.load(item_stream.read())
+                yaml_data = yaml.load(item_stream.read(), Loader=YamlLoader)
                 if yaml_data:
                     for data_found in yaml_data:
                         data_name = data_found['name']
                         data.setdefault(data_name, {}).update(data_found)
+    return data
+
+
+def parse_yaml_files(filepaths, workers=None):
+    """Parses YAML files, in a process pool for large content folders.
+
+    Args:
+        filepaths(list): YAML files to parse
+        workers(int): number of processes; None uses every cpu once
+            there are at least ``PARALLEL_MIN_FILES`` files
 
-    # When path is None, assume we've already processed and this is the
-    # tail end of the recursion.  Post fill a way to lookup by index
-    # and by symbol.  This post-fill is currently ephemeral and won't
-    # be saved anywhere.
+    Returns:
+        list: the content of each file, in the order given
+    """
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(filepaths) >= PARALLEL_MIN_FILES else 1
+    workers = min(workers, len(filepaths))
+    if workers <= 1:
+        return [parse_yaml_file(filepath) for filepath in filepaths]
+    chunksize = max(1, len(filepaths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse_yaml_file, filepaths, chunksize=chunksize))
+
+
+def compile_yaml_data(name, filepaths, workers=None):
+    """Merges YAML files into one type of content.
+
+    Files are merged in the order given, so the generated indices are
+    stable between runs.
+
+    Raises:
+        ValueError: when the same name is defined in more than one file
+    """
+    data = {}
+    sources = {}
+    duplicates = []
+    for filepath, sub_data in zip(filepaths, parse_yaml_files(filepaths, workers=workers)):
+        for data_name in sub_data:
+            if data_name in sources:
+                duplicates.append(f'{data_name} ({sources[data_name]}, {filepath})')
+            sources[data_name] = filepath
+        data.update(sub_data)
+    if duplicates:
+        raise ValueError(f'Duplicate {name} names: {", ".join(duplicates)}')
+    logger.debug({f'Compiled {name}': len(filepaths)})
+
+    # Post fill a way to lookup by index and by symbol.  This post-fill
+    # only lives in the content cache and won't be saved anywhere else.
     # Add indices
-    if path is None:
-        # This can be used to search by index.  These indices are
-        # generated at runtime so they shouldn't be part of any
-        # permanent storage.
-        data['_indices'] = {}
-        for index, data_found in enumerate(data.items()):
-            data_name, data_value = data_found
-            if data_name.startswith('_'):
-                continue
-            data_value['index'] = index
-            data['_indices'][index] = data_value['name']
-
-        # Symbols allows for lookup by symbol.  Given multiple symbols
-        # for a given tile, then a random one is chosen.
-        #
-        # TODO: Create a Map DSL to eliminate any randomness on
-        # pre-generated maps for symbols with multiple options
-        data['_symbols'] = {}
-        for data_name, data_value in data.items():
-            if data_name == 'default':
-                continue
-            elif data_name.startswith('_'):
-                continue
-            elif not data_value.get('display', {}).get('icon', {}).get('character'):
-                continue
-            character = data_value['display']['icon']['character']
-            data['_symbols'].setdefault(character,[]).append(data_value['index'])
+    # This can be used to search by index.  These indices are
+    # generated at runtime so they shouldn't be part of any
+    # permanent storage.
+    data['_indices'] = {}
+    for index, data_found in enumerate(data.items()):
+        data_name, data_value = data_found
+        if data_name.startswith('_'):
+            continue
+        data_value['index'] = index
+        data['_indices'][index] = data_value['name']
+
+    # Symbols allows for lookup by symbol.  Given multiple symbols
+    # for a given tile, then a random one is chosen.
+    #
+    # TODO: Create a Map DSL to eliminate any randomness on
+    # pre-generated maps for symbols with multiple options
+    data['_symbols'] = {}
+    for data_name, data_value in data.items():
+        if data_name == 'default':
+            continue
+        elif data_name.startswith('_'):
+            continue
+        elif not data_value.get('display', {}).get('icon', {}).get('character'):
+            continue
+        character = data_value['display']['icon']['character']
+        data['_symbols'].setdefault(character,[]).append(data_value['index'])
     return data
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import copy
+from collections.abc import MutableMapping
+
+
+# Marks a template key removed from an instance
+_REMOVED = object()
+
+
+class Entity(MutableMapping):
+    """A mob or item instance sharing its template.
+
+    Only what differs from the template, such as health or whether an
+    item is equipped, is stored on the instance; every other key falls
+    through to the template, which is never written to.  Nested values
+    (``display``, colors, ...) are shared with the template and every
+    other instance of it, so change them by assigning a new value rather
+    than editing them in place.
+
+    Args:
+        template (dict): the mob or item definition
+        **overrides: values specific to this instance
+    """
+
+    __slots__ = ('template', 'overrides')
+
+    def __init__(self, template, **overrides):
+        self.template = template
+        self.overrides = overrides
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        name = self.get('name')
+        changes = {key: value for key, value in self.overrides.items() if value is not _REMOVED}
+        string = f'<{cname} {name} {changes}>'
+        return string
+
+    def __getitem__(self, key):
+        value = self.overrides.get(key, self.template.get(key, _REMOVED))
+        if value is _REMOVED:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.overrides[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key in self.template:
+            self.overrides[key] = _REMOVED
+        else:
+            del self.overrides[key]
+
+    def __contains__(self, key):
+        value = self.overrides.get(key, self.template.get(key, _REMOVED))
+        return value is not _REMOVED
+
+    def __iter__(self):
+        for key in self.template:
+            if self.overrides.get(key) is not _REMOVED:
+                yield key
+        for key, value in self.overrides.items():
+            if key not in self.template and value is not _REMOVED:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __copy__(self):
+        return self.__class__(self.template, **self.overrides)
+
+    def __deepcopy__(self, memo):
+        # The template stays shared; only the instance's own values are copied
+        return self.__class__(self.template, **copy.deepcopy(self.overrides, memo))
+
+    def copy(self):
+        return self.__copy__()
+
+
+def spawn(template, **overrides):
+    """Creates an instance of a mob or item template.
+
+    Args:
+        template (dict): the mob or item definition
+        **overrides: values specific to this instance
+
+    Returns:
+        Entity: the new instance
+    """
+    return Entity(template, **overrides)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+import atexit
+
+import numpy as np
+
+from .logger import get_logger
+from .level_maps import LevelMap
+from .terrain import focus_level, get_level_terrain, get_level_costs
+from .world import ChunkedWorld
+from .algorithms.executor import PathingExecutor
+from .algorithms.pathing import DijkstraMap, flee_map, flow_field
+
+
+logger = get_logger(__name__)
+
+
+exit_tiles = ['ladder-down', 'ladder-up', 'stairs-down', 'stairs-up']
+
+# Goal map following the tiles that carry each kind of entity
+entity_goals = {'items': 'items', 'mobs': 'allies'}
+
+# Goal maps that also get a flee map, stored as ``flee-<goal>``
+flee_goals = ['character']
+
+
+def find_character(game_state):
+    return [game_state['character-position']]
+
+
+def find_items(game_state):
+    return find_entities(game_state, 'items')
+
+
+def find_allies(game_state):
+    return find_entities(game_state, 'mobs')
+
+
+def find_exits(game_state):
+    return list(level_entities(game_state)['exits'])
+
+
+# Maps a goal name to the function that finds its sources
+goal_finders = {
+    'character': find_character,
+    'items': find_items,
+    'allies': find_allies,
+    'exits': find_exits,
+}
+
+
+def scan_level(level_map):
+    """Finds the positions of items, mobs and exits on a level.
+
+    Only tile dicts that were handed out can carry items or mobs, so the
+    untouched cells of a :class:`~.level_maps.LevelMap` (or of a chunked
+    world's focused chunks) are never created; their exits are found in
+    the tile index grid instead.
+
+    Returns:
+        dict: {'items': set, 'mobs': set, 'exits': list} of positions
+    """
+    entities = {kind: set() for kind in entity_goals}
+    if isinstance(level_map, ChunkedWorld):
+        cells = list(level_map.window_cells())
+        origin, indices, _ = level_map.window_indices()
+    elif isinstance(level_map, LevelMap):
+        cells = list(level_map.cells.items())
+        origin, indices = (0, 0), level_map.current_indices()
+    else:
+        cells = list(level_map.items())
+        origin, indices = None, None
+    for position, tile in cells:
+        for kind, positions in entities.items():
+            if tile.get(kind):
+                positions.add(position)
+    if indices is None:
+        entities['exits'] = [position for position, tile in cells if tile['name'] in exit_tiles]
+    else:
+        exit_indices = [index for index, name in level_map.names.items() if name in exit_tiles]
+        ys, xs = np.nonzero(np.isin(indices, exit_indices))
+        entities['exits'] = list(zip((ys + origin[0]).tolist(), (xs + origin[1]).tolist()))
+        extra = getattr(level_map, 'extra', [])
+        entities['exits'] += [position for position in extra if level_map[position]['name'] in exit_tiles]
+    return entities
+
+
+def level_entities(game_state):
+    """Provides the positions of items, mobs and exits on the current level.
+
+    The level is scanned once (see :func:`scan_level`), or each time a
+    chunked world's window moves.  From then on the item and mob
+    positions are kept up to date by :func:`update_entities` wherever
+    mobs move or items are picked up, so goal finders never walk the
+    level.
+
+    Returns:
+        dict: {'items': set, 'mobs': set, 'exits': list} of positions
+    """
+    level_map = game_state['current-level']
+    window = focus_level(game_state)
+    scanned = (game_state.get('level-entities-source'), game_state.get('level-entities-window'))
+    if game_state.get('level-entities') is None or scanned[0] is not level_map or scanned[1] != window:
+        game_state['level-entities'] = scan_level(level_map)
+        game_state['level-entities-source'] = level_map
+        game_state['level-entities-window'] = window
+    return game_state['level-entities']
+
+
+def update_entities(game_state, kind, *positions):
+    """Records tiles that gained or lost items or mobs.
+
+    Each position is checked against its tile, and the goal map
+    following that kind of entity is marked dirty.
+
+    Args:
+        game_state(dict): the game state
+        kind(str): ``items`` or ``mobs``
+        positions(tuple): positions whose tiles changed
+    """
+    level_map = game_state['current-level']
+    entities = game_state.get('level-entities')
+    if entities is not None and game_state.get('level-entities-source') is level_map:
+        tracked = entities[kind]
+        for position in positions:
+            tile = level_map.get(position)
+            if tile and tile.get(kind):
+                tracked.add(position)
+            else:
+                tracked.discard(position)
+    mark_dirty(game_state, entity_goals[kind])
+
+
+def find_entities(game_state, kind):
+    level_map = game_state['current-level']
+    tracked = level_entities(game_state)[kind]
+    # Tiles emptied without going through update_entities drop out here
+    stale = [position for position in tracked if not (level_map.get(position) or {}).get(kind)]
+    tracked.difference_update(stale)
+    return sorted(tracked)
+
+
+def find_goal_sources(game_state, grid, find_sources):
+    return [position for position in find_sources(game_state) if grid.contains(position, passable=False)]
+
+
+def mark_dirty(game_state, *goals):
+    """Flags goal maps whose sources have changed.
+
+    Args:
+        game_state(dict): the game state
+        goals(str): goal names; none means every goal
+    """
+    goals = goals or tuple(goal_finders)
+    game_state.setdefault('dijkstra-dirty', set()).update(goals)
+
+
+def update_goal_maps(game_state, force=False):
+    """Brings every goal map in ``game_state['dijkstra-maps']`` up to date.
+
+    Each goal gets one multi-source map covering all of its sources, so
+    any number of mobs can share it.  Only goals flagged through
+    :func:`mark_dirty` (or hit by a tile change this round) are
+    repaired.  Flee maps of updated goals are dropped and only rebuilt
+    when asked for (see :func:`get_goal_map`).
+    Flow fields of updated maps are dropped (see :func:`get_flow_field`).
+    Entry costs come from the level's compiled terrain (see
+    :func:`~.terrain.get_level_terrain`).  Maps built from scratch are
+    farmed out to worker processes when ``game_state['pathing-workers']``
+    is set (see :func:`get_pathing_executor`).  In a chunked world only
+    sources inside the compiled window around the character count.
+
+    Args:
+        game_state(dict): the game state
+        force(bool): rebuild every map from scratch
+
+    Returns:
+        dict: mapping of goal name to goal map
+    """
+    grid, costs = get_level_terrain(game_state)
+    dijkstra_maps = game_state.setdefault('dijkstra-maps', {})
+    dirty = game_state.setdefault('dijkstra-dirty', set())
+    flow_fields = game_state.setdefault('flow-fields', {})
+    tile_changes = [
+        position for position in game_state.get('round-updates', {}).get('tile-changes') or []
+        if grid.contains(position, passable=False)
+    ]
+    updated = set()
+    rebuilds = {}
+    for goal, find_sources in goal_finders.items():
+        goal_map = dijkstra_maps.get(goal)
+        if force or not isinstance(goal_map, DijkstraMap) or goal_map.grid is not grid:
+            rebuilds[goal] = find_goal_sources(game_state, grid, find_sources)
+            updated.add(goal)
+            continue
+        if tile_changes:
+            goal_map.update(tile_changes, costs=get_level_costs(game_state, tile_changes))
+            updated.add(goal)
+        if goal in dirty:
+            goal_map.move_sources(find_goal_sources(game_state, grid, find_sources))
+            updated.add(goal)
+
+    # Whole maps are independent of each other, so they can be built
+    # side by side when the game has a pathing executor
+    executor = get_pathing_executor(game_state)
+    if executor is not None and len(rebuilds) > 1:
+        dijkstra_maps.update(executor.build_maps(grid, rebuilds, costs=costs))
+    else:
+        for goal, sources in rebuilds.items():
+            dijkstra_maps[goal] = DijkstraMap(grid, sources, costs=costs)
+
+    for goal in updated:
+        flow_fields.pop(goal, None)
+        if goal in flee_goals:
+            # Rebuilt by get_goal_map the next time something asks for it
+            dijkstra_maps.pop(f'flee-{goal}', None)
+            flow_fields.pop(f'flee-{goal}', None)
+    if updated:
+        logger.trace({'Updated goal maps': sorted(updated)})
+    dirty.clear()
+    return dijkstra_maps
+
+
+def get_flow_field(game_state, goal):
+    """Provides the downhill flow field of a goal map.
+
+    Flow fields are built on first use and kept until the goal map is
+    next updated.
+
+    Args:
+        game_state(dict): the game state
+        goal(str): name of the goal map
+
+    Returns:
+        array: int8 direction index per cell (see :func:`~.algorithms.pathing.flow_field`); None if there is no such goal map
+    """
+    if goal is None:
+        return None
+    flow_fields = game_state.setdefault('flow-fields', {})
+    if goal not in flow_fields:
+        goal_map = get_goal_map(game_state, goal)
+        if not isinstance(goal_map, DijkstraMap):
+            # Flee maps come with their flow field
+            return flow_fields.get(goal)
+        flow_fields[goal] = flow_field(goal_map.costs, include_diagonals=True)
+    return flow_fields[goal]
+
+
+def get_goal_map(game_state, goal):
+    """Provides a goal map, building a flee map the first time it's asked for.
+
+    Flee maps (``flee-<goal>``, see :data:`flee_goals`) cost a full pass
+    over the level, so they're only built for the mobs that follow them
+    and kept until their goal is next updated.
+
+    Args:
+        game_state(dict): the game state
+        goal(str): name of the goal map
+
+    Returns:
+        mapping: the goal map; None if there is no such goal map
+    """
+    dijkstra_maps = game_state.get('dijkstra-maps', {})
+    goal_map = dijkstra_maps.get(goal)
+    source_goal = goal[len('flee-'):] if goal.startswith('flee-') else None
+    if goal_map is None and source_goal in flee_goals and source_goal in dijkstra_maps:
+        grid, costs = get_level_terrain(game_state)
+        flee_costs = flee_map(grid, dijkstra_maps[source_goal].costs, entry=costs)
+        goal_map = dijkstra_maps[goal] = grid.to_mapping(flee_costs)
+        game_state.setdefault('flow-fields', {})[goal] = flow_field(flee_costs, include_diagonals=True)
+    return goal_map
+
+
+def get_pathing_executor(game_state):
+    """Provides the process pool used to build goal maps.
+
+    A pool is only started when ``game_state['pathing-workers']`` asks
+    for worker processes; otherwise maps are built in process.
+
+    Returns:
+        PathingExecutor: the executor; None when maps are built in process
+    """
+    workers = game_state.get('pathing-workers')
+    executor = game_state.get('pathing-executor')
+    if not workers:
+        return None
+    if executor is None or executor.max_workers != workers:
+        shutdown_pathing_executor(game_state)
+        executor = PathingExecutor(max_workers=workers)
+        # Workers and shared memory must not outlive the game, however it ends
+        atexit.register(executor.shutdown)
+        game_state['pathing-executor'] = executor
+    return executor
+
+
+def shutdown_pathing_executor(game_state):
+    """Stops the goal map process pool, if one was started.
+
+    The worker processes are stopped and any shared memory they still
+    use is unlinked.
+    """
+    executor = game_state.pop('pathing-executor', None)
+    if executor is not None:
+        executor.shutdown()
+        atexit.unregister(executor.shutdown)
@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""Compiled level maps
+
+ASCII ``.map`` files are compiled once into a compact binary file: a
+small header, the distinct map symbols, and a grid holding one byte (two
+when a map uses more than 255 symbols) per cell that indexes those
+symbols.  The grid is memory mapped, so loading a compiled level reads
+the header and little else.  Symbols are turned into tile indices when
+the level is loaded, which keeps compiled levels valid when the tile
+data changes.
+
+Compiled levels are kept next to the content cache (see
+:mod:`.content_cache`) and rebuilt whenever their source changes.
+"""
+import os
+import re
+import struct
+import hashlib
+import threading
+from random import getrandbits
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .content_cache import get_cache_dir
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
+LEVEL_MAGIC = b'LOSELVL\0'
+LEVEL_VERSION = 1
+# magic, version, height, width, cell size, symbols size, source mtime (ns), source size
+LEVEL_HEADER = struct.Struct('<8sHHHBxIqq')
+# Symbol slot of positions missing from a ragged map
+NO_SYMBOL = 0
+
+
+class LevelMap(MutableMapping):
+    """Level tiles by ``(y, x)`` position over a tile index grid.
+
+    Behaves like the plain dict of level tiles it replaces.  A position's
+    tile dict is only created the first time it is looked up and is kept
+    from then on, so changes made to it stick.  Positions that were never
+    looked up cost one grid cell.
+
+    Args:
+        indices (array): 2D tile index per cell; the dtype's largest value marks a missing cell
+        names (dict): tile name by tile index
+    """
+
+    def __init__(self, indices, names):
+        self.indices = indices
+        self.names = names
+        self.missing = np.iinfo(indices.dtype).max
+        self.cells = {}  # (y, x): tile dict handed out
+        self._deleted = set()
+        self._extra = {}  # positions outside the grid: None
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {self.shape} {len(self)} tiles>'
+        return string
+
+    @property
+    def shape(self):
+        return self.indices.shape
+
+    @property
+    def extra(self):
+        """Positions set outside the grid."""
+        return list(self._extra)
+
+    def current_indices(self):
+        """Tile index per cell as the level stands now.
+
+        Tiles renamed since loading (e.g. an opened door) are taken into
+        account; positions outside the grid are not.
+
+        Returns:
+            array: 2D intp tile index per cell; -1 where there's no tile
+        """
+        indices = self.indices.astype(np.intp)
+        indices[self.indices == self.missing] = -1
+        for y, x in self._deleted:
+            indices[y, x] = -1
+        if self.cells:
+            lookup = {name: index for index, name in self.names.items()}
+            for (y, x), cell in self.cells.items():
+                if (y, x) not in self._extra:
+                    indices[y, x] = lookup[cell['name']]
+        return indices
+
+    def find(self, name):
+        """Finds the cells holding a tile, without handing out tiles.
+
+        Args:
+            name (str): tile name to look for
+
+        Returns:
+            list: positions of the matching cells
+        """
+        indices = [index for index, tile_name in self.names.items() if tile_name == name]
+        ys, xs = np.nonzero(np.isin(self.current_indices(), indices))
+        found = list(zip(ys.tolist(), xs.tolist()))
+        found.extend(position for position in self._extra if self.cells[position]['name'] == name)
+        return found
+
+    def _in_grid(self, position):
+        try:
+            y, x = position
+        except (TypeError, ValueError):
+            return False
+        if not isinstance(y, (int, np.integer)) or not isinstance(x, (int, np.integer)):
+            return False
+        height, width = self.indices.shape
+        return 0 <= y < height and 0 <= x < width and self.indices[y, x] != self.missing
+
+    def __contains__(self, position):
+        if position in self.cells:
+            return True
+        return position not in self._deleted and self._in_grid(position)
+
+    def __getitem__(self, position):
+        cell = self.cells.get(position)
+        if cell is None:
+            if position in self._deleted or not self._in_grid(position):
+                raise KeyError(position)
+            y, x = position
+            cell = {'name': self.names[int(self.indices[y, x])]}
+            self.cells[position] = cell
+        return cell
+
+    def __setitem__(self, position, cell):
+        if position in self._deleted:
+            self._deleted.discard(position)
+        elif not self._in_grid(position):
+            self._extra[position] = None
+        self.cells[position] = cell
+
+    def __delitem__(self, position):
+        if position not in self:
+            raise KeyError(position)
+        self.cells.pop(position, None)
+        if position in self._extra:
+            del self._extra[position]
+        else:
+            self._deleted.add(position)
+
+    def __iter__(self):
+        ys, xs = np.nonzero(self.indices != self.missing)
+        for position in zip(ys.tolist(), xs.tolist()):
+            if position not in self._deleted:
+                yield position
+        yield from list(self._extra)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.indices != self.missing)) - len(self._deleted) + len(self._extra)
+
+
+class LevelRegistry(MutableMapping):
+    """Levels by name, loaded the first time they're needed.
+
+    Levels are registered with the path of their .map file and only
+    loaded when first looked up, so start up costs the same however many
+    levels there are.  :meth:`prefetch` loads a level on a background
+    thread ahead of time; looking it up then waits for that load rather
+    than starting another.  Loaded levels are kept, along with every
+    change made to them.
+
+    Each level gets a random seed when registered so the tiles picked
+    for it don't depend on when, or on which thread, it's loaded.
+
+    Args:
+        loader (callable): called with a map path and a seed; returns the level map
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.paths = {}  # name: (path, seed)
+        self._levels = {}
+        self._pending = {}  # name: Future
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {len(self._levels)} of {len(self)} levels loaded>'
+        return string
+
+    def register(self, name, path):
+        """Adds a level to be loaded from a .map file on first use."""
+        with self._lock:
+            self.paths[name] = (path, getrandbits(64))
+            self._levels.pop(name, None)
+
+    def is_loaded(self, name):
+        return name in self._levels
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name in self._levels:
+                return self._levels[name]
+            if name not in self.paths:
+                raise KeyError(name)
+            future = self._pending.get(name)
+        if future is not None:
+            future.result()  # raises if the background load failed
+            return self._levels[name]
+        return self._load(name)
+
+    def __setitem__(self, name, level_map):
+        with self._lock:
+            self._levels[name] = level_map
+
+    def __delitem__(self, name):
+        with self._lock:
+            if name not in self.paths and name not in self._levels:
+                raise KeyError(name)
+            self.paths.pop(name, None)
+            self._levels.pop(name, None)
+
+    def __iter__(self):
+        return iter(sorted(set(self.paths) | set(self._levels), key=level_sort_key))
+
+    def __len__(self):
+        return len(set(self.paths) | set(self._levels))
+
+    def _load(self, name):
+        path, seed = self.paths[name]
+        level_map = self.loader(path, seed)
+        with self._lock:
+            # A level assigned or loaded meanwhile wins
+            level_map = self._levels.setdefault(name, level_map)
+            self._pending.pop(name, None)
+        logger.debug({'Loaded level': name})
+        return level_map
+
+    def prefetch(self, name):
+        """Starts loading a level on a background thread.
+
+        Returns:
+            Future: the load; None when the level is loaded or unknown
+        """
+        with self._lock:
+            if name in self._levels or name not in self.paths:
+                return None
+            if name not in self._pending:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='level-prefetch')
+                self._pending[name] = self._executor.submit(self._load, name)
+            return self._pending[name]
+
+    def next_level(self, name):
+        """The level following another in name order (level0, level1, ...)."""
+        names = list(self)
+        if name not in names:
+            return None
+        index = names.index(name) + 1
+        return names[index] if index < len(names) else None
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+def level_sort_key(name):
+    """Sorts level names with their numbers in numeric order."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def resolve_level_map(tiles, symbols, grid, seed=None):
+    """Turns a symbol slot grid into a level map.
+
+    Args:
+        tiles (dict): tile data, including its ``_indices`` and ``_symbols``
+        symbols (str): map symbol for each slot of the grid
+        grid (array): 2D symbol slot per cell
+        seed (int): seed for picking between tiles (see :func:`resolve_symbols`)
+
+    Returns:
+        LevelMap: the level's tiles
+    """
+    return LevelMap(resolve_symbols(tiles, symbols, grid, seed=seed), tiles['_indices'])
+
+
+def resolve_symbols(tiles, symbols, grid, seed=None, origin=(0, 0)):
+    """Turns a symbol slot grid into a tile index grid.
+
+    Symbols standing for several tiles (e.g. a floor that may hide a
+    trap) pick one at random per cell, drawing from :mod:`random` when
+    no seed is given so seeded games get the same level.
+
+    Args:
+        tiles (dict): tile data, including its ``_indices`` and ``_symbols``
+        symbols (str): map symbol for each slot of the grid
+        grid (array): 2D symbol slot per cell
+        seed (int): seed for picking between tiles
+        origin (tuple): position of the grid's first cell, for error messages
+
+    Returns:
+        array: 2D tile index per cell; the dtype's largest value marks a missing cell
+    """
+    names = tiles['_indices']
+    dtype = np.uint8 if max(names, default=0) < np.iinfo(np.uint8).max else np.uint16
+    indices = np.full(grid.shape, np.iinfo(dtype).max, dtype=dtype)
+    rng = None
+    for slot, symbol in enumerate(symbols):
+        if slot == NO_SYMBOL:
+            continue
+        cells = grid == slot
+        if not cells.any():
+            continue
+        tile_indices = tiles['_symbols'].get(symbol)
+        if not tile_indices:
+            y, x = (int(axis[0]) + offset for axis, offset in zip(np.nonzero(cells), origin))
+            raise ValueError(f'No tile found for: "{symbol}" at {(y, x)}')
+        if len(tile_indices) == 1:
+            indices[cells] = tile_indices[0]
+        else:
+            rng = rng or np.random.default_rng(getrandbits(64) if seed is None else seed)
+            indices[cells] = np.array(tile_indices)[rng.integers(len(tile_indices), size=int(cells.sum()))]
+    return indices
+
+
+def parse_level_text(text):
+    """Splits a .map file into its symbols and a symbol slot grid.
+
+    Returns:
+        tuple: (str: symbols, slot 0 being unused, array: 2D symbol slot per cell)
+    """
+    rows = text.replace('\r', '').split('\n')
+    if rows and not rows[-1]:
+        rows.pop()  # nothing follows the final newline
+    symbols = '\0' + ''.join(sorted(set(''.join(rows))))
+    dtype = np.uint8 if len(symbols) <= 256 else np.uint16
+    slots = {symbol: slot for slot, symbol in enumerate(symbols)}
+    grid = np.full((len(rows), max((len(row) for row in rows), default=0)), NO_SYMBOL, dtype=dtype)
+    for y, row in enumerate(rows):
+        grid[y, :len(row)] = [slots[symbol] for symbol in row]
+    return symbols, grid
+
+
+def write_level_file(map_path, level_path):
+    """Compiles an ASCII .map file into a binary level file."""
+    stat = os.stat(map_path)
+    with open(map_path, 'r') as map_stream:
+        symbols, grid = parse_level_text(map_stream.read())
+    encoded = symbols.encode('utf-8')
+    height, width = grid.shape
+    header = LEVEL_HEADER.pack(
+        LEVEL_MAGIC, LEVEL_VERSION, height, width, grid.itemsize, len(encoded), stat.st_mtime_ns, stat.st_size,
+    )
+    temporary_path = f'{level_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    os.makedirs(os.path.dirname(level_path), exist_ok=True)
+    with open(temporary_path, 'wb') as level_stream:
+        level_stream.write(header)
+        level_stream.write(encoded)
+        level_stream.write(b'\0' * (-(len(header) + len(encoded)) % 8))  # align the grid
+        level_stream.write(grid.astype(grid.dtype.newbyteorder('<')).tobytes())
+    os.replace(temporary_path, level_path)
+    logger.debug({'Compiled level': map_path, 'into': level_path})
+
+
+def read_level_file(level_path, map_path=None):
+    """Maps a binary level file into memory.
+
+    Args:
+        level_path (str): the compiled level
+        map_path (str): its source; the file is refused if the source changed
+
+    Returns:
+        tuple: (str: symbols, memmap: read only symbol slot grid); None if stale or unreadable
+    """
+    try:
+        with open(level_path, 'rb') as level_stream:
+            header = level_stream.read(LEVEL_HEADER.size)
+            magic, version, height, width, itemsize, symbols_size, mtime, size = LEVEL_HEADER.unpack(header)
+            if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+                return None
+            if map_path is not None:
+                stat = os.stat(map_path)
+                if (stat.st_mtime_ns, stat.st_size) != (mtime, size):
+                    return None
+            symbols = level_stream.read(symbols_size).decode('utf-8')
+    except (OSError, struct.error, UnicodeDecodeError):
+        return None
+    offset = LEVEL_HEADER.size + symbols_size
+    offset += -offset % 8
+    dtype = np.dtype('<u1' if itemsize == 1 else '<u2')
+    if not height or not width:
+        return symbols, np.zeros((height, width), dtype=dtype)
+    grid = np.memmap(level_path, dtype=dtype, mode='r', offset=offset, shape=(height, width))
+    return symbols, grid
+
+
+def get_level_path(map_path):
+    """Where the compiled form of a .map file is kept; None without a cache."""
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    map_path = os.path.abspath(map_path)
+    digest = hashlib.sha1(map_path.encode('utf-8')).hexdigest()[:12]
+    basename = os.path.splitext(os.path.basename(map_path))[0]
+    return os.path.join(cache_dir, 'levels', f'{basename}-{digest}.lvl')
+
+
+def load_level_symbols(map_path):
+    """Loads a .map file's symbols and grid, compiling it when needed.
+
+    Returns:
+        tuple: (str: symbols, array: 2D symbol slot per cell)
+    """
+    level_path = get_level_path(map_path)
+    if level_path is None:
+        with open(map_path, 'r') as map_stream:
+            return parse_level_text(map_stream.read())
+    compiled = read_level_file(level_path, map_path)
+    if compiled is None:
+        try:
+            write_level_file(map_path, level_path)
+        except OSError as error:
+            logger.warning({'Could not compile level': map_path, 'error': repr(error)})
+            with open(map_path, 'r') as map_stream:
+                return parse_level_text(map_stream.read())
+        compiled = read_level_file(level_path, map_path)
+    return compiled
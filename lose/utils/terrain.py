@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+
+from .logger import get_logger
+from .algorithms.fov import FieldOfView
+from .algorithms.grid import Grid
+from .algorithms.hierarchy import ClusterGraph
+from .level_maps import LevelMap
+from .world import ChunkedWorld
+
+
+logger = get_logger(__name__)
+
+# Flattened tile record: the glyph, its colors and how much it blocks
+TILE_RECORD = np.dtype([
+    ('glyph', 'U1'),
+    ('lit', 'u1', (3,)),
+    ('unlit', 'u1', (3,)),
+    ('movement', 'i2'),
+    ('sight', 'i2'),
+])
+
+# Tiles without colors of their own are drawn with these
+DEFAULT_COLORS = {'lit': (200, 200, 200), 'unlit': (100, 100, 100)}
+
+
+class TileTable(object):
+    """Every tile definition resolved and flattened into one array.
+
+    Ref chains are followed once when the table is built, so per cell
+    code only indexes arrays instead of walking nested tile dicts.  Tile
+    indices match the ``_indices`` of the tile data when it has them.
+
+    Args:
+        tiles (dict): tile definitions by name
+    """
+
+    def __init__(self, tiles):
+        indices = tiles.get('_indices') or dict(enumerate(name for name in tiles if not name.startswith('_')))
+        self.names = [indices[index] for index in range(len(indices))]
+        self.index = {name: index for index, name in enumerate(self.names)}
+        self.records = np.zeros(len(self.names), dtype=TILE_RECORD)
+        for index, name in enumerate(self.names):
+            tile = tiles[name]
+            display = tile.get('display') or resolve_tile(tiles, name).get('display') or {}
+            icon = display.get('icon', {})
+            colors = icon.get('color') or DEFAULT_COLORS
+            record = self.records[index]
+            record['glyph'] = icon.get('character') or ' '
+            record['lit'] = tuple(colors.get('lit') or DEFAULT_COLORS['lit'])
+            record['unlit'] = tuple(colors.get('unlit') or DEFAULT_COLORS['unlit'])
+            record['movement'] = movement_rate(tiles, {'name': name})
+            record['sight'] = sight_rate(tiles, {'name': name})
+        movement = self.records['movement'].astype(float)
+        with np.errstate(divide='ignore'):
+            self.costs = np.where(movement >= 100, math.inf, 100 / (100 - np.clip(movement, 0, None)))
+        self.transparent = (self.records['sight'] < 100) & (self.records['movement'] < 100)
+        # Plain python copies for code that draws one cell at a time
+        self.glyphs = self.records['glyph'].tolist()
+        self.lit = [tuple(color) for color in self.records['lit'].tolist()]
+        self.unlit = [tuple(color) for color in self.records['unlit'].tolist()]
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {len(self)} tiles>'
+        return string
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, name):
+        return self.records[self.index[name]]
+
+
+def get_tile_table(tiles):
+    """Provides the flattened tile table, building it on first use.
+
+    Returns:
+        TileTable: kept in the tile data as ``_table``
+    """
+    table = tiles.get('_table')
+    if table is None:
+        table = TileTable(tiles)
+        tiles['_table'] = table
+    return table
+
+
+def resolve_tile(tiles, name):
+    """Follows a tile's ``ref`` chain to the tile that defines it.
+
+    Args:
+        tiles(dict): tile definitions by name
+        name(str): name of the tile to resolve
+
+    Returns:
+        dict: the referenced tile definition
+    """
+    tile = tiles[name]
+    seen = {name}
+    while tile.get('ref'):
+        if tile['ref'] in seen:
+            raise ValueError(f'Tile {name} has a circular ref')
+        seen.add(tile['ref'])
+        tile = tiles[tile['ref']]
+    return tile
+
+
+def movement_rate(tiles, tile):
+    """Finds how much a tile blocks movement.
+
+    A level tile's own ``blocking`` block wins over its definition's.
+
+    Args:
+        tiles(dict): tile definitions by name
+        tile(dict): a level map tile; None is treated as the default tile
+
+    Returns:
+        int: percent of movement blocked; 100 is impassable
+    """
+    tile = tile or {'name': 'default'}
+    blocking = tile.get('blocking') or resolve_tile(tiles, tile['name']).get('blocking') or {}
+    return blocking.get('movement', {}).get('rate') or 0
+
+
+def sight_rate(tiles, tile):
+    """Finds how opaque a tile is.
+
+    Args:
+        tiles(dict): tile definitions by name
+        tile(dict): a level map tile; None is treated as the default tile
+
+    Returns:
+        int: percent of sight blocked; 100 is opaque
+    """
+    tile = tile or {'name': 'default'}
+    blocking = tile.get('blocking') or resolve_tile(tiles, tile['name']).get('blocking') or {}
+    return blocking.get('sight', {}).get('opaque') or 0
+
+
+def blocks_sight(tiles, tile):
+    """Finds whether a tile blocks line of sight.
+
+    Tiles that block movement implicitly also block sight.
+
+    Args:
+        tiles(dict): tile definitions by name
+        tile(dict): a level map tile; None is treated as the default tile
+
+    Returns:
+        bool: True if light can't pass through the tile
+    """
+    return sight_rate(tiles, tile) >= 100 or movement_rate(tiles, tile) >= 100
+
+
+def movement_cost(rate):
+    """Converts a blocking rate into the cost of entering a cell.
+
+    A rate of 0 costs 1, a rate of 60 costs 2.5 (only 40% of the movement
+    gets through) and a rate of 100 or more can't be entered at all.
+
+    Args:
+        rate(numeric): percent of movement blocked
+
+    Returns:
+        float: entry cost; inf when impassable
+    """
+    if rate >= 100:
+        return math.inf
+    return 100 / (100 - max(rate, 0))
+
+
+def level_indices(level_map, table):
+    """Lays a level map out as a grid of tile indices.
+
+    Args:
+        level_map(dict): mapping of (y, x) position to level tile
+        table(TileTable): the flattened tiles
+
+    Returns:
+        tuple: (tuple: origin of the grid, array: 2D tile index per cell; -1 where
+        there's no tile, list: (position, tile) of tiles carrying their own ``blocking``)
+    """
+    if isinstance(level_map, ChunkedWorld):
+        return level_map.window_indices()
+    if isinstance(level_map, LevelMap) and not level_map.extra:
+        overrides = [(position, tile) for position, tile in level_map.cells.items() if tile.get('blocking')]
+        return (0, 0), level_map.current_indices(), overrides
+    positions = np.array(list(level_map), dtype=np.intp).reshape(-1, 2)
+    y_min, x_min = positions.min(axis=0)
+    y_max, x_max = positions.max(axis=0)
+    indices = np.full((y_max - y_min + 1, x_max - x_min + 1), -1, dtype=np.intp)
+    overrides = []
+    for (y, x), tile in level_map.items():
+        indices[y - y_min, x - x_min] = table.index[tile['name']]
+        if tile.get('blocking'):
+            overrides.append(((y, x), tile))
+    return (int(y_min), int(x_min)), indices, overrides
+
+
+def compile_terrain(level_map, tiles):
+    """Compiles a level map into a pathing grid and movement costs.
+
+    Costs come from the flattened tile table; only tiles carrying their
+    own ``blocking`` block are looked at individually.
+
+    Args:
+        level_map(dict): mapping of (y, x) position to level tile
+        tiles(dict): tile definitions by name
+
+    Returns:
+        tuple: (Grid: passability, array: map shaped entry costs; inf when impassable)
+    """
+    if not level_map:
+        raise ValueError('Cannot compile terrain for an empty level')
+    table = get_tile_table(tiles)
+    (oy, ox), indices, overrides = level_indices(level_map, table)
+    costs = np.where(indices >= 0, table.costs[indices], movement_cost(movement_rate(tiles, None)))
+    for (y, x), tile in overrides:
+        costs[y - oy, x - ox] = movement_cost(movement_rate(tiles, tile))
+    grid = Grid(np.isfinite(costs), origin=(oy, ox))
+    return grid, costs
+
+
+def compile_transparency(level_map, tiles, shape, origin=(0, 0)):
+    """Compiles a level map into a field of view transparency array.
+
+    Unlike the pathing grid the array covers a fixed rectangle, starting
+    at ``origin``, and positions missing from the level are the default
+    tile.
+
+    Args:
+        level_map(dict): mapping of (y, x) position to level tile
+        tiles(dict): tile definitions by name
+        shape(tuple): (int: height, int: width) of the map
+        origin(tuple): (int: y, int: x) position of the first cell [default: (0, 0)]
+
+    Returns:
+        array: shape sized boolean array; True lets light through
+    """
+    default = not blocks_sight(tiles, None)
+    transparent = np.full(shape, default)
+    if not level_map:
+        return transparent
+    table = get_tile_table(tiles)
+    (oy, ox), indices, overrides = level_indices(level_map, table)
+    height, width = shape
+    ty, tx = origin
+    # The part of the level inside the map
+    top, left = max(oy, ty), max(ox, tx)
+    bottom, right = min(oy + indices.shape[0], ty + height), min(ox + indices.shape[1], tx + width)
+    if top < bottom and left < right:
+        window = indices[top - oy:bottom - oy, left - ox:right - ox]
+        transparent[top - ty:bottom - ty, left - tx:right - tx] = np.where(
+            window >= 0, table.transparent[window], default
+        )
+    for (y, x), tile in overrides:
+        if 0 <= y - ty < height and 0 <= x - tx < width:
+            transparent[y - ty, x - tx] = not blocks_sight(tiles, tile)
+    return transparent
+
+
+def focus_level(game_state):
+    """Centres a chunked world on the character.
+
+    Only the chunks around the character are compiled into terrain and
+    field of view (see :class:`~.world.ChunkedWorld`); plain levels are
+    compiled whole.
+
+    Returns:
+        tuple: (top, left, bottom, right) cell bounds of the compiled window; None for plain levels
+    """
+    level_map = game_state.get('current-level')
+    if not isinstance(level_map, ChunkedWorld):
+        return None
+    return level_map.focus(game_state.get('character-position') or (0, 0))
+
+
+def get_level_terrain(game_state):
+    """Provides the compiled terrain for the current level.
+
+    The terrain is compiled once per level, or each time the character
+    enters another chunk of a chunked world, and patched in place by
+    :func:`update_terrain` afterwards.
+
+    Returns:
+        tuple: (Grid: passability, array: map shaped entry costs)
+    """
+    level_map = game_state.get('current-level')
+    window = focus_level(game_state)
+    compiled = (game_state.get('level-grid-source'), game_state.get('level-grid-window'))
+    if game_state.get('level-grid') is None or compiled[0] is not level_map or compiled[1] != window:
+        grid, costs = compile_terrain(level_map, game_state['tiles'])
+        game_state['level-grid'] = grid
+        game_state['level-costs'] = costs
+        game_state['level-grid-source'] = level_map
+        game_state['level-grid-window'] = window
+    return game_state['level-grid'], game_state['level-costs']
+
+
+def get_level_costs(game_state, positions=None):
+    """Provides movement costs for the current level.
+
+    Args:
+        game_state(dict): the game state
+        positions(list): (y, x) positions to look up; None means the whole map
+
+    Returns:
+        array: map shaped entry costs, or a list with one cost per position
+    """
+    grid, costs = get_level_terrain(game_state)
+    if positions is None:
+        return costs
+    oy, ox = grid.origin
+    return [float(costs[y - oy, x - ox]) for y, x in positions]
+
+
+def get_level_hierarchy(game_state):
+    """Provides the hierarchical path finder for the current level.
+
+    It shares the level's compiled terrain and is kept up to date by
+    :func:`update_terrain`.
+
+    Returns:
+        ClusterGraph: cluster graph over the level's terrain
+    """
+    grid, costs = get_level_terrain(game_state)
+    hierarchy = game_state.get('level-hierarchy')
+    if hierarchy is None or hierarchy.grid is not grid:
+        hierarchy = ClusterGraph(grid, cluster_size=game_state.get('cluster-size'), costs=costs)
+        game_state['level-hierarchy'] = hierarchy
+    return hierarchy
+
+
+def get_level_fov(game_state):
+    """Provides the field of view for the current level.
+
+    The transparency is compiled once per level, or each time the
+    character enters another chunk of a chunked world, and patched in
+    place by :func:`update_terrain`.  ``fov-backend`` picks the
+    implementation.
+
+    Returns:
+        FieldOfView: field of view over the current level
+    """
+    level_map = game_state.get('current-level')
+    window = focus_level(game_state)
+    compiled = (game_state.get('level-fov-source'), game_state.get('level-fov-window'))
+    if game_state.get('level-fov') is None or compiled[0] is not level_map or compiled[1] != window:
+        if window is None:
+            origin, shape = (0, 0), (game_state['map-height'], game_state['map-width'])
+        else:
+            top, left, bottom, right = window
+            origin, shape = (top, left), (bottom - top, right - left)
+        transparent = compile_transparency(level_map, game_state['tiles'], shape, origin=origin)
+        game_state['level-fov'] = FieldOfView(
+            transparent, backend=game_state.get('fov-backend'), algorithm=game_state.get('fov-algorithm'),
+            origin=origin,
+        )
+        game_state['level-fov-source'] = level_map
+        game_state['level-fov-window'] = window
+    return game_state['level-fov']
+
+
+def compute_fov(game_state):
+    """Brings the character's field of view up to date.
+
+    Returns:
+        array: boolean mask of the visible positions, shaped like the
+        field of view's transparency (see :meth:`~.algorithms.fov.FieldOfView.view`)
+    """
+    fov = get_level_fov(game_state)
+    return fov.compute(
+        game_state['character-position'],
+        radius=game_state.get('torch-radius'),
+        light_walls=game_state.get('fov-light-walls', True),
+    )
+
+
+def update_terrain(game_state, positions):
+    """Patches the compiled terrain after level tiles changed.
+
+    Args:
+        game_state(dict): the game state
+        positions(list): (y, x) positions whose tiles changed
+    """
+    level_map = game_state.get('current-level')
+    tiles = game_state['tiles']
+    fov = game_state.get('level-fov')
+    if fov is not None and game_state.get('level-fov-source') is level_map:
+        for y, x in positions:
+            if fov.contains((y, x)):
+                fov.set_transparent((y, x), not blocks_sight(tiles, level_map.get((y, x))))
+    if game_state.get('level-grid') is None or game_state.get('level-grid-source') is not game_state.get('current-level'):
+        return  # Nothing compiled yet; it will be built from the current tiles
+    grid, costs = get_level_terrain(game_state)
+    oy, ox = grid.origin
+    # Changes outside a chunked world's window are compiled when it gets there
+    positions = [position for position in positions if grid.contains(position, passable=False)]
+    for y, x in positions:
+        cost = movement_cost(movement_rate(tiles, level_map.get((y, x))))
+        costs[y - oy, x - ox] = cost
+        grid.set_passable((y, x), math.isfinite(cost))
+    grid.forget_costs()
+    hierarchy = game_state.get('level-hierarchy')
+    if hierarchy is not None and hierarchy.grid is grid:
+        hierarchy.update(positions)
+    logger.trace({'Terrain updated': list(positions)})
@@ -5,6 +5,9 @@ from random import choice, random, randint
 
 import tcod
 
+from ..goals import update_entities
+from .rendering import mark_cells_dirty
+from ..terrain import get_tile_table, movement_rate, update_terrain
 from ..logger import get_logger
 
 
@@ -134,6 +137,8 @@ def handle_combat(game_state, position, event):
                 combat_msg = f'Player killed {mob_name}.'
                 if not tile['mobs']:
                     tile.pop('mobs')
+                update_entities(game_state, 'mobs', tile_position)
+                mark_cells_dirty(game_state, tile_position)
         else:
             combat_msg = f'Player missed.'
         logger.trace(combat_msg)
@@ -170,22 +175,29 @@ def handle_keys(key_mapping):
 
 def process_player_move(game_state, updated_player_position):
     tile = game_state['current-level'][updated_player_position]
-    tile_ref = game_state['tiles'][tile['name']]
-    if tile_ref['name'] == 'closed-door':
+    if tile.get('blocking'):
+        movement = movement_rate(game_state['tiles'], tile)
+    else:
+        movement = get_tile_table(game_state['tiles'])[tile['name']]['movement']
+    if tile['name'] == 'closed-door':
         tile['name'] = 'open-door'
+        update_terrain(game_state, [updated_player_position])
+        mark_cells_dirty(game_state, updated_player_position)
+        game_state['round-updates'].setdefault('tile-changes', []).append(updated_player_position)
     mobs = tile.get('mobs')
     items = tile.get('items')
     moved = False
-    blocking = tile.get('blocking') or tile_ref.get('blocking')
     if mobs:
         pass
-    elif not blocking or game_state['debug']:
+    elif movement <= 0 or game_state['debug']:
         game_state['character-position'] = updated_player_position
         moved = True
         if items:
             for item in items:
                 game_state['player-inventory'].append(item)
             tile.pop('items')
+            update_entities(game_state, 'items', updated_player_position)
+            mark_cells_dirty(game_state, updated_player_position)
     return moved
 
 
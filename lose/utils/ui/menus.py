@@ -1,16 +1,20 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-import heapq
 from random import random, randint
 
 import tcod
+import numpy as np
 
 from .keys import wait_for_user_input, handle_game_user_input
 from ..logger import get_logger
 from .windows import create_windows
-from .rendering import render_all
-from ..algorithms.pathing import create_dijkstra_map, get_neighbors
+from .rendering import mark_cells_dirty, mark_layers_dirty, render_all
+from ..goals import mark_dirty, shutdown_pathing_executor, update_entities, update_goal_maps, get_flow_field
+from ..terrain import get_level_terrain
+from ..algorithms.grid import DIRECTIONS
+from ..algorithms.distances import log_distance
+from ..algorithms.pathing import get_neighbors, bounded_dijkstra, flow_field
 
 logger = get_logger(__name__)
 
@@ -166,55 +170,60 @@ def msg_box(text, con, width=50):
 
 
 def play_game(game_state):
-    while not tcod.console_is_window_closed():
-        # render the screen
-
-        setup_round(game_state)
-
-        render_all(game_state)
-        tcod.console_flush()
-
-        user_key = handle_game_user_input(game_state)
-        update_mob_positions(game_state)
-        mob_combat(game_state)
-        update_dijkstra_maps(game_state)
-
-        # handle inventory
-        if user_key in ['i', 'I']:
-            item_selected, inventory_window = inventory_menu(game_state)
-            tcod.console_set_default_foreground(0, tcod.white)
-            tcod.console_set_default_background(0, tcod.black)
-
-        # handle debug maps
-        elif game_state['debug'] and user_key in ['shift+meta+d', 'shift+meta+D']:
-            pass
-            # render_debug_window(game_state)
-
-        # # erase all objects at their old locations, before they move
-        # for object in objects:
-        #     object.clear()
-
-        # # handle keys and exit game if needed
-        # player_action = handle_keys()
-        # if player_action == 'exit':
-        #     save_game()
-        #     break
-
-        # # let monsters take their turn
-        # if game_state == 'playing' and player_action != 'didnt-take-turn':
-        #     for object in objects:
-        #         if object.ai:
-        #             object.ai.take_turn()
+    try:
+        while not tcod.console_is_window_closed():
+            # render the screen
+
+            setup_round(game_state)
+
+            # Flushed every frame even when nothing was redrawn: input
+            # is polled, and the flush is what holds the loop to the
+            # frame rate set by sys_set_fps
+            render_all(game_state)
+            tcod.console_flush()
+
+            user_key = handle_game_user_input(game_state)
+            update_mob_positions(game_state)
+            mob_combat(game_state)
+            update_dijkstra_maps(game_state)
+
+            # handle inventory
+            if user_key in ['i', 'I']:
+                item_selected, inventory_window = inventory_menu(game_state)
+                tcod.console_set_default_foreground(0, tcod.white)
+                tcod.console_set_default_background(0, tcod.black)
+                mark_layers_dirty(game_state)  # the menu was drawn over them
+
+            # handle debug maps
+            elif game_state['debug'] and user_key in ['shift+meta+d', 'shift+meta+D']:
+                pass
+                # render_debug_window(game_state)
+
+            # # erase all objects at their old locations, before they move
+            # for object in objects:
+            #     object.clear()
+
+            # # handle keys and exit game if needed
+            # player_action = handle_keys()
+            # if player_action == 'exit':
+            #     save_game()
+            #     break
+
+            # # let monsters take their turn
+            # if game_state == 'playing' and player_action != 'didnt-take-turn':
+            #     for object in objects:
+            #         if object.ai:
+            #             object.ai.take_turn()
+    finally:
+        shutdown_pathing_executor(game_state)
 
 
 def update_dijkstra_maps(game_state, force=False):
-    character_position = game_state.get('character-position')
-    level_map = game_state.get('current-level')
     updates = game_state['round-updates']
     movement = updates.get('character-movement')
-    if movement or force:
-        new_map = create_dijkstra_map(level_map, character_position)
-        game_state.setdefault('dijkstra-maps', {})['character'] = new_map
+    if movement:
+        mark_dirty(game_state, 'character')
+    update_goal_maps(game_state, force=force)
 
 
 def setup_round(game_state):
@@ -228,12 +237,29 @@ def setup_round(game_state):
         game_state['current-round'] += 1
         if game_state['current-round'] % 16 == 0:
             player_health = game_state.get('player-health') or 10
-            if player_health < 10:
+            if player_health < (game_state.get('player-max-health') or 10):
                 player_health += 1
                 logger.trace('Player health is: {player_health}')
             game_state['player-health'] = player_health
 
 
+def get_awake_flow(awake_map):
+    """Builds the flow field over the region around the character.
+
+    Only the bounding box of the awake region is filled in, so the cost
+    doesn't depend on the size of the level.
+
+    Returns:
+        tuple: (array: flow field of the box, tuple: (y, x) of the box's top left cell)
+    """
+    nodes = np.array(list(awake_map), dtype=np.intp).reshape(-1, 2)
+    top, left = nodes.min(axis=0) - 1
+    bottom, right = nodes.max(axis=0) + 1
+    costs = np.full((bottom - top + 1, right - left + 1), np.inf)
+    costs[nodes[:, 0] - top, nodes[:, 1] - left] = list(awake_map.values())
+    return flow_field(costs, include_diagonals=True), (int(top), int(left))
+
+
 def update_mob_positions(game_state, cost_threshold=30):
     updates = game_state['round-updates']
     action = game_state.get('character-action') or updates.get('character-movement')
@@ -242,45 +268,44 @@ def update_mob_positions(game_state, cost_threshold=30):
     if not action:
         return
 
-    character_map = game_state['dijkstra-maps']['character']
+    # Only the region within reach of the threshold is searched.  Steps
+    # cost the log distance from the character, as they always have.
+    grid, _ = get_level_terrain(game_state)
+    awake_map = bounded_dijkstra(grid, character_position, max_cost=cost_threshold, cost_func=log_distance)
+    awake_flow, awake_origin = get_awake_flow(awake_map)
     level_map = game_state['current-level']
-    tiles = game_state['tiles']
-    cost_data = []
-    heapq.heapify(cost_data)
-    for position, cost in character_map.items():
-        data = cost, position
-        heapq.heappush(cost_data, (data))
-
-    cost, position = heapq.heappop(cost_data)
-    while cost <= cost_threshold:
+    moved_mobs = set()
+    moves = []
+    for position in awake_map:
         tile = level_map[position]
-        mobs = tile.get('mobs', [])
-        for mob in mobs:
-            neighbor_costs = []
-            for neighbor in get_neighbors(position, include_diagonals=True):
-                neighbor_tile = level_map[neighbor]
-                neighbor_cost = character_map[neighbor]
-                base_tile = tiles[neighbor_tile['name']]
-                blocks_movement = False
-                has_entity = False
-                if neighbor == character_position:
-                    has_entity = True
-                elif neighbor_tile.get('mobs'):
-                    has_entity = True
-                if neighbor_tile.get('blocking', {}).get('movement', {}).get('rate') == 100:
-                    blocks_movement = True
-                elif base_tile.get('blocking', {}).get('movement', {}).get('rate') == 100:
-                    blocks_movement = True
-                if not blocks_movement and not has_entity:
-                    neighbor_costs.append((neighbor_cost, neighbor))
-
-            neighbor_cost, updated_position = min(neighbor_costs)
-            mob_index = tile['mobs'].index(mob)
-            tile['mobs'].pop(mob_index)
+        for mob in list(tile.get('mobs', [])):
+            if id(mob) in moved_mobs:
+                continue
+            # Mobs may follow a shared goal map (e.g. flee-character)
+            # instead of chasing the character
+            flow = get_flow_field(game_state, mob.get('goal'))
+            if flow is None:
+                flow, (oy, ox) = awake_flow, awake_origin
+            else:
+                oy, ox = grid.origin
+            direction = flow[position[0] - oy, position[1] - ox]
+            if direction < 0:
+                continue
+            dy, dx = DIRECTIONS[direction]
+            updated_position = (position[0] + dy, position[1] + dx)
+            # Mobs wait for a blocked step to clear rather than side-step
+            if updated_position == character_position or level_map[updated_position].get('mobs'):
+                continue
+
+            tile['mobs'].remove(mob)
             if not tile['mobs']:
                 tile.pop('mobs')
             level_map[updated_position].setdefault('mobs', []).append(mob)
-        cost, position = heapq.heappop(cost_data)
+            mark_cells_dirty(game_state, position, updated_position)
+            moved_mobs.add(id(mob))
+            moves.extend([position, updated_position])
+    if moved_mobs:
+        update_entities(game_state, 'mobs', *moves)
 
 
 def mob_combat(game_state):
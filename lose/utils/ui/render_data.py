@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from ..terrain import DEFAULT_COLORS, get_tile_table
+
+
+# Colors that don't come from content
+PALETTE = {
+    'player': (255, 255, 124),
+    'unexplored': (0, 0, 0),
+    'unexplored-debug': (60, 45, 20),
+    'background': (0, 0, 0),
+}
+
+PLAYER_GLYPH = '@'
+
+
+class RenderData(object):
+    """Glyphs and colors of every tile index, ready to draw.
+
+    Built once from the tile table so that drawing a cell only indexes
+    into these tables; nothing is resolved or converted per frame.  Both
+    numpy arrays, for code drawing whole frames, and plain python lists,
+    for code drawing one cell at a time, are kept.
+
+    Mob and item icons are resolved the first time they're drawn and
+    kept by template (see :class:`~..entities.Entity`).
+
+    Args:
+        tiles (dict): tile definitions by name
+    """
+
+    def __init__(self, tiles):
+        table = get_tile_table(tiles)
+        self.tiles = tiles
+        self.index = table.index
+        self.glyphs = np.array([ord(glyph) for glyph in table.glyphs], dtype=np.int32)
+        self.lit = table.records['lit'].copy()
+        self.unlit = table.records['unlit'].copy()
+        self.characters = list(table.glyphs)
+        self.codes = self.glyphs.tolist()
+        self.lit_colors = list(table.lit)
+        self.unlit_colors = list(table.unlit)
+        self._icons = {}  # id(icon source): (icon source, (character, lit, unlit))
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {len(self.characters)} tiles, {len(self._icons)} icons>'
+        return string
+
+    def tile(self, name):
+        """Provides the (character, lit color, unlit color) of a tile."""
+        index = self.index[name]
+        return self.characters[index], self.lit_colors[index], self.unlit_colors[index]
+
+    def icon(self, entity):
+        """Provides the (character, lit color, unlit color) of a mob or item."""
+        source = entity
+        overrides = getattr(entity, 'overrides', None)
+        if overrides is not None and 'display' not in overrides:
+            source = entity.template  # shared by every instance of the template
+        cached = self._icons.get(id(source))
+        if cached is not None and cached[0] is source:
+            return cached[1]
+        icon = entity['display']['icon']
+        colors = icon.get('color') or DEFAULT_COLORS
+        resolved = (
+            icon.get('character') or ' ',
+            tuple(colors.get('lit') or DEFAULT_COLORS['lit']),
+            tuple(colors.get('unlit') or DEFAULT_COLORS['unlit']),
+        )
+        self._icons[id(source)] = (source, resolved)
+        return resolved
+
+
+def get_render_data(game_state):
+    """Provides the render data of the game's tiles, building it on first use.
+
+    Returns:
+        RenderData: kept in ``game_state['render-data']``
+    """
+    render_data = game_state.get('render-data')
+    if render_data is None or render_data.tiles is not game_state['tiles']:
+        render_data = RenderData(game_state['tiles'])
+        game_state['render-data'] = render_data
+    return render_data
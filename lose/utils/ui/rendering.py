@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
-import copy
 from random import choice, randint
 
+import numpy as np
 import tcod
 
+from ..entities import spawn
+from ..goals import update_entities
+from ..terrain import get_level_fov, compute_fov
+from .render_data import PALETTE, PLAYER_GLYPH, get_render_data
+
 
 def build_level(game_state):
     build_map(game_state)
@@ -12,67 +17,71 @@ def build_level(game_state):
 
 
 def build_map(game_state):
-    level_map = game_state.get('current-level')
-    X, Y = game_state['map-width'], game_state['map-height']
-    fov_map = game_state.get('fov-map') or tcod.map_new(X, Y)
-    game_state['fov-map'] = fov_map
     con = game_state['windows']['console']
-    tiles = game_state['tiles']
-
-    default_tile_name = tiles['default']['ref']
-    default_tile = tiles[default_tile_name]
-    for y in range(Y):
-        for x in range(X):
-            position = (y, x)
-            tile = level_map.get(position) or {'name': 'default'}
-            tile_name = tile['name']
-            while tiles[tile_name].get('ref', None):
-                referenced_tile_name = tiles[tile_name]['ref']
-                referenced_tile = tiles[referenced_tile_name]
-                tile.update(referenced_tile)
-                tile_name = tile['name']
-            tile = tiles[tile['name']]
-            if tile is None:
-                tile = {}
-                # Don't update the master version of the tile.
-                base_tile = copy.deepcopy(default_tile)
-            else:
-                base_tile_name = tile.get('name')
-                base_tile = tiles[base_tile_name]
-            # Don't update the master version of the tile.
-            blocking = tile.get('blocking') or base_tile.get('blocking')
-            if not blocking:
-                blocked = False
-                block_sight = False
-            else:
-                # Tiles that block movement, implicitly also block sight
-                # TODO: Make these independent
-                blocking_movement = blocking.get('movement', {}).get('rate') or 0
-                blocking_sight = blocking.get('sight', {}).get('opaque') or 0
-                blocked = True if blocking_movement // 100 else False
-                block_sight = True if blocking_sight // 100 else blocked
-            tcod.map_set_properties(fov_map, x, y, not block_sight, not blocked)
+    # Recompile the transparency for the level being built
+    game_state['level-fov'] = None
+    fov = get_level_fov(game_state)
 
     tcod.console_clear(con)  # unexplored areas start black (which is the default background color)
-    return game_state['fov-map']
+    mark_cells_dirty(game_state)
+    return fov
+
+
+def mark_cells_dirty(game_state, *positions):
+    """Flags map cells to be redrawn on the next frame.
+
+    Anything that changes how a cell looks without changing the field of
+    view (a door opening, a mob moving, an item picked up, ...) has to
+    flag the cell, or it keeps showing what was there before.
+
+    Args:
+        game_state(dict): the game state
+        positions(tuple): (y, x) level positions; none redraws the whole map
+    """
+    if positions:
+        game_state.setdefault('dirty-cells', set()).update(positions)
+    else:
+        game_state['redraw-map'] = True
+
+
+def get_camera(game_state):
+    """Finds the world position drawn in the top left corner of the map.
+
+    Levels that fit on the map are drawn as they are; larger ones (see
+    :class:`~..world.ChunkedWorld`) scroll to keep the character centred,
+    stopping at the edges of the world.
+
+    Returns:
+        tuple: (int: top, int: left) world position of the map's first cell
+    """
+    map_height = game_state.get('map-height')
+    map_width = game_state.get('map-width')
+    shape = getattr(game_state.get('current-level'), 'shape', None)
+    if shape is None or (shape[0] <= map_height and shape[1] <= map_width):
+        return (0, 0)
+    y, x = game_state.get('character-position')
+    top = min(max(y - map_height // 2, 0), max(shape[0] - map_height, 0))
+    left = min(max(x - map_width // 2, 0), max(shape[1] - map_width, 0))
+    return (top, left)
 
 
 def clear_player(game_state):
     y, x = game_state.get('character-position')
+    top, left = get_camera(game_state)
+    y, x = y - top, x - left
     con = game_state['windows']['console']
-    color = tcod.Color(255, 255, 124)
-    # set the color and then draw the character that represents this object at its position
-    tcod.console_set_default_foreground(con, color)
-    tcod.console_put_char(con, x, y, ' ', tcod.BKGND_NONE)
+    draw_cells(con, [y], [x], [ord(' ')], [PALETTE['player']])
+    mark_cells_dirty(game_state, game_state.get('character-position'))
 
 
 def find_open_tiles(game_state):
     Y = game_state['map-height']
     X = game_state['map-width']
     character_position = game_state['character-position']
+    top, left = get_camera(game_state)
     open_tiles = ['floor', 'water', 'open-door']
-    for y in range(Y):
-        for x in range(X):
+    for y in range(top, top + Y):
+        for x in range(left, left + X):
             current_tile = game_state['current-level'].get((y, x))
             if not current_tile:
                 continue
@@ -89,9 +98,10 @@ def generate_mobs(game_state, number_to_create=None):
     number_to_create = number_to_create or 6
     open_tiles = list(find_open_tiles(game_state))
     number_of_mobs = randint(1, number_to_create)
+    positions = []
     while number_of_mobs > 0:
         mob = choice([_ for _ in game_state['mobs'] if not _.startswith('_')])
-        mob = copy.deepcopy(game_state['mobs'][mob])
+        mob = spawn(game_state['mobs'][mob])
         if 'health' not in mob:
             mob['health'] = 10
         if 'attack' not in mob:
@@ -103,26 +113,68 @@ def generate_mobs(game_state, number_to_create=None):
         if not tile:
             continue
         tile.setdefault('mobs', []).append(mob)
+        positions.append(tile_position)
         tile_index = open_tiles.index(tile_position)
         open_tiles.pop(tile_index)
         number_of_mobs -= 1
+    update_entities(game_state, 'mobs', *positions)
 
 
 def generate_items(game_state, number_to_create=None):
     number_to_create = number_to_create or 6
     open_tiles = list(find_open_tiles(game_state))
     number_of_items = randint(1, number_to_create)
+    positions = []
     while number_of_items > 0:
         item_name = choice([_ for _ in game_state['items'] if not _.startswith('_')])
-        item = copy.deepcopy(game_state['items'][item_name])
+        item = spawn(game_state['items'][item_name])
         tile_position = choice(open_tiles)
         tile = game_state['current-level'].get(tile_position)
         if not tile:
             continue
         tile.setdefault('items', []).append(item)
+        positions.append(tile_position)
         tile_index = open_tiles.index(tile_position)
         open_tiles.pop(tile_index)
         number_of_items -= 1
+    update_entities(game_state, 'items', *positions)
+
+
+def console_array(con, array):
+    """Indexes a console buffer by [y, x] whatever order the console was created in."""
+    if array.shape[:2] != (con.height, con.width) or array.strides[0] < array.strides[1]:
+        return array.swapaxes(0, 1)  # a console created in Fortran order hands out [x, y] arrays
+    return array
+
+
+def draw_cells(con, ys, xs, glyphs, colors):
+    """Writes glyphs in their foreground colors to console cells.
+
+    Consoles backed by numpy buffers take every cell in one assignment
+    to their ``ch`` and ``fg`` arrays; anything else (e.g. the root
+    console's handle) falls back to two libtcod calls per cell.
+    Backgrounds are left alone.
+
+    Args:
+        con(Console): the console to draw on
+        ys(list): row of each cell
+        xs(list): column of each cell
+        glyphs(list): codepoint of each cell
+        colors(list): (r, g, b) foreground color of each cell
+    """
+    if not ys:
+        return
+    if isinstance(con, tcod.console.Console):
+        console_array(con, con.ch)[ys, xs] = glyphs
+        console_array(con, con.fg)[ys, xs] = colors
+        return
+    # Looked up once; every tcod attribute access goes through a deprecation check
+    set_foreground, put_char, no_background = (
+        tcod.console_set_default_foreground, tcod.console_put_char, tcod.BKGND_NONE
+    )
+    for y, x, glyph, color in zip(ys, xs, glyphs, colors):
+        set_foreground(con, color)
+        put_char(con, x, y, glyph, no_background)
 
 
 def render_bar(game_state, x, y, total_width, name, value, maximum, bar_color, back_color):
@@ -147,98 +199,195 @@ def render_bar(game_state, x, y, total_width, name, value, maximum, bar_color, b
 
 
 def render_all(game_state):
-    screen_height = game_state.get('screen-height')
-    screen_width = game_state.get('screen-width')
-    panel_height = game_state.get('panel-height')
-    map_height = game_state.get('map-height')
-    map_width = game_state.get('map-width')
-    con = game_state['windows']['console']
-
-    render_level_map(game_state)
-    render_player(game_state)
-
-    # Render panels
-    panel = game_state.get('windows', {}).get('panel')
+    """Draws a frame.
+
+    Only what changed is drawn: the map cells that changed (see
+    :func:`render_level_map`), the panel when a value it shows changed
+    (see :func:`render_panel`), and the layers holding them (see
+    :func:`composite`).
+
+    Returns:
+        bool: whether anything reached the root console; False when the last frame still stands
+    """
+    map_drawn = render_level_map(game_state)
+    if map_drawn or game_state.get('drawn-character-position') != game_state.get('character-position'):
+        render_player(game_state)
+        mark_layers_dirty(game_state, 'console')
+    render_panel(game_state)
+    return bool(composite(game_state))
+
+
+def render_panel(game_state):
+    """Redraws the panel when a value it shows changed.
+
+    Returns:
+        bool: whether the panel was redrawn
+    """
+    max_health = game_state.get('player-max-health') or 10
+    health = game_state.get('player-health')
+    health = max_health if health is None else health
+    hud = (health, max_health)
+    if game_state.get('drawn-hud') == hud:
+        return False
 
     # prepare to render the GUI panel
+    panel = game_state['windows']['panel']
     tcod.console_set_default_background(panel, tcod.black)
     tcod.console_clear(panel)
 
     # show the player's stats
-    render_bar(game_state, 1, 1, 43, 'HP', 100, 100, tcod.light_red, tcod.darker_red)
+    render_bar(game_state, 1, 1, 43, 'HP', health, max_health, tcod.light_red, tcod.darker_red)
+    game_state['drawn-hud'] = hud
+    mark_layers_dirty(game_state, 'panel')
+    return True
 
-    # blit the contents of "panel" to the root console
-    tcod.console_blit(panel, 0, 0, screen_width, panel_height, 0, 0, screen_height - panel_height)
-    tcod.console_blit(con, 0, 0, map_width, map_height, 0, 0, 0)
 
-    clear_player(game_state)
+def get_layers(game_state):
+    """Finds where each window goes on the root console.
+
+    Returns:
+        list: (str: window name, tuple: (int: x, int: y) position) from the bottom layer up
+    """
+    screen_height = game_state.get('screen-height')
+    panel_height = game_state.get('panel-height')
+    return [
+        ('panel', (0, screen_height - panel_height)),
+        ('console', (0, 0)),  # the map
+        ('messages', (0, game_state.get('map-height'))),
+    ]
+
+
+def mark_layers_dirty(game_state, *names):
+    """Flags layers to be blitted to the root console on the next frame.
+
+    Args:
+        game_state(dict): the game state
+        names(str): window names (see :func:`get_layers`); none means every layer,
+            e.g. after a menu was drawn over them
+    """
+    names = names or tuple(name for name, _ in get_layers(game_state))
+    game_state.setdefault('dirty-layers', set()).update(names)
+
+
+def composite(game_state):
+    """Blits the dirty layers to the root console.
+
+    The root console keeps the last frame, so only dirty layers are
+    blitted, along with any layer stacked on top of a blitted one that
+    it overlaps.  Each layer is blitted at most once.
+
+    Returns:
+        list: names of the layers blitted, from the bottom up
+    """
+    windows = game_state['windows']
+    dirty = game_state.setdefault('dirty-layers', set())
+    blitted, covered = [], []
+    for name, (x, y) in get_layers(game_state):
+        con = windows.get(name)
+        if con is None:
+            continue
+        width, height = con.width, con.height
+        overlaps = any(
+            x < right and left < x + width and y < bottom and top < y + height
+            for left, top, right, bottom in covered
+        )
+        if name in dirty or overlaps:
+            tcod.console_blit(con, 0, 0, width, height, 0, x, y)
+            blitted.append(name)
+            covered.append((x, y, x + width, y + height))
+    dirty.clear()
+    return blitted
 
 
 def render_level_map(game_state):
-    if 'fov-map' not in game_state:
+    """Draws the map cells that changed since the last frame.
+
+    Cells are redrawn when the field of view changes over them or when
+    they were flagged by :func:`mark_cells_dirty`, and all of them when
+    the level, the camera or the debug mode changes.
+
+    Returns:
+        bool: whether anything was drawn
+    """
+    if 'level-fov' not in game_state:
         build_level(game_state)
-    fov_map = game_state.get('fov-map')
-    torch_radius = game_state.get('torch-radius')
-    fov_light_walls = game_state.get('fov-light-walls')
-    fov_algorithm = game_state.get('fov-algorithm')
     map_height = game_state.get('map-height')
     map_width = game_state.get('map-width')
-    x, y = game_state.get('character-position')
     con = game_state['windows']['console']
-    tiles = game_state.get('tiles')
-
-    tcod.map_compute_fov(fov_map, y, x, torch_radius, fov_light_walls, fov_algorithm)
-    for y in range(map_height):
-        for x in range(map_width):
-            lit = tcod.map_is_in_fov(fov_map, x, y)
-            position = (y, x)
-            tile = game_state.get('current-level', {}).get(position)
-            if tile is None:
-                continue
-            explored = tile.get('explored')
-            mobs = tile.get('mobs')
-            items = tile.get('items')
-            if mobs:
-                mob = choice(mobs)
-                tile_colors = mob['display']['icon']['color']
-                character = mob['display']['icon']['character']
-            elif items:
-                item = choice(items)
-                tile_colors = item['display']['icon']['color']
-                character = item['display']['icon']['character']
-            else:
-                tile_colors = tile.get('color') or game_state['tiles'][tile['name']]['display']['icon']['color']
-                base_tile = tiles[tile['name']]
-                character = tile.get('character') or base_tile['display']['icon']['character']
-            if lit:
-                # look up the base tile data if it's not available in tile
-                tile_color = tile_colors.get('lit') or game_state['tiles'][tile['name']][
-                    'display']['icon']['color']['lit']
-                tile['explored'] = True
-                # tcod.console_set_char_background(con, x, y, tile_color, tcod.BKGND_SET)
-                tcod.console_set_default_foreground(con, tile_color)
-                tcod.console_put_char(con, x, y, character, tcod.BKGND_NONE)
-            elif explored:
-                tile_color = tile_colors.get('unlit') or game_state['tiles'][tile['name']][
-                    'display']['icon']['color']['unlit']
-                # tcod.console_set_char_background(con, x, y, tile_color, tcod.BKGND_SET)
-                tcod.console_set_default_foreground(con, tile_color)
-                tcod.console_put_char(con, x, y, character, tcod.BKGND_NONE)
-            elif not explored:
-                tile_color = tcod.Color(0, 0, 0) if not game_state['debug'] else tcod.Color(60, 45, 20)
-                # tile_color = tcod.Color(125, 125, 125)
-                # tcod.console_set_char_background(con, x, y, tile_color, tcod.BKGND_SET)
-                tcod.console_set_default_foreground(con, tile_color)
-                tcod.console_put_char(con, x, y, character, tcod.BKGND_NONE)
-
-    tcod.console_blit(con, 0, 0, map_width, map_height, 0, 0, 0)
+    render_data = get_render_data(game_state)
+    index = render_data.index
+    codes, lit_colors, unlit_colors = render_data.codes, render_data.lit_colors, render_data.unlit_colors
+    unexplored = PALETTE['unexplored-debug' if game_state['debug'] else 'unexplored']
+    level_map = game_state.get('current-level', {})
+
+    top, left = get_camera(game_state)
+    if game_state.get('camera') != (top, left):
+        # The map scrolled; cells without a tile would keep what was drawn there
+        tcod.console_clear(con)
+        game_state['camera'] = (top, left)
+        game_state['redraw-map'] = True
+    compute_fov(game_state)
+    visible = get_level_fov(game_state).view(top, left, map_height, map_width)
+
+    dirty = game_state.setdefault('dirty-cells', set())
+    # The cell the character was drawn over last frame
+    drawn_position = game_state.get('drawn-character-position')
+    if drawn_position is not None and drawn_position != game_state.get('character-position'):
+        dirty.add(drawn_position)
+    view = (id(level_map), game_state['debug'])
+    previous = game_state.get('drawn-visible')
+    if game_state.pop('redraw-map', False) or game_state.get('drawn-view') != view or previous is None:
+        cells = [(y, x) for y in range(map_height) for x in range(map_width)]
+    else:
+        ys, xs = np.nonzero(visible != previous)
+        cells = set(zip(ys.tolist(), xs.tolist()))
+        for y, x in dirty:
+            if 0 <= y - top < map_height and 0 <= x - left < map_width:
+                cells.add((y - top, x - left))
+    dirty.clear()
+    game_state['drawn-visible'] = visible
+    game_state['drawn-view'] = view
+    if not cells:
+        return False
+
+    visible = visible.tolist()
+    # The frame is composed here and written to the console in one go
+    ys, xs, glyphs, colors = [], [], [], []
+    for y, x in cells:
+        tile = level_map.get((y + top, x + left))
+        if tile is None:
+            continue
+        mobs = tile.get('mobs')
+        items = tile.get('items')
+        if mobs:
+            character, lit_color, unlit_color = render_data.icon(choice(mobs))
+            code = ord(character)
+        elif items:
+            character, lit_color, unlit_color = render_data.icon(choice(items))
+            code = ord(character)
+        else:
+            tile_index = index[tile['name']]
+            code = codes[tile_index]
+            lit_color, unlit_color = lit_colors[tile_index], unlit_colors[tile_index]
+        if visible[y][x]:
+            tile_color = lit_color
+            tile['explored'] = True
+        elif tile.get('explored'):
+            tile_color = unlit_color
+        else:
+            tile_color = unexplored
+        ys.append(y)
+        xs.append(x)
+        glyphs.append(code)
+        colors.append(tile_color)
+    draw_cells(con, ys, xs, glyphs, colors)
+    return True
 
 
 def render_player(game_state):
     y, x = game_state.get('character-position')
+    top, left = get_camera(game_state)
+    y, x = y - top, x - left
     con = game_state['windows']['console']
-    color = tcod.Color(255, 255, 124)
-    character = '@'
-    # set the color and then draw the character that represents this object at its position
-    tcod.console_set_default_foreground(con, color)
-    tcod.console_put_char(con, x, y, character, tcod.BKGND_NONE)
+    draw_cells(con, [y], [x], [ord(PLAYER_GLYPH)], [PALETTE['player']])
+    game_state['drawn-character-position'] = game_state.get('character-position')
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""Chunked worlds
+
+A :class:`ChunkedWorld` stands in for a level map that is far larger
+than the screen.  The world is cut into square chunks addressed by
+``(cy, cx)`` chunk coordinates.  Each chunk is a small
+:class:`~.level_maps.LevelMap` that is loaded from a compiled level or
+generated the first time it's needed.  Only a bounded number of chunks
+are kept; the ones least recently used are dropped first, but never the
+ones around the player (see :meth:`ChunkedWorld.focus`).
+
+Tiles that were changed (explored, opened, carrying mobs or items, ...)
+are kept when their chunk is dropped and put back when it's loaded
+again, so only untouched cells are ever thrown away.  Dropped chunks are
+kept compactly: one bit per cell for the explored flag, plus the few
+tiles that changed in other ways (see :class:`ChunkState`).
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from .level_maps import LevelMap, load_level_symbols, resolve_symbols
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 32
+# Chunks kept loaded before the least recently used ones are dropped
+MAX_CHUNKS = 64
+# Chunks on each side of the player's chunk that stay loaded
+FOCUS_RADIUS = 2
+
+
+class ChunkedWorld(MutableMapping):
+    """World tiles by ``(y, x)`` position, split into chunks loaded on demand.
+
+    Behaves like the level map it stands in for.  Positions are absolute
+    world positions; looking one up loads its chunk.  Terrain, field of
+    view and goal maps only cover the chunks around the player, which
+    :meth:`focus` picks (see :meth:`window_indices`).
+
+    Args:
+        source (callable): called with chunk coordinates and the chunk's
+            (top, left, bottom, right) cell bounds; returns the chunk's 2D
+            tile indices
+        shape (tuple): (int: height, int: width) of the world in cells
+        names (dict): tile name by tile index
+        chunk_size (int): cells along each side of a chunk [default: 32]
+        max_chunks (int): chunks kept loaded [default: 64]
+        radius (int): chunks around the player's chunk kept loaded [default: 2]
+    """
+
+    def __init__(self, source, shape, names, chunk_size=None, max_chunks=None, radius=None):
+        self.source = source
+        self.shape = tuple(int(size) for size in shape)
+        self.names = names
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.max_chunks = max_chunks or MAX_CHUNKS
+        self.radius = FOCUS_RADIUS if radius is None else radius
+        self.chunks = OrderedDict()  # (cy, cx): LevelMap, least recently used first
+        self.window = None  # (top, left, bottom, right) cell bounds of the focused chunks
+        self.loads = 0
+        self.evictions = 0
+        self._focus = None  # chunk coordinates the window is centred on
+        self._saved = {}  # (cy, cx): ChunkState of dropped chunks that were changed
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {self.shape} {len(self.chunks)} chunks loaded>'
+        return string
+
+    @property
+    def chunk_shape(self):
+        """(int: rows, int: columns) of chunks."""
+        return tuple(-(-size // self.chunk_size) for size in self.shape)
+
+    def chunk_of(self, position):
+        """Finds the chunk coordinates of a world position."""
+        y, x = position
+        return (y // self.chunk_size, x // self.chunk_size)
+
+    def chunk_bounds(self, coords):
+        """Finds the (top, left, bottom, right) cell bounds of a chunk."""
+        cy, cx = coords
+        height, width = self.shape
+        top, left = cy * self.chunk_size, cx * self.chunk_size
+        return top, left, min(top + self.chunk_size, height), min(left + self.chunk_size, width)
+
+    def is_loaded(self, coords):
+        return coords in self.chunks
+
+    def chunk(self, coords):
+        """Provides a chunk, loading it when it isn't loaded.
+
+        Args:
+            coords (tuple): (int: cy, int: cx) chunk coordinates
+
+        Returns:
+            LevelMap: the chunk's tiles, by position within the chunk
+        """
+        chunk = self.chunks.get(coords)
+        if chunk is not None:
+            self.chunks.move_to_end(coords)
+            return chunk
+        chunk = LevelMap(self.source(coords, self.chunk_bounds(coords)), self.names)
+        state = self._saved.pop(coords, None)
+        if state is not None:
+            state.restore(chunk)
+        self.chunks[coords] = chunk
+        self.loads += 1
+        self._evict(keep=coords)
+        return chunk
+
+    def _evict(self, keep=None):
+        # Chunks around the player and the one just handed out always stay
+        kept = set(self.focused_chunks()) | {keep}
+        for coords in list(self.chunks):
+            if len(self.chunks) <= self.max_chunks:
+                break
+            if coords not in kept:
+                self._drop(coords)
+
+    def _drop(self, coords):
+        chunk = self.chunks.pop(coords)
+        state = ChunkState.save(chunk)
+        if state:
+            self._saved[coords] = state
+        self.evictions += 1
+        logger.trace({'Chunk dropped': coords, 'Changed tiles': len(state)})
+
+    def focused_chunks(self):
+        """Chunk coordinates within the focus radius of the player's chunk."""
+        if self._focus is None:
+            return []
+        rows, columns = self.chunk_shape
+        fy, fx = self._focus
+        return [
+            (cy, cx)
+            for cy in range(max(fy - self.radius, 0), min(fy + self.radius + 1, rows))
+            for cx in range(max(fx - self.radius, 0), min(fx + self.radius + 1, columns))
+        ]
+
+    def focus(self, position):
+        """Centres the loaded window on a position.
+
+        The window only moves when the position enters another chunk,
+        so compiled terrain covering it stays valid while the player
+        walks around inside one chunk.
+
+        Args:
+            position (tuple): (int: y, int: x) world position, usually the player's
+
+        Returns:
+            tuple: (top, left, bottom, right) cell bounds of the window
+        """
+        height, width = self.shape
+        y, x = position
+        coords = self.chunk_of((min(max(y, 0), height - 1), min(max(x, 0), width - 1)))
+        if coords != self._focus or self.window is None:
+            self._focus = coords
+            focused = self.focused_chunks()
+            for chunk_coords in focused:
+                self.chunk(chunk_coords)
+            self._evict()
+            top, left = self.chunk_bounds(focused[0])[:2]
+            bottom, right = self.chunk_bounds(focused[-1])[2:]
+            self.window = (top, left, bottom, right)
+        return self.window
+
+    def window_indices(self):
+        """Lays the focused chunks out as one grid of tile indices.
+
+        Returns:
+            tuple: (tuple: origin of the grid, array: 2D tile index per cell; -1 where
+            there's no tile, list: (position, tile) of tiles carrying their own ``blocking``)
+        """
+        if self.window is None:
+            self.focus((0, 0))
+        top, left, bottom, right = self.window
+        indices = np.full((bottom - top, right - left), -1, dtype=np.intp)
+        overrides = []
+        for coords in self.focused_chunks():
+            chunk = self.chunk(coords)
+            chunk_top, chunk_left, chunk_bottom, chunk_right = self.chunk_bounds(coords)
+            indices[chunk_top - top:chunk_bottom - top, chunk_left - left:chunk_right - left] = chunk.current_indices()
+            for (y, x), tile in chunk.cells.items():
+                if tile.get('blocking'):
+                    overrides.append(((y + chunk_top, x + chunk_left), tile))
+        return (top, left), indices, overrides
+
+    def window_cells(self):
+        """Iterates over the (position, tile) pairs of tiles handed out in the focused chunks.
+
+        Untouched cells are skipped; their tiles would only hold a name.
+        """
+        if self.window is None:
+            self.focus((0, 0))
+        for coords in self.focused_chunks():
+            top, left = self.chunk_bounds(coords)[:2]
+            for (y, x), tile in list(self.chunk(coords).cells.items()):
+                yield (y + top, x + left), tile
+
+    def find(self, name, coords):
+        """Finds the cells of a chunk holding a tile, without handing out tiles.
+
+        Args:
+            name (str): tile name to look for
+            coords (tuple): (int: cy, int: cx) chunk coordinates
+
+        Returns:
+            list: world positions of the matching cells
+        """
+        top, left = self.chunk_bounds(coords)[:2]
+        return [(y + top, x + left) for y, x in self.chunk(coords).find(name)]
+
+    def _locate(self, position):
+        try:
+            y, x = position
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(y, (int, np.integer)) or not isinstance(x, (int, np.integer)):
+            return None
+        height, width = self.shape
+        if not (0 <= y < height and 0 <= x < width):
+            return None
+        coords = self.chunk_of((y, x))
+        return coords, (y % self.chunk_size, x % self.chunk_size)
+
+    def __bool__(self):
+        return all(self.shape)
+
+    def __contains__(self, position):
+        location = self._locate(position)
+        if location is None:
+            return False
+        coords, local = location
+        return local in self.chunk(coords)
+
+    def __getitem__(self, position):
+        location = self._locate(position)
+        if location is None:
+            raise KeyError(position)
+        coords, local = location
+        return self.chunk(coords)[local]
+
+    def __setitem__(self, position, tile):
+        location = self._locate(position)
+        if location is None:
+            raise KeyError(f'{position} is outside the world')
+        coords, local = location
+        self.chunk(coords)[local] = tile
+
+    def __delitem__(self, position):
+        location = self._locate(position)
+        if location is None:
+            raise KeyError(position)
+        coords, local = location
+        del self.chunk(coords)[local]
+
+    def __iter__(self):
+        """Iterates over the positions of loaded chunks and changed tiles of dropped ones.
+
+        Untouched cells of chunks that aren't loaded are skipped so that
+        walking the world never loads it all.
+        """
+        for coords, chunk in list(self.chunks.items()):
+            top, left = self.chunk_bounds(coords)[:2]
+            for y, x in chunk:
+                yield (y + top, x + left)
+        for coords, state in list(self._saved.items()):
+            top, left = self.chunk_bounds(coords)[:2]
+            for y, x in state.positions():
+                yield (y + top, x + left)
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks.values()) + sum(len(state) for state in self._saved.values())
+
+
+class ChunkState(object):
+    """What changed in a chunk, kept while the chunk isn't loaded.
+
+    Most changed tiles were only explored, so that flag is packed into
+    one bit per cell.  Only tiles that changed in other ways (renamed,
+    carrying mobs or items, ...) are kept whole, and deleted cells by
+    their position within the chunk.
+
+    Args:
+        shape (tuple): (int: height, int: width) of the chunk
+        explored (array): packed bits, one per cell, of the cells explored; None if none were
+        tiles (dict): {(y, x): tile} of the tiles changed in other ways
+        deleted (set): positions within the chunk of deleted cells
+    """
+
+    def __init__(self, shape, explored=None, tiles=None, deleted=None):
+        self.shape = shape
+        self.explored = explored
+        self.tiles = tiles or {}
+        self.deleted = deleted or set()
+
+    def __repr__(self):
+        cname = self.__class__.__name__
+        string = f'<{cname} {self.shape} {len(self)} changed tiles>'
+        return string
+
+    def __len__(self):
+        return len(self.positions())
+
+    def __bool__(self):
+        return self.explored is not None or bool(self.tiles) or bool(self.deleted)
+
+    @classmethod
+    def save(cls, chunk):
+        """Sorts the changed tiles of a chunk.
+
+        Args:
+            chunk (LevelMap): the chunk being dropped
+
+        Returns:
+            ChunkState: the chunk's changes
+        """
+        explored = np.zeros(chunk.shape, dtype=bool)
+        tiles = {}
+        for (y, x), tile in chunk.cells.items():
+            # Cells no different from the chunk source can be rebuilt from it
+            name = chunk.names[int(chunk.indices[y, x])]
+            if tile == {'name': name}:
+                continue
+            if tile == {'name': name, 'explored': True}:
+                explored[y, x] = True
+            else:
+                tiles[(y, x)] = tile
+        packed = np.packbits(explored) if explored.any() else None
+        return cls(chunk.shape, packed, tiles, set(chunk._deleted))
+
+    def explored_cells(self):
+        """Positions within the chunk of the cells that were only explored."""
+        if self.explored is None:
+            return []
+        height, width = self.shape
+        explored = np.unpackbits(self.explored, count=height * width).reshape(height, width)
+        ys, xs = np.nonzero(explored)
+        return list(zip(ys.tolist(), xs.tolist()))
+
+    def positions(self):
+        """Positions within the chunk of every changed tile."""
+        return self.explored_cells() + list(self.tiles)
+
+    def restore(self, chunk):
+        """Puts the changes back into a freshly loaded chunk."""
+        for y, x in self.explored_cells():
+            chunk[(y, x)]['explored'] = True
+        for position, tile in self.tiles.items():
+            chunk[position] = tile
+        for position in self.deleted:
+            del chunk[position]
+
+
+def level_file_source(tiles, map_path, seed=None):
+    """Serves chunks out of a compiled level.
+
+    The compiled level is memory mapped (see :mod:`.level_maps`), so a
+    chunk only reads its own part of the file.  Tiles picked at random
+    are seeded per chunk, which makes a chunk come back the same when
+    it's loaded again.
+
+    Args:
+        tiles (dict): tile data, including its ``_indices`` and ``_symbols``
+        map_path (str): path to the .map file
+        seed (int): seed for picking between tiles
+
+    Returns:
+        tuple: (callable: chunk source, tuple: shape of the world)
+    """
+    symbols, grid = load_level_symbols(map_path)
+    seed = 0 if seed is None else seed
+
+    def source(coords, bounds):
+        top, left, bottom, right = bounds
+        return resolve_symbols(
+            tiles, symbols, grid[top:bottom, left:right], seed=(seed, *coords), origin=(top, left),
+        )
+
+    return source, grid.shape
+
+
+def cave_source(tiles, seed=None, density=0.35, floor='floor', wall='wall'):
+    """Generates chunks of open cave.
+
+    Each cell is a wall with a ``density`` chance and a floor otherwise.
+    Chunks are seeded by their coordinates, so the same world comes back
+    however it's walked.
+
+    Args:
+        tiles (dict): tile data, including its ``_indices``
+        seed (int): world seed
+        density (float): share of walls
+        floor (str): name of the open tile
+        wall (str): name of the blocking tile
+
+    Returns:
+        callable: chunk source
+    """
+    lookup = {name: index for index, name in tiles['_indices'].items()}
+    dtype = np.uint8 if max(lookup.values(), default=0) < np.iinfo(np.uint8).max else np.uint16
+    floor_index, wall_index = lookup[floor], lookup[wall]
+    seed = 0 if seed is None else seed
+
+    def source(coords, bounds):
+        top, left, bottom, right = bounds
+        rng = np.random.default_rng([seed, *coords])
+        walls = rng.random((bottom - top, right - left)) < density
+        return np.where(walls, wall_index, floor_index).astype(dtype)
+
+    return source
@@ -30,6 +30,7 @@ def setup_project():
         'colorama',
         'docopt',
         'libtcod-cffi',
+        'numpy',
         'pygments',
         'pyyaml',
     ]
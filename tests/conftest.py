@@ -1,2 +1,12 @@
 # -*- coding: utf-8 -*-
+import pytest
+
 from fixtures import *  # noqa
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keeps content bundles and compiled levels out of the user's cache."""
+    path = tmp_path / 'lose-cache'
+    monkeypatch.setenv('LOSE_CACHE_DIR', str(path))
+    return path
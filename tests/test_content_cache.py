@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setenv('LOSE_CACHE_DIR', str(cache_dir))
+    monkeypatch.delenv('LOSE_NO_CACHE', raising=False)
+    return cache_dir
+
+
+@pytest.fixture
+def sources(tmp_path):
+    paths = []
+    for name in ['a.yaml', 'b.yaml']:
+        path = tmp_path / name
+        path.write_text(f'- name: {name}\n')
+        paths.append(str(path))
+    return paths
+
+
+def counting_compiler(calls):
+    def compile_content():
+        calls.append(1)
+        return {'compiled': len(calls)}
+    return compile_content
+
+
+@pytest.mark.unit
+def test_load_cached_hits_after_first_load(cache_dir, sources):
+    from lose.utils.content_cache import load_cached, cache_stats
+
+    calls = []
+    hits, misses = cache_stats['hit'], cache_stats['miss']
+    assert load_cached('things', sources, counting_compiler(calls)) == {'compiled': 1}
+    assert load_cached('things', sources, counting_compiler(calls)) == {'compiled': 1}
+    assert len(calls) == 1
+    assert cache_stats['hit'] - hits == 1
+    assert cache_stats['miss'] - misses == 1
+    assert os.path.exists(cache_dir / 'things.cache')
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("change", ['touch', 'grow', 'add', 'remove'])
+def test_load_cached_invalidates_on_source_change(cache_dir, sources, tmp_path, change):
+    from lose.utils.content_cache import load_cached
+
+    calls = []
+    load_cached('things', sources, counting_compiler(calls))
+    if change == 'touch':
+        stat = os.stat(sources[0])
+        os.utime(sources[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    elif change == 'grow':
+        with open(sources[0], 'a') as stream:
+            stream.write('- name: c\n')
+    elif change == 'add':
+        extra = tmp_path / 'c.yaml'
+        extra.write_text('- name: c\n')
+        sources = sources + [str(extra)]
+    else:
+        sources = sources[:1]
+    assert load_cached('things', sources, counting_compiler(calls)) == {'compiled': 2}
+
+
+@pytest.mark.unit
+def test_load_cached_recovers_from_corrupt_bundle(cache_dir, sources):
+    from lose.utils.content_cache import load_cached
+
+    calls = []
+    load_cached('things', sources, counting_compiler(calls))
+    (cache_dir / 'things.cache').write_bytes(b'not a pickle')
+    assert load_cached('things', sources, counting_compiler(calls)) == {'compiled': 2}
+    assert load_cached('things', sources, counting_compiler(calls)) == {'compiled': 2}
+
+
+@pytest.mark.unit
+def test_load_cached_can_be_turned_off(cache_dir, sources, monkeypatch):
+    from lose.utils.content_cache import load_cached, clear_cache
+
+    monkeypatch.setenv('LOSE_NO_CACHE', '1')
+    calls = []
+    load_cached('things', sources, counting_compiler(calls))
+    load_cached('things', sources, counting_compiler(calls))
+    assert len(calls) == 2
+    assert not cache_dir.exists()
+    clear_cache()
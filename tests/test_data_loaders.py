@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+@pytest.fixture
+def no_cache(monkeypatch):
+    monkeypatch.setenv('LOSE_NO_CACHE', '1')
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("name", ['tiles', 'items', 'mobs'])
+def test_load_yaml_data(no_cache, name):
+    from lose.utils.data_loaders import load_yaml_data
+
+    data = load_yaml_data(name)
+    assert data['_indices']
+    for index, data_name in data['_indices'].items():
+        assert data[data_name]['index'] == index
+
+
+@pytest.mark.unit
+def test_load_yaml_data_refuses_python_tags(tmp_path):
+    import yaml
+    from lose.utils.data_loaders import load_yaml_data
+
+    path = tmp_path / 'unsafe.yaml'
+    path.write_text('- name: unsafe\n  run: !!python/object/apply:os.getcwd []\n')
+    with pytest.raises(yaml.YAMLError):
+        load_yaml_data('items', path=str(path))
+
+
+@pytest.fixture
+def content_files(tmp_path):
+    filepaths = []
+    for number in range(6):
+        path = tmp_path / f'pack-{number}.yaml'
+        path.write_text(''.join(
+            f'- name: thing-{number}-{item}\n  display: {{icon: {{character: "{item}"}}}}\n'
+            for item in range(3)
+        ))
+        filepaths.append(str(path))
+    return filepaths
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compile_yaml_data_is_ordered(content_files, workers):
+    from lose.utils.data_loaders import compile_yaml_data
+
+    data = compile_yaml_data('things', content_files, workers=workers)
+    expected = [f'thing-{number}-{item}' for number in range(6) for item in range(3)]
+    assert [data['_indices'][index] for index in sorted(data['_indices'])] == expected
+    assert data['_symbols']['0'] == [0, 3, 6, 9, 12, 15]
+
+
+@pytest.mark.unit
+def test_compile_yaml_data_finds_duplicates(content_files, tmp_path):
+    from lose.utils.data_loaders import compile_yaml_data
+
+    duplicate = tmp_path / 'pack-9.yaml'
+    duplicate.write_text('- name: thing-2-1\n')
+    with pytest.raises(ValueError, match='thing-2-1'):
+        compile_yaml_data('things', content_files + [str(duplicate)], workers=1)
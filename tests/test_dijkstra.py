@@ -77,8 +77,10 @@ if __name__ == '__main__':
     import timeit
     from textwrap import dedent as dd
 
+    # See benchmarks/bench_suite.py for the full set of benchmarks
     setup_statement = dd("""
-        from pathing import main_setup, dijkstra
+        from __main__ import main_setup
+        from lose.utils.algorithms.pathing import dijkstra
         map_to_render, character_position = main_setup()
     """)
     statement_to_test = "[_ for _ in dijkstra(map_to_render, character_position)]"
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import math
+from itertools import zip_longest
+
+import pytest
+
+
+def baseline_manhattan(x, y):
+    return sum(abs((xval or 0) - (yval or 0)) for xval, yval in zip_longest(x, y))
+
+
+def baseline_euclidean(x, y):
+    diffs = [abs((xval or 0) - (yval or 0)) for xval, yval in zip_longest(x, y)]
+    return math.sqrt(sum(diff**2 for diff in diffs))
+
+
+def baseline_octagonal(x, y):
+    diffs = [abs((xval or 0) - (yval or 0)) for xval, yval in zip_longest(x, y)]
+    if len(diffs) != 2:
+        raise TypeError('This distance is only valid in 2D')
+    diff_min = min(diffs)
+    diff_max = max(diffs)
+    approximation = diff_max * 1007 + diff_min * 441
+    correction = diff_max * 40 if diff_max < (diff_min << 4) else 0
+    return (approximation - correction + 512) >> 10
+
+
+def baseline_log(x, y):
+    distance = baseline_octagonal(x, y)
+    if distance == 0:
+        distance = 1 / 10**10
+    return 6 * math.log(distance)
+
+
+@pytest.fixture
+def points():
+    """Random point pairs, plus pairs sharing one or both coordinates."""
+    import numpy as np
+
+    rng = np.random.RandomState(7)
+    x = rng.randint(-100, 100, size=(500, 2))
+    y = rng.randint(-100, 100, size=(500, 2))
+    y[:50] = x[:50]
+    y[50:100, 0] = x[50:100, 0]
+    y[100:150, 1] = x[100:150, 1]
+    # Equal differences along both axes
+    y[150:200] = x[150:200] + rng.randint(-20, 20, size=(50, 1))
+    return x, y
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("name, baseline", [
+    ('manhattan', baseline_manhattan),
+    ('euclidean', baseline_euclidean),
+    ('octagonal', baseline_octagonal),
+    ('log', baseline_log),
+])
+def test_distances_match_baseline(points, name, baseline):
+    from lose.utils.algorithms import distances
+
+    scalar = getattr(distances, f'{name}_distance')
+    batch = getattr(distances, f'{name}_distances')
+    x, y = points
+    pairs = list(zip(map(tuple, x.tolist()), map(tuple, y.tolist())))
+    expected = [baseline(a, b) for a, b in pairs]
+    assert [scalar(a, b) for a, b in pairs] == expected
+    assert batch(x, y).tolist() == expected
+
+
+@pytest.mark.unit
+def test_batch_distances_from_origin():
+    import numpy as np
+    from lose.utils.algorithms.distances import octagonal_distance, octagonal_distances
+
+    origin = (3, 4)
+    points = np.indices((10, 12)).reshape(2, -1).T
+    result = octagonal_distances(origin, points)
+    assert result.shape == (120, )
+    assert result.tolist() == [octagonal_distance(origin, tuple(point)) for point in points.tolist()]
+
+
+@pytest.mark.unit
+def test_octagonal_distance_is_2d_only():
+    from lose.utils.algorithms.distances import octagonal_distance, octagonal_distances
+
+    with pytest.raises(TypeError):
+        octagonal_distance((1, 2, 3), (0, 0, 0))
+    with pytest.raises(TypeError):
+        octagonal_distances([[1, 2, 3]], [0, 0, 0])
+
+
+@pytest.mark.unit
+def test_scalar_distances_pad_missing_coordinates():
+    from lose.utils.algorithms.distances import manhattan_distance, euclidean_distance
+
+    assert manhattan_distance((1, None, 3), (2, )) == 4
+    assert euclidean_distance((3, 4, 0), (0, )) == 5.0
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import pytest
+
+
+@pytest.fixture
+def template():
+    return {
+        'name': 'null-pointer',
+        'display': {'text': 'Null Pointer', 'icon': {'character': 'n', 'color': {'lit': [255, 0, 0]}}},
+        'attack': 4,
+    }
+
+
+@pytest.mark.unit
+def test_entity_falls_through_to_template(template):
+    from lose.utils.entities import spawn
+
+    mob = spawn(template, health=10)
+    assert mob['display'] is template['display']
+    assert mob['attack'] == 4
+    assert mob.get('hit-chance') is None
+    assert mob.setdefault('hit-chance', 50) == 50
+    mob['health'] -= 3
+    assert mob['health'] == 7
+    assert mob.overrides == {'health': 7, 'hit-chance': 50}
+    assert 'health' not in template
+    assert list(mob) == ['name', 'display', 'attack', 'health', 'hit-chance']
+    assert dict(mob) == dict(template, **{'health': 7, 'hit-chance': 50})
+
+
+@pytest.mark.unit
+def test_entity_removes_without_touching_template(template):
+    from lose.utils.entities import spawn
+
+    item = spawn(template, equipped=True)
+    del item['attack']
+    del item['equipped']
+    assert 'attack' not in item
+    assert len(item) == 2
+    assert template['attack'] == 4
+    with pytest.raises(KeyError):
+        item['attack']
+    with pytest.raises(KeyError):
+        del item['attack']
+    item['attack'] = 1
+    assert item['attack'] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("copier", [copy.copy, copy.deepcopy])
+def test_entity_copies_share_template(template, copier):
+    from lose.utils.entities import spawn
+
+    mob = spawn(template, health=10, effects=['slowed'])
+    twin = copier(mob)
+    assert twin.template is template
+    assert twin == mob
+    twin['health'] = 1
+    assert mob['health'] == 10
+    assert (twin['effects'] is mob['effects']) == (copier is copy.copy)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+
+def as_transparent(rows):
+    return np.array([[character != '#' for character in row] for row in rows])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("radius", [1, 3, 5, 8])
+def test_shadowcast_open_ground_is_a_disc(radius):
+    from lose.utils.algorithms.fov import shadowcast
+
+    transparent = np.ones((21, 21), dtype=bool)
+    mask = shadowcast(transparent, (10, 10), radius=radius)
+    ys, xs = np.mgrid[:21, :21]
+    expected = (ys - 10) ** 2 + (xs - 10) ** 2 <= radius ** 2
+    assert np.array_equal(mask, expected)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("light_walls", [True, False])
+def test_shadowcast_walls_cast_shadows(light_walls):
+    from lose.utils.algorithms.fov import shadowcast
+
+    transparent = as_transparent([
+        '#########',
+        '#.......#',
+        '#...#...#',
+        '#.......#',
+        '#########',
+    ])
+    mask = shadowcast(transparent, (2, 1), light_walls=light_walls)
+    assert mask[2, 1]
+    assert mask[1, 7] and mask[3, 7]
+    assert mask[2, 4] == light_walls
+    assert not mask[2, 5] and not mask[2, 6]
+    assert mask[0, 0] == light_walls
+    assert not (mask & ~transparent).any() or light_walls
+
+
+@pytest.mark.unit
+def test_shadowcast_is_unlimited_without_radius():
+    from lose.utils.algorithms.fov import shadowcast
+
+    transparent = np.ones((5, 60), dtype=bool)
+    mask = shadowcast(transparent, (2, 0))
+    assert mask[2, 59]
+    assert shadowcast(transparent, (2, 0), radius=10)[2, 10]
+    assert not shadowcast(transparent, (2, 0), radius=10)[2, 11]
+
+
+@pytest.mark.unit
+def test_shadowcast_matches_tcod_on_open_ground():
+    tcod_map = pytest.importorskip('tcod.map')
+    from lose.utils.algorithms.fov import shadowcast
+
+    transparent = np.ones((31, 31), dtype=bool)
+    expected = tcod_map.compute_fov(transparent, (15, 15), radius=8, algorithm=2)  # FOV_SHADOW
+    assert np.array_equal(shadowcast(transparent, (15, 15), radius=8), expected)
+
+
+@pytest.mark.unit
+def test_field_of_view_caches_the_mask():
+    from lose.utils.algorithms.fov import FieldOfView
+
+    fov = FieldOfView(as_transparent(['.....', '..#..', '.....']))
+    mask = fov.compute((0, 2), radius=4)
+    assert fov.compute((0, 2), radius=4) is mask
+    assert fov.computes == 1
+    assert not mask[2, 2]
+
+    fov.set_transparent((1, 2), False)  # no change
+    assert fov.compute((0, 2), radius=4) is mask
+    fov.set_transparent((1, 2), True)
+    assert fov.compute((0, 2), radius=4)[2, 2]
+    fov.compute((0, 1), radius=4)
+    fov.compute((0, 1), radius=2)
+    assert fov.computes == 4
+
+
+@pytest.mark.unit
+def test_field_of_view_rejects_unknown_backend():
+    from lose.utils.algorithms.fov import FieldOfView
+
+    with pytest.raises(ValueError):
+        FieldOfView(np.ones((3, 3)), backend='raycast')
+
+
+@pytest.mark.unit
+def test_level_fov_follows_doors():
+    from lose.utils.terrain import compute_fov, get_level_fov
+    from lose.utils.ui.keys import process_player_move
+
+    tiles = {
+        'default': {'name': 'default', 'ref': 'wall'},
+        'wall': {'name': 'wall', 'blocking': {'movement': {'rate': 100}, 'sight': {'opaque': 100}}},
+        'floor': {'name': 'floor'},
+        'closed-door': {'name': 'closed-door', 'blocking': {'movement': {'rate': 100}}},
+        'open-door': {'name': 'open-door'},
+    }
+    symbols = {'#': 'wall', '.': 'floor', '+': 'closed-door'}
+    rows = [
+        '#######',
+        '#..+..#',
+        '#######',
+    ]
+    level_map = {
+        (y, x): {'name': symbols[character]}
+        for y, row in enumerate(rows)
+        for x, character in enumerate(row)
+    }
+    game_state = {
+        'current-level': level_map, 'tiles': tiles, 'round-updates': {}, 'debug': False,
+        'map-height': 4, 'map-width': 8, 'torch-radius': 8, 'character-position': (1, 1),
+    }
+    visible = compute_fov(game_state)
+    assert visible.shape == (4, 8)
+    assert visible[1, 3] and not visible[1, 4]
+    fov = get_level_fov(game_state)
+
+    process_player_move(game_state, (1, 3))
+    assert game_state['current-level'][(1, 3)]['name'] == 'open-door'
+    assert get_level_fov(game_state) is fov
+    assert compute_fov(game_state)[1, 5]
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+def random_grid(seed, shape=(40, 50), density=0.25):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+
+    rng = np.random.default_rng(seed)
+    return Grid(rng.random(shape) >= density)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("include_diagonals", [False, True])
+@pytest.mark.parametrize("seed", range(4))
+def test_cluster_graph_paths(seed, include_diagonals):
+    import numpy as np
+    from lose.utils.algorithms.pathing import grid_dijkstra
+    from lose.utils.algorithms.search import path_cost
+    from lose.utils.algorithms.hierarchy import ClusterGraph
+
+    grid = random_grid(seed)
+    rng = np.random.default_rng(seed)
+    costs = rng.integers(1, 3, size=grid.shape).astype(float)
+    hierarchy = ClusterGraph(grid, cluster_size=8, costs=costs, include_diagonals=include_diagonals)
+    ys, xs = np.nonzero(grid.unpad(grid.passable))
+    for start_index, goal_index in rng.integers(len(ys), size=(10, 2)):
+        start = (int(ys[start_index]), int(xs[start_index]))
+        goal = (int(ys[goal_index]), int(xs[goal_index]))
+        expected = grid_dijkstra(grid, start, costs=costs, include_diagonals=include_diagonals)[goal]
+        path = hierarchy.path(start, goal)
+        if path is None:
+            # Cardinal moves always cross borders, so nothing is missed
+            assert include_diagonals or np.isinf(expected)
+            continue
+        assert path[0] == start and path[-1] == goal
+        for node, next_node in zip(path, path[1:]):
+            assert grid.contains(next_node)
+            assert max(abs(node[0] - next_node[0]), abs(node[1] - next_node[1])) == 1
+        assert expected <= path_cost(grid, path, costs) <= expected * 1.5
+
+
+@pytest.mark.unit
+def test_cluster_graph_update_rebuilds_one_cluster():
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.hierarchy import ClusterGraph
+
+    passable = np.ones((12, 12), dtype=bool)
+    passable[:, 5] = False
+    passable[6, 5] = True
+    grid = Grid(passable)
+    hierarchy = ClusterGraph(grid, cluster_size=6)
+    assert len(hierarchy.path((0, 0), (0, 11))) == 24
+    assert not hierarchy.dirty
+
+    # Close the only gap: the middle column lives in the left clusters
+    grid.set_passable((6, 5), False)
+    hierarchy.update([(6, 5)])
+    assert hierarchy.dirty == {(1, 0)}
+    assert hierarchy.path((0, 0), (0, 11)) is None
+
+    grid.set_passable((0, 5), True)
+    hierarchy.update([(0, 5)])
+    assert len(hierarchy.path((0, 0), (0, 11))) == 12
+
+
+@pytest.mark.unit
+def test_opening_door_updates_hierarchy():
+    from lose.utils.terrain import get_level_hierarchy
+    from lose.utils.ui.keys import process_player_move
+
+    level = [
+        '##########',
+        '#...#....#',
+        '#...+....#',
+        '#...#....#',
+        '##########',
+    ]
+    symbols = {'#': 'wall', '.': 'floor', '+': 'closed-door'}
+    tiles = {
+        'default': {'name': 'default', 'ref': 'wall'},
+        'wall': {'name': 'wall', 'blocking': {'movement': {'rate': 100}}},
+        'floor': {'name': 'floor'},
+        'closed-door': {'name': 'closed-door', 'blocking': {'movement': {'rate': 100}}},
+        'open-door': {'name': 'open-door'},
+    }
+    game_state = {
+        'current-level': {
+            (y, x): {'name': symbols[character]}
+            for y, row in enumerate(level)
+            for x, character in enumerate(row)
+        },
+        'tiles': tiles,
+        'cluster-size': 4,
+        'round-updates': {},
+        'debug': False,
+    }
+    hierarchy = get_level_hierarchy(game_state)
+    assert hierarchy.path((2, 1), (2, 8)) is None
+    process_player_move(game_state, (2, 4))
+    assert get_level_hierarchy(game_state) is hierarchy
+    assert hierarchy.path((2, 1), (2, 8)) == [(2, x) for x in range(1, 9)]
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pytest
+
+
+MAP_TEXT = '####\n#.>#\n#..\n####\n'
+
+
+@pytest.fixture
+def tiles():
+    return {
+        'floor': {'name': 'floor', 'index': 0},
+        'hidden-trap': {'name': 'hidden-trap', 'index': 1},
+        'wall': {'name': 'wall', 'index': 2},
+        'ladder-down': {'name': 'ladder-down', 'index': 3},
+        '_indices': {0: 'floor', 1: 'hidden-trap', 2: 'wall', 3: 'ladder-down'},
+        '_symbols': {'.': [0], '#': [2], '>': [3]},
+    }
+
+
+@pytest.fixture
+def map_path(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOSE_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.delenv('LOSE_NO_CACHE', raising=False)
+    path = tmp_path / 'level.map'
+    path.write_text(MAP_TEXT)
+    return str(path)
+
+
+@pytest.mark.unit
+def test_parse_level_text_handles_ragged_rows():
+    from lose.utils.level_maps import parse_level_text, NO_SYMBOL
+
+    symbols, grid = parse_level_text(MAP_TEXT.replace('\n', '\r\n'))
+    assert grid.shape == (4, 4)
+    assert grid.dtype == np.uint8
+    assert grid[2, 3] == NO_SYMBOL
+    assert ''.join(symbols[slot] for slot in grid[1]) == '#.>#'
+
+
+@pytest.mark.unit
+def test_compiled_level_is_memory_mapped(map_path):
+    from lose.utils.level_maps import get_level_path, load_level_symbols, parse_level_text
+
+    symbols, grid = load_level_symbols(map_path)
+    level_path = get_level_path(map_path)
+    assert os.path.exists(level_path)
+    symbols, grid = load_level_symbols(map_path)
+    assert isinstance(grid, np.memmap)
+    expected_symbols, expected_grid = parse_level_text(MAP_TEXT)
+    assert symbols == expected_symbols
+    assert np.array_equal(grid, expected_grid)
+
+
+@pytest.mark.unit
+def test_compiled_level_follows_its_source(map_path):
+    from lose.utils.level_maps import load_level_symbols
+
+    load_level_symbols(map_path)
+    with open(map_path, 'w') as map_stream:
+        map_stream.write('#####\n#...#\n#####\n')
+    symbols, grid = load_level_symbols(map_path)
+    assert grid.shape == (3, 5)
+
+
+@pytest.mark.unit
+def test_level_map_acts_like_a_dict(map_path, tiles):
+    from lose.utils.level_maps import load_level_symbols, resolve_level_map
+
+    level_map = resolve_level_map(tiles, *load_level_symbols(map_path))
+    assert len(level_map) == len(list(level_map)) == 15
+    assert list(level_map)[:5] == [(0, 0), (0, 1), (0, 2), (0, 3), (1, 0)]
+    assert level_map[(1, 2)] == {'name': 'ladder-down'}
+    assert (2, 3) not in level_map
+    assert level_map.get((2, 3)) is None
+    assert level_map.get((-1, 0)) is None
+
+    level_map[(1, 1)]['explored'] = True
+    assert level_map[(1, 1)] == {'name': 'floor', 'explored': True}
+    level_map[(2, 3)] = {'name': 'wall'}
+    level_map[(9, 9)] = {'name': 'floor'}
+    del level_map[(0, 0)]
+    assert (0, 0) not in level_map
+    assert len(level_map) == len(list(level_map)) == 16
+    assert list(level_map)[-1] == (9, 9)
+    level_map[(0, 0)] = {'name': 'floor'}
+    assert len(level_map) == len(list(level_map)) == 17
+
+
+@pytest.mark.unit
+def test_level_map_find_leaves_cells_alone(map_path, tiles):
+    from lose.utils.level_maps import load_level_symbols, resolve_level_map
+
+    level_map = resolve_level_map(tiles, *load_level_symbols(map_path))
+    assert level_map.find('floor') == [(1, 1), (2, 1), (2, 2)]
+    assert level_map.find('ladder-down') == [(1, 2)]
+    assert not level_map.cells
+    level_map[(2, 2)]['name'] = 'ladder-down'
+    level_map[(9, 9)] = {'name': 'floor'}
+    del level_map[(1, 1)]
+    assert level_map.find('floor') == [(2, 1), (9, 9)]
+    assert level_map.find('ladder-down') == [(1, 2), (2, 2)]
+
+
+@pytest.mark.unit
+def test_resolve_level_map_picks_seeded_tiles(tiles):
+    from random import seed
+    from lose.utils.level_maps import parse_level_text, resolve_level_map
+
+    tiles['_symbols']['.'] = [0, 1]
+    symbols, grid = parse_level_text('.' * 400)
+    seed(3)
+    first = resolve_level_map(tiles, symbols, grid)
+    seed(3)
+    second = resolve_level_map(tiles, symbols, grid)
+    assert np.array_equal(first.indices, second.indices)
+    assert set(np.unique(first.indices)) == {0, 1}
+
+
+@pytest.mark.unit
+def test_resolve_level_map_rejects_unknown_symbols(tiles):
+    from lose.utils.level_maps import parse_level_text, resolve_level_map
+
+    with pytest.raises(ValueError, match=r'"\?" at \(1, 2\)'):
+        resolve_level_map(tiles, *parse_level_text('...\n..?\n'))
+
+
+@pytest.mark.unit
+def test_level_registry_loads_on_first_use():
+    from random import seed
+    from lose.utils.level_maps import LevelRegistry
+
+    calls = []
+
+    def loader(path, level_seed):
+        calls.append((path, level_seed))
+        return {'path': path}
+
+    seed(0)
+    maps = LevelRegistry(loader)
+    for name in ['level10', 'level2', 'level1']:
+        maps.register(name, f'{name}.map')
+    assert list(maps) == ['level1', 'level2', 'level10']
+    assert maps.next_level('level2') == 'level10'
+    assert maps.next_level('level10') is None
+    assert not calls
+
+    assert maps['level2'] == {'path': 'level2.map'}
+    assert maps['level2'] is maps['level2']
+    assert len(calls) == 1
+    assert maps.prefetch('level2') is None
+
+    future = maps.prefetch('level10')
+    assert maps.prefetch('level10') is future
+    future.result()
+    assert maps.is_loaded('level10')
+    assert maps['level10'] == {'path': 'level10.map'}
+    assert len(calls) == 2
+    maps.shutdown()
+
+    with pytest.raises(KeyError):
+        maps['level3']
+
+
+@pytest.mark.unit
+def test_level_registry_reports_background_failures():
+    from lose.utils.level_maps import LevelRegistry
+
+    def loader(path, level_seed):
+        raise ValueError(path)
+
+    maps = LevelRegistry(loader)
+    maps.register('broken', 'broken.map')
+    maps.prefetch('broken')
+    with pytest.raises(ValueError, match='broken.map'):
+        maps['broken']
+    maps.shutdown()
+
+
+@pytest.mark.unit
+def test_seeded_levels_do_not_depend_on_load_order(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOSE_CACHE_DIR', str(tmp_path))
+    import lose.game
+    from lose.game import initialize_game
+
+    first = initialize_game(initial_seed=5)
+    first['maps'].shutdown()
+    assert first['maps'].is_loaded('level1')
+    # Without prefetching level1 is only loaded once it's looked up below
+    monkeypatch.setattr(lose.game, 'prefetch_next_level', lambda game_state, map_name: None)
+    second = initialize_game(initial_seed=5)
+    assert not second['maps'].is_loaded('level1')
+    assert first['character-position'] == second['character-position']
+    for name in ['level1', 'level0']:
+        assert np.array_equal(first['maps'][name].indices, second['maps'][name].indices)
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+LEVEL = [
+    '##########',
+    '#....#...#',
+    '#.##.#.#.#',
+    '#.#..#.#.#',
+    '#.#.##.#.#',
+    '#........#',
+    '##########',
+]
+
+
+@pytest.fixture
+def graph():
+    return {
+        (y, x): character
+        for y, row in enumerate(LEVEL)
+        for x, character in enumerate(row)
+        if character != '#'
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("include_diagonals", [False, True])
+@pytest.mark.parametrize("start", [(1, 1), (5, 8), (3, 3)])
+def test_create_dijkstra_map_matches_legacy(graph, start, include_diagonals):
+    from lose.utils.algorithms.pathing import dijkstra, create_dijkstra_map
+
+    expected = {node: cost for cost, node in dijkstra(graph, start, include_diagonals=include_diagonals)}
+    assert create_dijkstra_map(graph, start, include_diagonals=include_diagonals) == expected
+
+
+@pytest.mark.unit
+def test_grid_dijkstra_costs(graph):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import grid_dijkstra
+
+    grid = Grid.from_graph(graph)
+    costs = grid_dijkstra(grid, (1, 1))
+    assert isinstance(costs, np.ndarray)
+    assert costs.shape == grid.shape
+    assert costs[0, 0] == 0
+    # (1, 6) sits behind the wall column at x=5 so the path goes around
+    assert costs[(1 - grid.origin[0], 6 - grid.origin[1])] == 13
+    assert np.isinf(costs[(2 - grid.origin[0], 2 - grid.origin[1])])
+
+
+@pytest.mark.unit
+def test_grid_dijkstra_target_stops_early(graph):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import grid_dijkstra
+
+    grid = Grid.from_graph(graph)
+    full = grid_dijkstra(grid, (1, 1))
+    partial = grid_dijkstra(grid, (1, 1), target=(1, 4))
+    target = (1 - grid.origin[0], 4 - grid.origin[1])
+    assert partial[target] == full[target]
+    assert np.isinf(partial).sum() > np.isinf(full).sum()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("node", [(1, 1), (5, 8), (3, 4)])
+def test_grid_index_round_trip(graph, node):
+    from lose.utils.algorithms.grid import Grid
+
+    grid = Grid.from_graph(graph)
+    assert grid.node(grid.index(node)) == node
+    assert grid.contains(node)
+    assert not grid.contains((0, 0))
+
+
+@pytest.mark.unit
+def test_grid_keeps_flat_passability_and_lowest_cost(graph):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+
+    grid = Grid.from_graph(graph)
+    costs = np.full(grid.shape, 2.0)
+    costs[(1 - grid.origin[0], 1 - grid.origin[1])] = 0.5
+    flat = grid.flat_passable
+    assert flat == grid.passable.ravel().tolist()
+    assert grid.lowest_cost(costs) == 0.5
+    grid.set_passable((1, 1), False)
+    assert grid.flat_passable is flat and not flat[grid.index((1, 1))]
+    assert grid.lowest_cost(costs) == 2
+    costs[(1 - grid.origin[0], 2 - grid.origin[1])] = 1
+    grid.forget_costs()
+    assert grid.lowest_cost(costs) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("include_diagonals, diagonal_cost", [
+    (False, None),
+    (True, None),
+    (True, 1.5),
+])
+def test_dijkstra_map_repair_matches_recompute(graph, include_diagonals, diagonal_cost):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import DijkstraMap
+
+    grid = Grid.from_graph(graph)
+    options = dict(include_diagonals=include_diagonals, diagonal_cost=diagonal_cost)
+    dijkstra_map = DijkstraMap(grid, [(1, 1)], **options)
+    moves = [(1, 2), (1, 3), (1, 4), (2, 4), (3, 4), (3, 3)]
+    doors = [(1, 5), (4, 4), (1, 5)]
+    for source, door in zip(moves, doors + [None] * len(moves)):
+        dijkstra_map.move_sources([source])
+        if door:
+            grid.set_passable(door, not grid.contains(door))
+            dijkstra_map.update([door])
+        expected = DijkstraMap(Grid(grid.unpad(grid.passable), origin=grid.origin), [source], **options)
+        assert np.array_equal(dijkstra_map.costs, expected.costs)
+        assert dict(dijkstra_map) == dict(expected)
+
+
+@pytest.mark.unit
+def test_dijkstra_map_cost_update(graph):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import DijkstraMap
+
+    grid = Grid.from_graph(graph)
+    dijkstra_map = DijkstraMap(grid, [(1, 1)])
+    assert dijkstra_map[(5, 8)] == 11
+    dijkstra_map.update([(5, 4)], [10])
+    costs = np.ones(grid.shape)
+    costs[(5 - grid.origin[0], 4 - grid.origin[1])] = 10
+    assert np.array_equal(dijkstra_map.costs, DijkstraMap(grid, [(1, 1)], costs=costs).costs)
+    assert (0, 0) not in dijkstra_map
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("include_diagonals, diagonal_cost, step", [
+    (False, None, (0, 1)),
+    (False, None, (-1, 0)),
+    (True, None, (1, 1)),
+    (True, 1.5, (1, 1)),
+    (True, 1.5, (0, -1)),
+])
+def test_dijkstra_map_one_step_is_repaired(monkeypatch, include_diagonals, diagonal_cost, step):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import DijkstraMap
+
+    passable = np.ones((40, 40), dtype=bool)
+    passable[10:30, 25] = False
+    grid = Grid(passable)
+    options = dict(include_diagonals=include_diagonals, diagonal_cost=diagonal_cost)
+    dijkstra_map = DijkstraMap(grid, [(20, 20)], **options)
+
+    def recompute():
+        raise AssertionError('A one tile move fell back to a recompute')
+
+    monkeypatch.setattr(dijkstra_map, 'recompute', recompute)
+    source = (20, 20)
+    for _ in range(3):
+        source = (source[0] + step[0], source[1] + step[1])
+        dijkstra_map.move_sources([source])
+        assert np.array_equal(dijkstra_map.costs, DijkstraMap(grid, [source], **options).costs)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("max_cost", [0, 3, 7, 100])
+def test_bounded_dijkstra_cost_ceiling(graph, max_cost):
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import bounded_dijkstra, grid_dijkstra
+
+    grid = Grid.from_graph(graph)
+    full = grid.to_mapping(grid_dijkstra(grid, (1, 1), include_diagonals=True))
+    expected = {node: cost for node, cost in full.items() if cost <= max_cost}
+    bounded = bounded_dijkstra(grid, (1, 1), max_cost=max_cost, include_diagonals=True)
+    assert bounded == expected
+    assert list(bounded.values()) == sorted(bounded.values())
+
+
+@pytest.mark.unit
+def test_bounded_dijkstra_cost_func(graph):
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.distances import log_distance
+    from lose.utils.algorithms.pathing import bounded_dijkstra, entry_costs
+
+    grid = Grid.from_graph(graph)
+    costs = entry_costs(grid, (1, 1))
+    expected = bounded_dijkstra(grid, (1, 1), max_cost=30, costs=costs)
+    assert bounded_dijkstra(grid, (1, 1), max_cost=30, cost_func=log_distance) == expected
+    assert (1, 4) in expected and (5, 8) not in expected
+
+
+@pytest.mark.unit
+def test_bounded_dijkstra_node_budget(graph):
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import bounded_dijkstra
+
+    grid = Grid.from_graph(graph)
+    bounded = bounded_dijkstra(grid, (1, 1), max_nodes=5)
+    assert len(bounded) == 5
+    assert max(bounded.values()) <= 4
+
+
+@pytest.mark.unit
+def test_seeded_dijkstra_multiple_sources(graph):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import grid_dijkstra, seeded_dijkstra
+
+    grid = Grid.from_graph(graph)
+    sources = [(1, 1), (5, 8), (1, 8)]
+    initial = np.full(grid.shape, np.inf)
+    for y, x in sources:
+        initial[y - grid.origin[0], x - grid.origin[1]] = 0
+    expected = np.minimum.reduce([grid_dijkstra(grid, source) for source in sources])
+    assert np.array_equal(seeded_dijkstra(grid, initial), expected)
+
+
+@pytest.mark.unit
+def test_flee_map(graph):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import flee_map, grid_dijkstra
+
+    grid = Grid.from_graph(graph)
+    costs = grid_dijkstra(grid, (1, 1))
+    flee = flee_map(grid, costs)
+    reached = np.isfinite(costs)
+    assert np.array_equal(np.isfinite(flee), reached)
+    assert (flee[reached] <= costs[reached] * -1.2).all()
+    # The cheapest place to flee to is the farthest one from the goal
+    assert np.unravel_index(np.argmin(np.where(reached, flee, np.inf)), flee.shape) == \
+        np.unravel_index(np.argmax(np.where(reached, costs, -1)), costs.shape)
+
+
+@pytest.mark.unit
+def test_update_goal_maps(graph):
+    from lose.utils.goals import get_flow_field, get_goal_map, mark_dirty, update_goal_maps
+
+    level_map = {position: {'name': 'floor'} for position in graph}
+    level_map[(5, 8)] = {'name': 'stairs-down'}
+    level_map[(1, 8)]['items'] = [{'name': 'coffee'}]
+    tiles = {
+        'default': {'name': 'default', 'ref': 'wall'},
+        'wall': {'name': 'wall', 'blocking': {'movement': {'rate': 100}}},
+        'floor': {'name': 'floor'},
+        'stairs-down': {'name': 'stairs-down'},
+    }
+    game_state = {'current-level': level_map, 'tiles': tiles, 'character-position': (1, 1), 'round-updates': {}}
+    maps = update_goal_maps(game_state, force=True)
+    assert maps['character'][(1, 1)] == 0
+    assert maps['exits'][(5, 8)] == 0
+    assert maps['items'][(1, 8)] == 0
+    assert not maps['allies']
+    # Flee maps are only built when asked for
+    assert 'flee-character' not in maps
+    flee = get_goal_map(game_state, 'flee-character')
+    assert flee[(1, 1)] > flee[(5, 8)]
+    assert get_flow_field(game_state, 'flee-character') is game_state['flow-fields']['flee-character']
+    level_map[(1, 8)].pop('items')
+    mark_dirty(game_state, 'items')
+    maps = update_goal_maps(game_state)
+    assert not maps['items']
+    assert get_goal_map(game_state, 'flee-character') is flee
+
+    game_state['character-position'] = (1, 2)
+    mark_dirty(game_state, 'character')
+    maps = update_goal_maps(game_state)
+    assert maps['character'][(1, 2)] == 0
+    assert 'flee-character' not in maps and 'flee-character' not in game_state['flow-fields']
+    assert get_goal_map(game_state, 'flee-character') is not flee
+    assert get_goal_map(game_state, 'flee-nothing') is None
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("include_diagonals", [False, True])
+def test_flow_field_goes_downhill(graph, include_diagonals):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid, DIRECTIONS
+    from lose.utils.algorithms.pathing import grid_dijkstra, flow_field
+
+    grid = Grid.from_graph(graph)
+    costs = grid_dijkstra(grid, (5, 8))
+    flow = flow_field(costs, include_diagonals=include_diagonals)
+    assert flow.dtype == np.int8
+    assert flow[5 - grid.origin[0], 8 - grid.origin[1]] == -1
+    for y, x in graph:
+        direction = flow[y - grid.origin[0], x - grid.origin[1]]
+        if (y, x) == (5, 8):
+            continue
+        dy, dx = DIRECTIONS[direction]
+        assert include_diagonals or dy == 0 or dx == 0
+        neighbors = [
+            costs[y + ny - grid.origin[0], x + nx - grid.origin[1]]
+            for ny, nx in DIRECTIONS[:8 if include_diagonals else 4]
+            if (y + ny, x + nx) in graph
+        ]
+        assert costs[y + dy - grid.origin[0], x + dx - grid.origin[1]] == min(neighbors)
+
+
+@pytest.mark.unit
+def test_level_entities_are_tracked_without_scanning(graph):
+    import numpy as np
+    from lose.utils.goals import find_allies, find_exits, find_items, update_entities
+    from lose.utils.level_maps import LevelMap
+
+    names = {0: 'floor', 1: 'wall', 2: 'stairs-down'}
+    indices = np.array([[1 if character == '#' else 0 for character in row] for row in LEVEL], dtype=np.uint8)
+    indices[5, 8] = 2
+    level_map = LevelMap(indices, names)
+    level_map[(1, 8)]['items'] = [{'name': 'coffee'}]
+    game_state = {'current-level': level_map, 'round-updates': {}}
+    assert find_items(game_state) == [(1, 8)]
+    assert find_exits(game_state) == [(5, 8)]
+    assert find_allies(game_state) == []
+    # Only the tile that was looked up got a tile dict
+    assert list(level_map.cells) == [(1, 8)]
+
+    level_map[(3, 3)]['mobs'] = [{'name': 'bug'}]
+    update_entities(game_state, 'mobs', (3, 3))
+    assert find_allies(game_state) == [(3, 3)]
+    level_map[(3, 4)]['mobs'] = level_map[(3, 3)].pop('mobs')
+    update_entities(game_state, 'mobs', (3, 3), (3, 4))
+    assert find_allies(game_state) == [(3, 4)]
+    assert game_state['dijkstra-dirty'] == {'allies'}
+    level_map[(1, 8)].pop('items')
+    assert find_items(game_state) == []
+
+
+@pytest.mark.unit
+def test_update_mob_positions(graph):
+    from lose.utils.ui.menus import update_mob_positions
+
+    level_map = {position: {'name': 'floor'} for position in graph}
+    level_map[(1, 8)]['mobs'] = [{'name': 'bug'}]
+    level_map[(5, 1)]['mobs'] = [{'name': 'worm'}, {'name': 'worm'}]
+    tiles = {
+        'default': {'name': 'default', 'ref': 'wall'},
+        'wall': {'name': 'wall', 'blocking': {'movement': {'rate': 100}}},
+        'floor': {'name': 'floor'},
+    }
+    game_state = {
+        'current-level': level_map,
+        'tiles': tiles,
+        'character-position': (3, 1),
+        'round-updates': {'character-movement': (1, 0)},
+    }
+    update_mob_positions(game_state)
+    # Out of reach, so still asleep
+    assert level_map[(1, 8)]['mobs'] == [{'name': 'bug'}]
+    # One worm steps closer, the other waits behind it
+    assert level_map[(4, 1)]['mobs'] == [{'name': 'worm'}]
+    assert level_map[(5, 1)]['mobs'] == [{'name': 'worm'}]
+
+    update_mob_positions(game_state)
+    # Next to the character, so nowhere better to go
+    assert level_map[(4, 1)]['mobs'] == [{'name': 'worm'}]
+    assert 'allies' in game_state['dijkstra-dirty']
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("include_diagonals", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_bucket_dijkstra_matches_heap(seed, include_diagonals):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import bucket_dijkstra, grid_dijkstra
+
+    rng = np.random.default_rng(seed)
+    grid = Grid(rng.random((20, 30)) > 0.25)
+    costs = rng.integers(1, 5, size=grid.shape)
+    ys, xs = np.nonzero(grid.unpad(grid.passable))
+    start = (ys[0], xs[0])
+    heap = grid_dijkstra(grid, start, costs=costs, include_diagonals=include_diagonals, diagonal_cost=1.4)
+    bucket = bucket_dijkstra(grid, start, costs=costs, include_diagonals=include_diagonals)
+    assert np.allclose(heap * 10, bucket)
+
+
+@pytest.mark.unit
+def test_create_dijkstra_map_bucket_queue(graph):
+    from lose.utils.algorithms.pathing import create_dijkstra_map
+
+    costs = create_dijkstra_map(graph, (1, 1), include_diagonals=True, queue='bucket')
+    assert costs[(1, 1)] == 0
+    assert costs[(1, 2)] == 10
+    # Down the left corridor, one diagonal, then along the bottom
+    assert costs[(5, 8)] == 10 * 9 + 14
+    assert set(costs) == set(graph)
+    with pytest.raises(ValueError):
+        create_dijkstra_map(graph, (1, 1), queue='stack')
+    with pytest.raises(TypeError):
+        create_dijkstra_map(graph, (1, 1), queue='bucket', cost_func=lambda start, node: 0.5)
+
+
+@pytest.mark.unit
+def test_pathing_executor_matches_in_process(graph):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+    from lose.utils.algorithms.pathing import DijkstraMap
+    from lose.utils.algorithms.executor import PathingExecutor
+
+    grid = Grid.from_graph(graph)
+    costs = np.ones(grid.shape)
+    costs[5 - grid.origin[0], 4 - grid.origin[1]] = 3
+    goals = {'near': [(1, 1)], 'far': [(5, 8), (1, 8)], 'none': []}
+    with PathingExecutor(max_workers=2) as executor:
+        maps = executor.build_maps(grid, goals, costs=costs)
+    for name, sources in goals.items():
+        expected = DijkstraMap(grid, sources, costs=costs)
+        assert isinstance(maps[name], DijkstraMap)
+        assert dict(maps[name]) == dict(expected)
+
+    # Built maps still repair in place
+    maps['near'].move_sources([(3, 3)])
+    assert dict(maps['near']) == dict(DijkstraMap(grid, [(3, 3)], costs=costs))
+
+
+@pytest.mark.unit
+def test_pathing_executor_shutdown_frees_shared_memory(graph, monkeypatch):
+    import atexit
+    from multiprocessing import shared_memory
+    import numpy as np
+    from lose.utils.algorithms.executor import share_array
+    from lose.utils.goals import get_pathing_executor, shutdown_pathing_executor
+
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    monkeypatch.setattr(atexit, 'unregister', registered.remove)
+    game_state = {'pathing-workers': 1}
+    executor = get_pathing_executor(game_state)
+    assert registered == [executor.shutdown]
+    executor.pool.submit(int).result()
+    # A batch cut short still holds its blocks
+    block = share_array(np.ones(4))
+    executor._blocks[block.name] = block
+
+    shutdown_pathing_executor(game_state)
+    assert 'pathing-executor' not in game_state
+    assert executor._pool is None and not registered
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=block.name)
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+@pytest.fixture
+def tiles():
+    return {
+        'default': {'name': 'default', 'ref': 'wall'},
+        'floor': {'name': 'floor', 'display': {'icon': {'character': '.', 'color': {'lit': [200, 180, 50]}}}},
+        'wall': {
+            'name': 'wall',
+            'display': {'icon': {'character': '#', 'color': {'lit': [130, 110, 50], 'unlit': [0, 0, 100]}}},
+            'blocking': {'movement': {'rate': 100}, 'sight': {'opaque': 100}},
+        },
+    }
+
+
+@pytest.fixture
+def game_state(tiles):
+    import tcod
+
+    rows = ['#####', '#...#', '#.#.#', '#...#', '#####']
+    level_map = {
+        (y, x): {'name': 'wall' if character == '#' else 'floor'}
+        for y, row in enumerate(rows)
+        for x, character in enumerate(row)
+    }
+    return {
+        'current-level': level_map, 'tiles': tiles, 'round-updates': {}, 'debug': False,
+        'map-height': 6, 'map-width': 7, 'character-position': (1, 1), 'torch-radius': 2,
+        'windows': {'console': tcod.console.Console(7, 6, order='F')},
+        'level-fov': None,  # skips generating mobs and items
+    }
+
+
+@pytest.mark.unit
+def test_render_data_flattens_tiles(tiles):
+    from lose.utils.ui.render_data import RenderData
+
+    render_data = RenderData(tiles)
+    assert render_data.tile('wall') == ('#', (130, 110, 50), (0, 0, 100))
+    assert render_data.tile('floor') == ('.', (200, 180, 50), (100, 100, 100))
+    assert render_data.tile('default') == ('#', (130, 110, 50), (0, 0, 100))
+    assert render_data.glyphs[render_data.index['floor']] == ord('.')
+    assert render_data.lit[render_data.index['wall']].tolist() == [130, 110, 50]
+
+
+@pytest.mark.unit
+def test_render_data_keeps_icons_by_template(tiles):
+    from lose.utils.entities import spawn
+    from lose.utils.ui.render_data import RenderData
+
+    render_data = RenderData(tiles)
+    template = {'name': 'bug', 'display': {'icon': {'character': 'b', 'color': {'lit': [255, 0, 0]}}}}
+    first, second = spawn(template), spawn(template, health=3)
+    assert render_data.icon(first) == ('b', (255, 0, 0), (100, 100, 100))
+    assert render_data.icon(second) is render_data.icon(first)
+    disguised = spawn(template, display={'icon': {'character': 'B'}})
+    assert render_data.icon(disguised)[0] == 'B'
+
+
+@pytest.mark.unit
+def test_render_level_map_draws_what_is_seen(game_state):
+    from lose.utils.ui.render_data import PALETTE
+    from lose.utils.ui.rendering import render_level_map, render_player
+
+    level_map = game_state['current-level']
+    level_map[(3, 3)]['explored'] = True
+    render_level_map(game_state)
+    render_player(game_state)
+    console = game_state['windows']['console']
+    assert chr(console.ch[1, 1]) == '@'
+    assert tuple(console.fg[1, 1]) == PALETTE['player']
+    assert chr(console.ch[2, 1]) == '.' and tuple(console.fg[2, 1]) == (200, 180, 50)
+    assert level_map[(1, 2)]['explored']
+    # Hidden behind the pillar: remembered, or never seen
+    assert tuple(console.fg[3, 3]) == (100, 100, 100)
+    assert tuple(console.fg[4, 4]) == PALETTE['unexplored']
+    assert 'explored' not in level_map[(4, 4)]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("order", ['C', 'F'])
+def test_draw_cells_writes_console_buffers(order):
+    import tcod
+    from lose.utils.ui.rendering import draw_cells
+
+    console = tcod.console.Console(4, 3, order=order)
+    draw_cells(console, [0, 2], [1, 3], [ord('a'), ord('b')], [(1, 2, 3), (4, 5, 6)])
+    rows = console.ch if order == 'C' else console.ch.T
+    assert [''.join(chr(code) if code else ' ' for code in row) for row in rows.tolist()] == [' a  ', '    ', '   b']
+    assert tuple(console.fg[(2, 3) if order == 'C' else (3, 2)]) == (4, 5, 6)
+
+
+@pytest.fixture
+def drawn_cells(monkeypatch):
+    from lose.utils.ui import rendering
+
+    cells = []
+    draw_cells = rendering.draw_cells
+
+    def counting_draw_cells(con, ys, xs, glyphs, colors):
+        cells.extend(zip(ys, xs))
+        draw_cells(con, ys, xs, glyphs, colors)
+
+    monkeypatch.setattr(rendering, 'draw_cells', counting_draw_cells)
+    return cells
+
+
+@pytest.mark.unit
+def test_render_level_map_only_redraws_dirty_cells(game_state, drawn_cells):
+    from lose.utils.ui.rendering import mark_cells_dirty, render_level_map
+
+    assert render_level_map(game_state)
+    assert len(drawn_cells) == 25
+    drawn_cells.clear()
+    assert not render_level_map(game_state)
+    assert not drawn_cells
+
+    game_state['current-level'][(1, 2)]['name'] = 'wall'
+    assert not render_level_map(game_state)
+    mark_cells_dirty(game_state, (1, 2), (40, 40))
+    assert render_level_map(game_state)
+    assert drawn_cells == [(1, 2)]
+    assert chr(game_state['windows']['console'].ch[2, 1]) == '#'
+
+    drawn_cells.clear()
+    game_state['debug'] = True
+    assert render_level_map(game_state)
+    assert len(drawn_cells) == 25
+
+
+@pytest.mark.unit
+def test_render_level_map_follows_the_field_of_view(game_state, drawn_cells):
+    from lose.utils.ui.rendering import render_level_map, render_player
+
+    render_level_map(game_state)
+    render_player(game_state)
+    drawn_cells.clear()
+    game_state['character-position'] = (1, 2)
+    assert render_level_map(game_state)
+    # The cell the character left and the cells that came into view
+    assert (1, 1) in drawn_cells
+    assert (1, 4) in drawn_cells
+    assert (2, 2) not in drawn_cells
+
+
+@pytest.fixture
+def screen(game_state, monkeypatch):
+    import tcod
+
+    game_state['windows']['panel'] = tcod.console.Console(45, 2, order='F')
+    game_state['windows']['messages'] = tcod.console.Console(7, 1, order='F')
+    game_state.update({'screen-height': 7, 'screen-width': 7, 'panel-height': 2, 'player-health': 6})
+    blits = []
+    monkeypatch.setattr(tcod, 'console_blit', lambda con, *args: blits.append(con))
+    return blits
+
+
+@pytest.mark.unit
+def test_render_all_blits_each_changed_layer_once(game_state, screen):
+    from lose.utils.ui.rendering import mark_layers_dirty, render_all
+
+    windows = game_state['windows']
+    layers = [windows['panel'], windows['console'], windows['messages']]
+    assert render_all(game_state)
+    assert screen == layers
+    screen.clear()
+    assert not render_all(game_state)
+    assert not screen
+
+    # The map and messages overlap the panel, so they go back on top of it
+    game_state['player-health'] = 4
+    assert render_all(game_state)
+    assert screen == layers
+    screen.clear()
+    game_state['character-position'] = (1, 2)
+    assert render_all(game_state)
+    assert screen == [windows['console']]
+
+    screen.clear()
+    mark_layers_dirty(game_state)
+    assert render_all(game_state)
+    assert screen == layers
+
+
+@pytest.mark.unit
+def test_render_panel_shows_player_health(game_state, screen):
+    from lose.utils.ui.rendering import render_panel
+
+    game_state['player-max-health'] = 12
+    assert render_panel(game_state)
+    assert not render_panel(game_state)
+    panel = game_state['windows']['panel']
+    text = ''.join(chr(code) for code in panel.ch[:, 1] if code)
+    assert 'HP: 6/12' in text
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+LEVEL = [
+    '##########',
+    '#....#...#',
+    '#.##.#.#.#',
+    '#.#..#.#.#',
+    '#.#.##.#.#',
+    '#........#',
+    '##########',
+]
+
+
+@pytest.fixture
+def grid():
+    from lose.utils.algorithms.grid import Grid
+
+    return Grid([[character != '#' for character in row] for row in LEVEL])
+
+
+def random_grid(seed, shape=(24, 32), density=0.3):
+    import numpy as np
+    from lose.utils.algorithms.grid import Grid
+
+    rng = np.random.default_rng(seed)
+    return Grid(rng.random(shape) > density)
+
+
+def assert_valid_path(grid, path, start, goal, include_diagonals=True):
+    assert path[0] == start
+    assert path[-1] == goal
+    for previous, node in zip(path, path[1:]):
+        assert grid.contains(node)
+        dy, dx = abs(node[0] - previous[0]), abs(node[1] - previous[1])
+        assert max(dy, dx) == 1
+        if not include_diagonals:
+            assert dy + dx == 1
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("include_diagonals", [False, True])
+@pytest.mark.parametrize("diagonal_cost", [1, 1.5])
+@pytest.mark.parametrize("seed", range(4))
+def test_astar_is_optimal(seed, include_diagonals, diagonal_cost):
+    import numpy as np
+    from lose.utils.algorithms.pathing import grid_dijkstra
+    from lose.utils.algorithms.search import astar, path_cost
+
+    grid = random_grid(seed)
+    costs = np.random.default_rng(seed).integers(1, 4, size=grid.shape)
+    ys, xs = np.nonzero(grid.unpad(grid.passable))
+    start, goal = (ys[0], xs[0]), (ys[-1], xs[-1])
+    expected = grid_dijkstra(
+        grid, start, costs=costs, include_diagonals=include_diagonals, diagonal_cost=diagonal_cost
+    )
+    path = astar(grid, start, goal, costs=costs, include_diagonals=include_diagonals, diagonal_cost=diagonal_cost)
+    if np.isinf(expected[goal]):
+        assert path is None
+    else:
+        assert_valid_path(grid, path, start, goal, include_diagonals)
+        assert path_cost(grid, path, costs, diagonal_cost) == pytest.approx(expected[goal])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("diagonal_cost", [1, 1.5, 2 ** 0.5])
+@pytest.mark.parametrize("seed", range(6))
+def test_jump_point_search_is_optimal(seed, diagonal_cost):
+    import numpy as np
+    from lose.utils.algorithms.pathing import grid_dijkstra
+    from lose.utils.algorithms.search import jump_point_search, path_cost
+
+    grid = random_grid(seed)
+    ys, xs = np.nonzero(grid.unpad(grid.passable))
+    start = (ys[0], xs[0])
+    expected = grid_dijkstra(grid, start, include_diagonals=True, diagonal_cost=diagonal_cost)
+    for goal in zip(ys[::37], xs[::37]):
+        path = jump_point_search(grid, start, goal, diagonal_cost=diagonal_cost)
+        if np.isinf(expected[goal]):
+            assert path is None
+        else:
+            assert_valid_path(grid, path, start, goal)
+            assert path_cost(grid, path, diagonal_cost=diagonal_cost) == pytest.approx(expected[goal])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("search", ['astar', 'jump_point_search'])
+def test_search_level(grid, search):
+    from lose.utils.algorithms import search as module
+
+    path = getattr(module, search)(grid, (1, 1), (1, 6))
+    assert_valid_path(grid, path, (1, 1), (1, 6), include_diagonals=search != 'astar')
+    assert getattr(module, search)(grid, (1, 1), (1, 1)) == [(1, 1)]
+    assert getattr(module, search)(grid, (1, 1), (0, 0)) is None
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("include_diagonals, diagonal_cost", [(False, 1), (True, 1), (True, 1.5), (True, 3)])
+def test_heuristic_matches_octagonal_distance(include_diagonals, diagonal_cost):
+    import numpy as np
+    from lose.utils.algorithms.distances import octagonal_distances
+    from lose.utils.algorithms.search import get_heuristic
+
+    grid = random_grid(1)
+    grid.origin = (-5, 7)
+    goal = (3, 20)
+    heuristic = get_heuristic(grid, goal, include_diagonals, diagonal_cost, scale=2)
+    ys, xs = grid.nodes()
+    dy, dx = np.abs(ys - goal[0]), np.abs(xs - goal[1])
+    if include_diagonals:
+        open_ground = np.abs(dy - dx) + min(diagonal_cost, 2) * np.minimum(dy, dx)
+    else:
+        open_ground = dy + dx
+    expected = np.minimum(octagonal_distances(goal, np.stack([ys, xs], axis=-1)), open_ground) * 2
+    estimates = [heuristic[grid.index(node)] for node in zip(ys.ravel().tolist(), xs.ravel().tolist())]
+    assert estimates == expected.ravel().tolist()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("search", ['astar', 'jump_point_search'])
+def test_short_search_on_large_grid_is_local(monkeypatch, search):
+    import numpy as np
+    from lose.utils.algorithms import search as module
+    from lose.utils.algorithms.grid import Grid
+
+    heuristics = []
+    get_heuristic = module.get_heuristic
+
+    def tracked_heuristic(*args, **kwargs):
+        heuristics.append(get_heuristic(*args, **kwargs))
+        return heuristics[-1]
+
+    monkeypatch.setattr(module, 'get_heuristic', tracked_heuristic)
+    grid = Grid(np.ones((1000, 1000), dtype=bool))
+    path = getattr(module, search)(grid, (500, 500), (503, 504))
+    assert_valid_path(grid, path, (500, 500), (503, 504), include_diagonals=search != 'astar')
+    heuristic, = heuristics
+    assert 0 < len(heuristic) < 100
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("search, with_costs", [('astar', False), ('astar', True), ('jump_point_search', False)])
+def test_short_search_cost_does_not_grow_with_grid(search, with_costs):
+    import timeit
+    import numpy as np
+    from lose.utils.algorithms import search as module
+    from lose.utils.algorithms.grid import Grid
+
+    def best_time(size):
+        grid = Grid(np.ones((size, size), dtype=bool))
+        options = {'costs': np.ones((size, size))} if with_costs else {}
+        start, goal = (size // 2, size // 2), (size // 2 + 3, size // 2 + 4)
+        query = getattr(module, search)
+        query(grid, start, goal, **options)  # the grid keeps what it caches
+        return min(timeit.repeat(lambda: query(grid, start, goal, **options), number=5, repeat=5))
+
+    small, large = best_time(50), best_time(2000)
+    assert large < small * 5
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("seed", range(4))
+def test_jump_point_search_short_runs_are_optimal(monkeypatch, seed):
+    import numpy as np
+    from lose.utils.algorithms import search as module
+    from lose.utils.algorithms.pathing import grid_dijkstra
+    from lose.utils.algorithms.search import jump_point_search, path_cost
+
+    monkeypatch.setattr(module, 'JUMP_LIMIT', 2)
+    grid = random_grid(seed, shape=(40, 60), density=0.2)
+    ys, xs = np.nonzero(grid.unpad(grid.passable))
+    start = (ys[len(ys) // 2], xs[len(xs) // 2])
+    expected = grid_dijkstra(grid, start, include_diagonals=True)
+    # Goals close enough that the runs stop short of them
+    near = (np.abs(ys - start[0]) <= 8) & (np.abs(xs - start[1]) <= 8)
+    for goal in zip(ys[near].tolist(), xs[near].tolist()):
+        path = jump_point_search(grid, start, goal)
+        if np.isinf(expected[goal]):
+            assert path is None
+        else:
+            assert_valid_path(grid, path, start, goal)
+            assert path_cost(grid, path) == expected[goal]
+
+
+@pytest.mark.unit
+def test_dijkstra_stops_at_target():
+    from lose.utils.algorithms.pathing import dijkstra
+
+    graph = {(0, x): '.' for x in range(20)}
+    visited = [node for _, node in dijkstra(graph, (0, 10), target=(0, 11))]
+    assert visited[-1] == (0, 11)
+    assert len(visited) <= 3
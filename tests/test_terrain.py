@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import math
+
+import pytest
+
+
+LEVEL = [
+    '#######',
+    '#..+..#',
+    '#.###.#',
+    '#..>..#',
+    '#######',
+]
+
+SYMBOLS = {'#': 'wall', '.': 'floor', '+': 'closed-door', '>': 'ladder-down'}
+
+
+@pytest.fixture
+def tiles():
+    return {
+        'default': {'name': 'default', 'ref': 'wall'},
+        'wall': {'name': 'wall', 'blocking': {'movement': {'rate': 100}, 'sight': {'opaque': 100}}},
+        'floor': {'name': 'floor'},
+        'closed-door': {'name': 'closed-door', 'blocking': {'movement': {'rate': 100}}},
+        'open-door': {'name': 'open-door'},
+        'ladder-down': {'name': 'ladder-down', 'blocking': {'movement': {'rate': 60}}},
+        'secret-wall': {'name': 'secret-wall', 'ref': 'wall'},
+    }
+
+
+@pytest.fixture
+def game_state(tiles):
+    level_map = {
+        (y, x): {'name': SYMBOLS[character]}
+        for y, row in enumerate(LEVEL)
+        for x, character in enumerate(row)
+    }
+    return {'current-level': level_map, 'tiles': tiles, 'round-updates': {}, 'debug': False}
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("rate, expected", [
+    (0, 1),
+    (50, 2),
+    (60, 2.5),
+    (100, math.inf),
+    (120, math.inf),
+])
+def test_movement_cost(rate, expected):
+    from lose.utils.terrain import movement_cost
+
+    assert movement_cost(rate) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("tile, expected", [
+    ({'name': 'floor'}, 0),
+    ({'name': 'secret-wall'}, 100),
+    ({'name': 'floor', 'blocking': {'movement': {'rate': 30}}}, 30),
+    (None, 100),
+])
+def test_movement_rate(tiles, tile, expected):
+    from lose.utils.terrain import movement_rate
+
+    assert movement_rate(tiles, tile) == expected
+
+
+@pytest.mark.unit
+def test_compile_terrain(game_state):
+    from lose.utils.terrain import compile_terrain
+
+    grid, costs = compile_terrain(game_state['current-level'], game_state['tiles'])
+    assert grid.shape == costs.shape == (5, 7)
+    assert not grid.contains((0, 0))
+    assert not grid.contains((1, 3))
+    assert grid.contains((1, 1))
+    assert costs[1, 1] == 1
+    assert costs[3, 3] == 2.5
+    assert math.isinf(costs[1, 3])
+
+
+@pytest.mark.unit
+def test_opening_door_patches_terrain(game_state):
+    from lose.utils.goals import update_goal_maps
+    from lose.utils.terrain import get_level_terrain
+    from lose.utils.ui.keys import process_player_move
+
+    game_state['character-position'] = (1, 1)
+    maps = update_goal_maps(game_state, force=True)
+    # The ladder is the only way around while the door is shut
+    assert maps['character'][(1, 5)] == pytest.approx(9.5)
+    grid, _ = get_level_terrain(game_state)
+
+    process_player_move(game_state, (1, 3))
+    assert game_state['current-level'][(1, 3)]['name'] == 'open-door'
+    assert grid.contains((1, 3))
+    maps = update_goal_maps(game_state)
+    assert maps['character'][(1, 5)] == 4
+    assert maps['character'].grid is grid
+
+
+@pytest.mark.unit
+def test_tile_table_resolves_refs(tiles):
+    from lose.utils.terrain import get_tile_table
+
+    tiles['wall']['display'] = {'icon': {'character': '#', 'color': {'lit': [255, 255, 255], 'unlit': [90, 90, 90]}}}
+    table = get_tile_table(tiles)
+    assert get_tile_table(tiles) is table
+    assert table.names == ['default', 'wall', 'floor', 'closed-door', 'open-door', 'ladder-down', 'secret-wall']
+    for name in ['default', 'secret-wall']:
+        record = table[name]
+        assert record['glyph'] == '#'
+        assert list(record['unlit']) == [90, 90, 90]
+        assert record['movement'] == 100
+        assert record['sight'] == 100
+    assert table.glyphs[table.index['floor']] == ' '
+    assert table.lit[table.index['floor']] == (200, 200, 200)
+    assert list(table.costs) == [math.inf, math.inf, 1, math.inf, 1, 2.5, math.inf]
+    assert list(table.transparent) == [False, False, True, False, True, True, False]
+
+
+@pytest.mark.unit
+def test_compile_terrain_reads_level_map_grid(tiles):
+    import numpy as np
+    from lose.utils.level_maps import parse_level_text, resolve_level_map
+    from lose.utils.terrain import compile_terrain, compile_transparency, get_tile_table
+
+    table = get_tile_table(tiles)
+    tiles['_indices'] = dict(enumerate(table.names))
+    tiles['_symbols'] = {'#': [1], '.': [2], '+': [3], '>': [5]}
+    level_map = resolve_level_map(tiles, *parse_level_text('\n'.join(LEVEL)))
+    level_map[(1, 3)]['name'] = 'open-door'
+    level_map[(3, 1)]['blocking'] = {'movement': {'rate': 50}}
+    grid, costs = compile_terrain(level_map, tiles)
+    assert grid.origin == (0, 0)
+    assert grid.contains((1, 3))
+    assert costs[3, 1] == 2
+    assert costs[3, 3] == 2.5
+    transparent = compile_transparency(level_map, tiles, (6, 8))
+    assert transparent[1, 3]
+    assert not transparent[5, 7]
+    assert np.array_equal(transparent[:5, :7], np.isfinite(costs))
+
+
+@pytest.mark.unit
+def test_player_is_stopped_by_blocking_tiles(game_state):
+    from lose.utils.ui.keys import process_player_move
+
+    game_state['character-position'] = (3, 2)
+    assert not process_player_move(game_state, (3, 3))  # the ladder blocks 60% of movement
+    assert not process_player_move(game_state, (2, 2))
+    assert process_player_move(game_state, (3, 1))
+    assert game_state['character-position'] == (3, 1)
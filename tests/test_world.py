@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+
+NAMES = {0: 'floor', 1: 'wall', 2: 'closed-door', 3: 'open-door'}
+
+
+@pytest.fixture
+def tiles():
+    return {
+        'default': {'name': 'default', 'ref': 'wall'},
+        'floor': {'name': 'floor', 'index': 0},
+        'wall': {'name': 'wall', 'index': 1, 'blocking': {'movement': {'rate': 100}, 'sight': {'opaque': 100}}},
+        'closed-door': {'name': 'closed-door', 'index': 2, 'blocking': {'movement': {'rate': 100}}},
+        'open-door': {'name': 'open-door', 'index': 3},
+        '_indices': dict(NAMES),
+        '_symbols': {'.': [0], '#': [1], '+': [2]},
+    }
+
+
+def open_source(calls=None):
+    """Floors everywhere, walls along every 40th row."""
+    def source(coords, bounds):
+        if calls is not None:
+            calls.append(coords)
+        top, left, bottom, right = bounds
+        rows = np.arange(top, bottom)[:, None]
+        return np.broadcast_to(np.where(rows % 40 == 39, 1, 0), (bottom - top, right - left)).astype(np.uint8)
+    return source
+
+
+@pytest.mark.unit
+def test_world_loads_chunks_on_demand():
+    from lose.utils.world import ChunkedWorld
+
+    calls = []
+    world = ChunkedWorld(open_source(calls), (1000, 2000), NAMES, chunk_size=16)
+    assert world.chunk_shape == (63, 125)
+    assert not calls
+    assert world[(39, 70)] == {'name': 'wall'}
+    assert world[(40, 70)] == {'name': 'floor'}
+    assert calls == [(2, 4)]
+    assert (999, 1999) in world
+    assert (1000, 0) not in world
+    assert world.get((-1, 0)) is None
+    assert world.chunk_bounds((62, 124)) == (992, 1984, 1000, 2000)
+    with pytest.raises(KeyError):
+        world[(0, 2000)] = {'name': 'floor'}
+
+
+@pytest.mark.unit
+def test_world_drops_least_recently_used_chunks():
+    from lose.utils.world import ChunkedWorld
+
+    calls = []
+    world = ChunkedWorld(open_source(calls), (1024, 1024), NAMES, chunk_size=32, max_chunks=4, radius=0)
+    world.focus((0, 0))
+    world[(5, 5)]['explored'] = True
+    del world[(6, 6)]
+    for y in range(0, 1024, 32):
+        world.get((y, 512))
+        assert len(world.chunks) <= 4
+    # The focused chunk stays; the oldest of the others went first
+    assert world.is_loaded((0, 0))
+    assert not world.is_loaded((1, 16))
+    assert world.is_loaded((31, 16))
+    assert world.evictions == world.loads - 4
+
+    world.focus((1000, 1000))
+    assert not world.is_loaded((0, 0))
+    # Changed tiles are kept for when the chunk comes back
+    assert world[(5, 5)] == {'name': 'floor', 'explored': True}
+    assert (6, 6) not in world
+    assert calls.count((0, 0)) == 2
+
+
+@pytest.mark.unit
+def test_world_keeps_dropped_chunks_compact():
+    from lose.utils.world import ChunkedWorld
+
+    world = ChunkedWorld(open_source(), (256, 256), NAMES, chunk_size=32, max_chunks=1, radius=0)
+    for y in range(32):
+        for x in range(32):
+            world[(y, x)]['explored'] = True
+    world[(3, 4)]['name'] = 'open-door'
+    world[(40, 40)]['explored'] = True
+    del world[(40, 41)]
+    world.get((100, 100))
+    assert not world.is_loaded((0, 0)) and not world.is_loaded((1, 1))
+    state = world._saved[(0, 0)]
+    # Only the renamed tile is kept whole; the rest is one bit per cell
+    assert state.tiles == {(3, 4): {'name': 'open-door', 'explored': True}}
+    assert state.explored.nbytes == 32 * 32 // 8
+    assert len(state) == 32 * 32
+    assert len(world) == len(world.chunks[(3, 3)]) + 32 * 32 + 1
+    assert (40, 40) in set(world)
+
+    assert world[(31, 31)] == {'name': 'floor', 'explored': True}
+    assert world[(3, 4)] == {'name': 'open-door', 'explored': True}
+    assert world[(40, 40)] == {'name': 'floor', 'explored': True}
+    assert (40, 41) not in world
+
+
+@pytest.mark.unit
+def test_world_window_spans_chunk_borders(tiles):
+    from lose.utils.world import ChunkedWorld
+    from lose.utils.terrain import compile_terrain
+
+    world = ChunkedWorld(open_source(), (1000, 1000), NAMES, chunk_size=32, radius=1)
+    assert world.focus((100, 70)) == (64, 32, 160, 128)
+    assert world.focus((127, 95)) == (64, 32, 160, 128)
+    world[(100, 64)]['name'] = 'closed-door'
+    grid, costs = compile_terrain(world, tiles)
+    assert grid.origin == (64, 32)
+    assert costs.shape == (96, 96)
+    assert grid.contains((100, 63)) and not grid.contains((100, 64))
+    assert not grid.contains((119, 70))
+    assert not grid.contains((100, 128), passable=False)
+
+
+@pytest.mark.unit
+def test_level_file_source_matches_whole_level(tiles, tmp_path, monkeypatch):
+    monkeypatch.setenv('LOSE_CACHE_DIR', str(tmp_path / 'cache'))
+    from lose.utils.level_maps import load_level_symbols, resolve_level_map
+    from lose.utils.world import ChunkedWorld, level_file_source
+
+    rows = ['#' * 50] + ['#' + ('.+' * 30)[:48] + '#' for _ in range(38)] + ['#' * 50]
+    map_path = tmp_path / 'big.map'
+    map_path.write_text('\n'.join(rows) + '\n')
+    source, shape = level_file_source(tiles, str(map_path), seed=1)
+    world = ChunkedWorld(source, shape, tiles['_indices'], chunk_size=16)
+    level_map = resolve_level_map(tiles, *load_level_symbols(str(map_path)))
+    assert world.shape == level_map.shape == (40, 50)
+    assert all(world[position] == level_map[position] for position in level_map)
+
+
+@pytest.fixture
+def game_state(tiles):
+    from lose.utils.world import ChunkedWorld
+
+    world = ChunkedWorld(open_source(), (1000, 1000), NAMES, chunk_size=32, radius=1)
+    return {
+        'current-level': world, 'tiles': tiles, 'round-updates': {}, 'debug': False,
+        'map-height': 42, 'map-width': 72, 'character-position': (500, 500),
+    }
+
+
+@pytest.mark.unit
+def test_world_terrain_and_fov_follow_the_character(game_state):
+    from lose.utils.terrain import compute_fov, get_level_fov, get_level_terrain
+
+    grid, costs = get_level_terrain(game_state)
+    assert grid.origin == (448, 448)
+    assert grid is get_level_terrain(game_state)[0]
+    compute_fov(game_state)
+    fov = get_level_fov(game_state)
+    assert fov.origin == (448, 448)
+    view = fov.view(480, 464, 42, 72)
+    # Walls along row 519 stop sight; the next chunk to the right is seen across the border
+    assert view[20, 36] and view[39, 36] and not view[40, 36]
+    assert view[20, 71] and fov.view(500, 535, 1, 1)[0, 0]
+
+    game_state['character-position'] = (500, 560)
+    assert get_level_terrain(game_state)[0].origin == (448, 512)
+    assert get_level_fov(game_state) is not fov
+
+
+@pytest.mark.unit
+def test_world_goal_maps_ignore_far_sources(game_state):
+    from lose.utils.goals import update_goal_maps
+
+    world = game_state['current-level']
+    world[(510, 505)]['items'] = ['coin']
+    world[(5, 5)]['items'] = ['gem']
+    game_state['round-updates']['tile-changes'] = [(5, 5)]
+    goal_maps = update_goal_maps(game_state)
+    assert goal_maps['items'][(510, 505)] == 0
+    assert goal_maps['items'][(500, 500)] > 0
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("position, expected", [
+    ((500, 500), (479, 464)),
+    ((3, 3), (0, 0)),
+    ((999, 999), (958, 928)),
+])
+def test_camera_follows_the_character(game_state, position, expected):
+    from lose.utils.ui.rendering import get_camera
+
+    game_state['character-position'] = position
+    assert get_camera(game_state) == expected
+
+
+@pytest.mark.unit
+def test_camera_is_still_on_small_levels(game_state):
+    from lose.utils.ui.rendering import get_camera
+
+    game_state['current-level'] = {(0, 0): {'name': 'floor'}}
+    assert get_camera(game_state) == (0, 0)